@@ -0,0 +1,6 @@
+"""Benchmarks do pipeline playlist → STRM.
+
+Execute a partir da raiz do repositório, por exemplo:
+    python -m benchmarks.run --entries 100000 --output results.json
+    python -m benchmarks.bench_extinf --entries 1000000
+"""
@@ -0,0 +1,114 @@
+"""Carga de um canal ao vivo através do proxy, com e sem o compartilhamento da conexão.
+
+Sobe um provedor local que transmite um fluxo .ts sem fim e o proxy numa
+porta livre; N players assistem ao mesmo canal até receberem `--megabytes`.
+Mede quantas conexões e quantos bytes saíram do "provedor".
+
+    python -m benchmarks.bench_live_fanout --clients 50 --megabytes 2
+"""
+import argparse
+import asyncio
+import threading
+import time
+from typing import Dict
+
+import aiohttp
+import uvicorn
+from aiohttp import web
+
+from src.services.proxy_server import ProxyServer
+from src.services.stream_index import StreamIndex
+
+CHUNK = 64 * 1024
+
+class StreamingStub:
+    """Provedor local: cada conexão recebe CHUNK bytes a cada `interval` segundos"""
+
+    def __init__(self, port: int, interval: float):
+        self.port = port
+        self.interval = interval
+        self.open = 0
+        self.max_open = 0
+        self.connections = 0
+        self.bytes_sent = 0
+
+    async def live(self, request: web.Request) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "video/mp2t"})
+        response.enable_chunked_encoding()
+        await response.prepare(request)
+        self.open += 1
+        self.connections += 1
+        self.max_open = max(self.max_open, self.open)
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                await response.write(b"\x47" * CHUNK)
+                self.bytes_sent += CHUNK
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.open -= 1
+        return response
+
+    def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/live/{channel}", self.live)
+        threading.Thread(
+            target=lambda: web.run_app(app, host="127.0.0.1", port=self.port, print=None, handle_signals=False),
+            daemon=True
+        ).start()
+
+async def watch(session: aiohttp.ClientSession, url: str, limit: int) -> int:
+    received = 0
+    async with session.get(url) as response:
+        async for chunk in response.content.iter_chunked(CHUNK):
+            received += len(chunk)
+            if received >= limit:
+                break
+    return received
+
+async def load(proxy_port: int, stub_port: int, clients: int, limit: int) -> Dict[str, float]:
+    url = f"http://127.0.0.1:{proxy_port}/proxy?url=http://127.0.0.1:{stub_port}/live/1.ts"
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        start = time.perf_counter()
+        received = await asyncio.gather(*(watch(session, url, limit) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+    return {"client_mb": sum(received) / 1e6, "seconds": elapsed}
+
+def run(clients: int, megabytes: float, fanout: bool, stub_port: int, proxy_port: int,
+        interval: float) -> Dict[str, float]:
+    stub = StreamingStub(stub_port, interval)
+    stub.start()
+    proxy = ProxyServer(port=proxy_port, stream_index=StreamIndex(":memory:"), live_fanout=fanout)
+    threading.Thread(
+        target=lambda: uvicorn.run(proxy.app, host="127.0.0.1", port=proxy_port, log_level="warning"),
+        daemon=True
+    ).start()
+    time.sleep(1.5)
+
+    results = asyncio.run(load(proxy_port, stub_port, clients, int(megabytes * 1024 * 1024)))
+    time.sleep(1)  # o proxy fecha a conexão com o provedor quando o último player sai
+    results.update({
+        "upstream_connections": stub.connections,
+        "upstream_max_open": stub.max_open,
+        "upstream_open_after": stub.open,
+        "upstream_mb": stub.bytes_sent / 1e6
+    })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--megabytes", type=float, default=2, help="quanto cada player assiste")
+    parser.add_argument("--interval", type=float, default=0.02, help="segundos entre blocos do provedor")
+    parser.add_argument("--no-fanout", action="store_true", help="uma conexão com o provedor por player")
+    parser.add_argument("--stub-port", type=int, default=18766)
+    parser.add_argument("--proxy-port", type=int, default=18767)
+    args = parser.parse_args()
+
+    results = run(args.clients, args.megabytes, not args.no_fanout, args.stub_port, args.proxy_port, args.interval)
+    for name, value in results.items():
+        print(f"{name}: {value:,.2f}" if isinstance(value, float) else f"{name}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Latência de início de stream com um servidor lento e um espelho.
+
+Sobe dois "servidores" do mesmo provedor: o principal demora `--slow-ms`
+para responder em `--slow-ratio` das requisições (cauda longa), o espelho
+responde rápido. Compara o tempo até o primeiro byte no proxy sem espelhos,
+com failover só por erro e com requisições em paralelo após `--hedge-ms`.
+Por fim, derruba o principal (500) e mostra o circuit breaker rebaixando-o.
+
+    python -m benchmarks.bench_mirrors --requests 200
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+import uvicorn
+from aiohttp import web
+
+from src.services.proxy_server import ProxyServer
+from src.services.stream_index import StreamIndex
+
+class EdgeStub:
+    def __init__(self, port: int, slow: float, slow_ratio: float, seed: int):
+        self.port = port
+        self.slow = slow
+        self.slow_ratio = slow_ratio
+        self.failing = False
+        self.requests = 0
+        self.random = random.Random(seed)
+
+    async def media(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if self.failing:
+            raise web.HTTPInternalServerError()
+        if self.random.random() < self.slow_ratio:
+            await asyncio.sleep(self.slow)
+        return web.Response(body=b"\x47" * 188 * 50, content_type="video/mp4")
+
+    def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/movie/{name}", self.media)
+        threading.Thread(
+            target=lambda: web.run_app(app, host="127.0.0.1", port=self.port, print=None, handle_signals=False),
+            daemon=True
+        ).start()
+
+async def starts(proxy_port: int, primary_port: int, count: int) -> List[float]:
+    timings = []
+    async with aiohttp.ClientSession() as session:
+        for n in range(count):
+            url = f"http://127.0.0.1:{proxy_port}/proxy?url=http://127.0.0.1:{primary_port}/movie/{n}.mp4"
+            start = time.perf_counter()
+            async with session.get(url) as response:
+                await response.content.readany()
+                timings.append(time.perf_counter() - start)
+                await response.read()
+    return sorted(timings)
+
+def start_proxy(port: int, mirror_hosts: Optional[Dict], hedge_delay: Optional[float]) -> ProxyServer:
+    proxy = ProxyServer(port=port, stream_index=StreamIndex(":memory:"), redirect_ttl=0,
+                        mirror_hosts=mirror_hosts, hedge_delay=hedge_delay)
+    threading.Thread(
+        target=lambda: uvicorn.run(proxy.app, host="127.0.0.1", port=port, log_level="warning"),
+        daemon=True
+    ).start()
+    time.sleep(1.5)
+    return proxy
+
+def run(count: int, slow_ms: float, slow_ratio: float, hedge_ms: float, port: int) -> Dict[str, float]:
+    primary = EdgeStub(port, slow_ms / 1000, slow_ratio, seed=1)
+    mirror = EdgeStub(port + 1, 0, 0, seed=2)
+    primary.start()
+    mirror.start()
+    # Mesmo servidor por outro nome: para o proxy é outro host
+    mirror_hosts = {f"127.0.0.1:{port}": [f"localhost:{port + 1}"]}
+
+    results = {}
+    scenarios = (("no_mirror", None, None), ("failover", mirror_hosts, None), ("hedged", mirror_hosts, hedge_ms / 1000))
+    for offset, (label, hosts, delay) in enumerate(scenarios, start=2):
+        proxy = start_proxy(port + offset, hosts, delay)
+        primary.requests = mirror.requests = 0
+        timings = asyncio.run(starts(port + offset, port, count))
+        results[f"{label}_ttfb_p50_ms"] = timings[len(timings) // 2] * 1000
+        results[f"{label}_ttfb_p99_ms"] = timings[int(len(timings) * 0.99)] * 1000
+        results[f"{label}_mirror_requests"] = mirror.requests
+        results[f"{label}_failovers"] = proxy.metrics.failovers
+
+    # Principal fora do ar: depois de `breaker_threshold` falhas ele vai para o fim da fila
+    primary.failing = True
+    primary.requests = 0
+    asyncio.run(starts(port + 4, port, 20))
+    results["breaker_primary_requests_of_20"] = primary.requests
+    results["breaker_open"] = proxy.breaker.is_open(f"127.0.0.1:{port}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--slow-ms", type=float, default=3000)
+    parser.add_argument("--slow-ratio", type=float, default=0.05)
+    parser.add_argument("--hedge-ms", type=float, default=250)
+    parser.add_argument("--port", type=int, default=18770)
+    args = parser.parse_args()
+
+    results = run(args.requests, args.slow_ms, args.slow_ratio, args.hedge_ms, args.port)
+    for name, value in results.items():
+        print(f"{name}: {value:,.2f}" if isinstance(value, float) else f"{name}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Escalonamento da leitura/classificação da playlist com o pool de processos.
+
+    python -m benchmarks.bench_parallel --entries 500000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+from src.models.m3u_processor import M3UProcessor, is_valid_item
+from .synthetic import write_playlist
+
+BASE_DIRS = {"series": "/strm/series", "movie": "/strm/movies"}
+
+def run(entries: int, workers_list: List[int], shard_size: int) -> Dict[str, float]:
+    fd, path = tempfile.mkstemp(suffix=".m3u")
+    os.close(fd)
+    processor = M3UProcessor()
+    results = {}
+    try:
+        write_playlist(path, entries)
+        for workers in workers_list:
+            start = time.perf_counter()
+            with processor.stream_file(path) as stream:
+                if workers == 1:
+                    strm_entries = processor.iter_entries(processor.iter_items(stream, is_valid_item), BASE_DIRS)
+                else:
+                    strm_entries = processor.iter_entries_parallel(stream, BASE_DIRS, workers, is_valid_item, shard_size)
+                count = sum(1 for _ in strm_entries)
+            results[f"workers_{workers}_items_per_sec"] = count / (time.perf_counter() - start)
+    finally:
+        os.remove(path)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=500_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--shard-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    results = run(args.entries, args.workers, args.shard_size)
+    baseline = results.get("workers_1_items_per_sec")
+    print(f"CPUs disponíveis: {os.cpu_count()}")
+    for name, value in results.items():
+        speedup = f" ({value / baseline:.2f}x)" if baseline else ""
+        print(f"{name}: {value:,.0f}{speedup}")
+
+if __name__ == "__main__":
+    main()
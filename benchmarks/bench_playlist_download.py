@@ -0,0 +1,143 @@
+"""Download da playlist com requisição condicional e resposta comprimida.
+
+Sobe um provedor local que entrega uma playlist sintética de `--entries`
+itens com ETag/Last-Modified, comprimida quando o cliente aceita gzip, e
+mede o M3UProcessor.stream_download em quatro situações:
+
+- primeiro download (200): bytes na rede contra o tamanho da playlist
+- playlist inalterada (304): linhas lidas da cópia local, nada na rede
+- playlist alterada (200 de novo): cópia local substituída
+- 304 com a cópia local apagada: deve baixar de novo, sem validadores
+
+    python -m benchmarks.bench_playlist_download --entries 100000
+"""
+import argparse
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict
+
+from aiohttp import web
+
+from src.models.m3u_processor import M3UProcessor
+from .synthetic import generate_lines
+
+class PlaylistStub:
+    """Playlist em /playlist.m3u, com 304 para o ETag atual"""
+
+    def __init__(self, port: int, entries: int):
+        self.port = port
+        self.entries = entries
+        self.version = 0
+        # Responde 304 à próxima requisição mesmo sem validadores (servidor ou CDN com defeito)
+        self.force_304 = False
+        self.requests = 0
+        self.conditional = 0
+        self.bytes_sent = 0
+        self._publish()
+
+    def _publish(self) -> None:
+        self.body = "\n".join(generate_lines(self.entries + self.version, seed=self.version)).encode("utf-8")
+        self.compressed = gzip.compress(self.body, compresslevel=6)
+        self.etag = f'"v{self.version}"'
+        self.last_modified = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(1700000000 + self.version))
+
+    def change(self) -> None:
+        self.version += 1
+        self._publish()
+
+    async def playlist(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        validators = request.headers.get("if-none-match") or request.headers.get("if-modified-since")
+        if validators:
+            self.conditional += 1
+        if self.force_304 or request.headers.get("if-none-match") == self.etag:
+            self.force_304 = False
+            return web.Response(status=304, headers={"ETag": self.etag})
+
+        headers = {"ETag": self.etag, "Last-Modified": self.last_modified, "Content-Type": "audio/x-mpegurl"}
+        body = self.body
+        if "gzip" in request.headers.get("accept-encoding", ""):
+            body = self.compressed
+            headers["Content-Encoding"] = "gzip"
+        self.bytes_sent += len(body)
+        return web.Response(body=body, headers=headers)
+
+    def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/playlist.m3u", self.playlist)
+        threading.Thread(
+            target=lambda: web.run_app(app, host="127.0.0.1", port=self.port, print=None, handle_signals=False),
+            daemon=True
+        ).start()
+
+def download(processor: M3UProcessor, stub: PlaylistStub) -> Dict:
+    """Um stream_download lido até o fim, com o que passou pela rede"""
+    requests, conditional, sent = stub.requests, stub.conditional, stub.bytes_sent
+    start = time.perf_counter()
+    stream = processor.stream_download(f"http://127.0.0.1:{stub.port}/playlist.m3u")
+    if stream is None:
+        return {"ok": False}
+    with stream:
+        items = sum(1 for line in stream if line.startswith("#EXTINF"))
+    return {
+        "ok": True,
+        "seconds": round(time.perf_counter() - start, 3),
+        "not_modified": stream.not_modified,
+        "items": items,
+        "requests": stub.requests - requests,
+        "conditional_requests": stub.conditional - conditional,
+        "wire_kb": round((stub.bytes_sent - sent) / 1024, 1)
+    }
+
+def run(entries: int, port: int) -> Dict[str, Dict]:
+    stub = PlaylistStub(port, entries)
+    stub.start()
+    time.sleep(1)
+
+    cache_dir = tempfile.mkdtemp(prefix="playlist-bench-")
+    try:
+        processor = M3UProcessor()
+        processor.cache_dir = cache_dir
+        results = {"playlist_kb": round(len(stub.body) / 1024, 1)}
+
+        results["first"] = download(processor, stub)
+        results["unchanged"] = download(processor, stub)
+        stub.change()
+        results["changed"] = download(processor, stub)
+
+        # Cópia local apagada, mas o servidor responde 304 mesmo assim
+        for name in os.listdir(cache_dir):
+            if name.endswith(".m3u.gz"):
+                os.remove(os.path.join(cache_dir, name))
+        stub.force_304 = True
+        results["missing_cache_304"] = download(processor, stub)
+
+        results["checks"] = {
+            "gzip_on_wire": results["first"]["wire_kb"] < results["playlist_kb"] / 2,
+            "unchanged_is_304": results["unchanged"]["not_modified"] and results["unchanged"]["wire_kb"] == 0
+                                and results["unchanged"]["items"] == entries,
+            "changed_refetched": not results["changed"]["not_modified"]
+                                 and results["changed"]["items"] == entries + 1,
+            "missing_cache_refetched": results["missing_cache_304"]["ok"]
+                                       and not results["missing_cache_304"]["not_modified"]
+                                       and results["missing_cache_304"]["items"] == entries + 1
+        }
+        return results
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--port", type=int, default=18800)
+    args = parser.parse_args()
+
+    for name, value in run(args.entries, args.port).items():
+        print(f"{name}: {value}")
+
+if __name__ == "__main__":
+    main()
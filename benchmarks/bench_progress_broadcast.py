@@ -0,0 +1,116 @@
+"""Mensagens de progresso enviadas ao navegador durante downloads paralelos.
+
+`--downloads` itens imprimem progresso a `--lines` linhas por segundo (como
+o yt-dlp com --newline) durante `--seconds` segundos, para `--clients`
+WebSockets de mentira. Compara o envio de cada linha (rate 0) com o
+ProgressAggregator a `--rate` lotes por segundo: mensagens e bytes por
+cliente, tempo de CPU e o maior atraso do loop de eventos.
+
+    python -m benchmarks.bench_progress_broadcast --downloads 6 --lines 50 --clients 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict
+
+from starlette.websockets import WebSocketState
+
+from src.api.core import websocket
+from src.api.core.websocket import ProgressAggregator, broadcast_queue_status
+from src.services.queue_manager import QueueManager
+
+class FakeClient:
+    """WebSocket que só conta o que recebe"""
+
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.last: Dict[str, Dict] = {}
+
+    async def send_text(self, text: str):
+        self.messages += 1
+        self.bytes += len(text)
+        message = json.loads(text)
+        if message["type"] == "progress":
+            updates = [message["data"]]
+        elif message["type"] == "progress_batch":
+            updates = message["data"]
+        else:
+            return
+        for update in updates:
+            self.last[update["item_id"]] = update
+
+async def loop_lag(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lags.append(time.perf_counter() - start - 0.005)
+
+async def run(rate: float, downloads: int, lines: int, seconds: float, clients: int) -> Dict:
+    directory = tempfile.mkdtemp(prefix="progress-bench-")
+    fakes = [FakeClient() for _ in range(clients)]
+    websocket.connected_clients.clear()
+    websocket.connected_clients.update(fakes)
+
+    progress = ProgressAggregator(rate=rate)
+    manager = QueueManager(
+        queue_db=os.path.join(directory, "queue.db"), queue_file=os.path.join(directory, "queue.json"),
+        broadcast_handlers={
+            'queue_status': lambda manager: broadcast_queue_status(manager),
+            'progress': lambda data: progress.update(data['item_id'], data['progress'], data['status'])
+        }
+    )
+    items = [await manager.add_item(f"v{n}", f"http://h{n}/v", "best", "mp4") for n in range(downloads)]
+
+    async def download(item_id: str):
+        await manager.update_progress(item_id, 0, "downloading")
+        total = int(lines * seconds)
+        for line in range(1, total + 1):
+            await asyncio.sleep(1 / lines)
+            await manager.update_progress(item_id, line * 100 / total, "downloading")
+        await manager.complete_item(item_id)
+
+    stop = asyncio.Event()
+    lags: list = []
+    lag_task = asyncio.create_task(loop_lag(stop, lags))
+    for fake in fakes:
+        fake.messages = fake.bytes = 0
+    cpu = time.process_time()
+    await asyncio.gather(*(download(item_id) for item_id in items))
+    await asyncio.sleep(0.1)  # tarefas de broadcast ainda na fila
+    cpu = time.process_time() - cpu
+    stop.set()
+    await lag_task
+
+    manager.store.close()
+    shutil.rmtree(directory, ignore_errors=True)
+    final = fakes[0].last
+    return {
+        "messages_per_client": fakes[0].messages,
+        "kb_per_client": round(fakes[0].bytes / 1024, 1),
+        "cpu_s": round(cpu, 3),
+        "max_loop_lag_ms": round(max(lags) * 1000, 2),
+        "final_status_ok": all(final.get(item_id, {}).get("status") == "completed" for item_id in items)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--downloads", type=int, default=6)
+    parser.add_argument("--lines", type=int, default=50, help="linhas de progresso por segundo por download")
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--clients", type=int, default=3)
+    parser.add_argument("--rate", type=float, default=4, help="lotes por segundo do ProgressAggregator")
+    args = parser.parse_args()
+
+    for label, rate in (("every line", 0), (f"aggregated {args.rate:g} Hz", args.rate)):
+        result = asyncio.run(run(rate, args.downloads, args.lines, args.seconds, args.clients))
+        print(f"{label}: {result}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Streams de uma conta de provedor com limite de conexões, com e sem admissão no proxy.
+
+O provedor local aceita `--cap` conexões por conta; acima disso responde
+509 e derruba todos os streams da conta, como fazem os painéis Xtream.
+`--viewers` players abrem filmes da mesma conta ao mesmo tempo e leem por
+`--seconds` segundos. Sem limite no proxy, o excesso derruba todo mundo;
+com `provider_limits` igual ao limite da conta, os excedentes esperam na
+fila ou recebem 503 e os demais seguem assistindo.
+
+Por fim, `--cap` players pausam (abrem o stream e param de ler) e um novo
+player chega: com `idle_preempt`, o stream parado mais antigo cede a vaga.
+
+    python -m benchmarks.bench_provider_limits --cap 2 --viewers 6
+"""
+import argparse
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Set
+
+import aiohttp
+import uvicorn
+from aiohttp import web
+
+from src.services.proxy_server import ProxyServer
+from src.services.stream_index import StreamIndex
+
+class AccountStub:
+    """Provedor com limite de conexões por conta (usuário na URL), enviando ~10 MB/s por stream"""
+
+    def __init__(self, port: int, cap: int):
+        self.port = port
+        self.cap = cap
+        self.active: Dict[str, Set[asyncio.Transport]] = {}
+        self.kills = 0
+        self.peak = 0
+
+    async def media(self, request: web.Request) -> web.StreamResponse:
+        account = request.match_info["user"]
+        streams = self.active.setdefault(account, set())
+        if len(streams) >= self.cap:
+            # Conta estourada: o painel derruba todas as conexões dela
+            self.kills += 1
+            for transport in list(streams):
+                transport.close()
+            streams.clear()
+            raise web.HTTPBandwidthLimitExceeded()
+
+        response = web.StreamResponse(headers={"Content-Type": "video/mp4", "Content-Length": str(1 << 34)})
+        transport = request.transport
+        streams.add(transport)
+        self.peak = max(self.peak, len(streams))
+        try:
+            await response.prepare(request)
+            while True:
+                await response.write(b"\x47" * 188 * 100)
+                await asyncio.sleep(0.002)
+        except ConnectionError:
+            pass
+        finally:
+            streams.discard(transport)
+        return response
+
+    def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/movie/{user}/{password}/{name}", self.media)
+        threading.Thread(
+            target=lambda: web.run_app(app, host="127.0.0.1", port=self.port, print=None, handle_signals=False),
+            daemon=True
+        ).start()
+
+async def watch(session: aiohttp.ClientSession, url: str, seconds: float) -> Dict:
+    """Assiste por `seconds`; devolve status, bytes e se o stream caiu antes da hora"""
+    start = time.monotonic()
+    received = 0
+    try:
+        async with session.get(url) as response:
+            if response.status != 200:
+                return {"status": response.status, "bytes": 0, "dropped": False, "wait": time.monotonic() - start}
+            wait = time.monotonic() - start
+            while time.monotonic() - start < seconds:
+                chunk = await response.content.readany()
+                if not chunk:
+                    return {"status": 200, "bytes": received, "dropped": True, "wait": wait}
+                received += len(chunk)
+            return {"status": 200, "bytes": received, "dropped": False, "wait": wait}
+    except aiohttp.ClientError:
+        return {"status": 200, "bytes": received, "dropped": True, "wait": time.monotonic() - start}
+
+async def crowd(proxy_port: int, stub_port: int, viewers: int, seconds: float) -> Dict:
+    async with aiohttp.ClientSession() as session:
+        results = await asyncio.gather(*(
+            watch(session, f"http://127.0.0.1:{proxy_port}/proxy?url=http://127.0.0.1:{stub_port}/movie/user/pass/{n}.mp4",
+                  seconds)
+            for n in range(viewers)
+        ))
+    watching = [r for r in results if r["status"] == 200 and not r["dropped"]]
+    return {
+        "watched_to_end": len(watching),
+        "dropped": sum(r["dropped"] for r in results),
+        "refused": sum(r["status"] != 200 for r in results),
+        "statuses": sorted({r["status"] for r in results})
+    }
+
+async def pause_then_arrive(proxy_port: int, stub_port: int, paused: int) -> Optional[float]:
+    """`paused` players abrem e param de ler; quanto tempo o próximo espera para começar"""
+    base = f"http://127.0.0.1:{proxy_port}/proxy?url=http://127.0.0.1:{stub_port}/movie/user/pass"
+    async with aiohttp.ClientSession() as session:
+        held = []
+        for n in range(paused):
+            response = await session.get(f"{base}/p{n}.mp4")
+            await response.content.readany()
+            held.append(response)
+        start = time.monotonic()
+        async with session.get(f"{base}/new.mp4") as response:
+            waited = time.monotonic() - start if response.status == 200 else None
+        for response in held:
+            response.close()
+        return waited
+
+def start_proxy(port: int, **options) -> ProxyServer:
+    proxy = ProxyServer(port=port, stream_index=StreamIndex(":memory:"), live_fanout=False, **options)
+    threading.Thread(
+        target=lambda: uvicorn.run(proxy.app, host="127.0.0.1", port=port, log_level="error"),
+        daemon=True
+    ).start()
+    time.sleep(1.5)
+    return proxy
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cap", type=int, default=2, help="conexões por conta aceitas pelo provedor")
+    parser.add_argument("--viewers", type=int, default=6)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--queue-timeout", type=float, default=1)
+    parser.add_argument("--idle-preempt", type=float, default=2)
+    parser.add_argument("--port", type=int, default=18790)
+    args = parser.parse_args()
+
+    stub = AccountStub(args.port, args.cap)
+    stub.start()
+    scenarios = (
+        ("unlimited", {}),
+        ("limited", {"provider_limits": {f"127.0.0.1:{args.port}": args.cap},
+                     "provider_queue_timeout": args.queue_timeout}),
+    )
+    for offset, (label, options) in enumerate(scenarios, start=1):
+        start_proxy(args.port + offset, **options)
+        stub.kills = stub.peak = 0
+        result = asyncio.run(crowd(args.port + offset, args.port, args.viewers, args.seconds))
+        print(f"{label}: {result}, account_kills: {stub.kills}, provider_peak: {stub.peak}")
+
+    proxy = start_proxy(args.port + 3, provider_limits={f"127.0.0.1:{args.port}": args.cap},
+                        provider_queue_timeout=args.idle_preempt * 3, idle_preempt=args.idle_preempt)
+    waited = asyncio.run(pause_then_arrive(args.port + 3, args.port, args.cap))
+    print(f"preemption: new viewer started after {waited:.2f}s" if waited is not None else "preemption: refused",
+          f"preempted: {proxy.limiter.preempted}, account_kills: {stub.kills}")
+
+if __name__ == "__main__":
+    main()
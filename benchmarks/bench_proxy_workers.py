@@ -0,0 +1,121 @@
+"""Vazão do proxy standalone com 1 e com N workers.
+
+Sobe um provedor local (processo próprio) que entrega arquivos de
+`--file-mb` MB, o proxy em modo multiprocesso e `--clients` processos de
+carga que baixam pelo proxy durante `--seconds` segundos. Cada cenário usa
+um diretório de estado novo.
+
+    python -m benchmarks.bench_proxy_workers --workers 1 4 --clients 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import aiohttp
+from aiohttp import web
+
+def serve_stub(port: int, size: int) -> None:
+    body = b"\x47" * size
+
+    async def media(request: web.Request) -> web.Response:
+        return web.Response(body=body, content_type="video/mp4")
+
+    app = web.Application()
+    app.router.add_get("/movie/{name}", media)
+    web.run_app(app, host="127.0.0.1", port=port, print=None)
+
+async def download_loop(url: str, seconds: float, streams: int) -> int:
+    received = 0
+    deadline = time.monotonic() + seconds
+
+    async def one(session: aiohttp.ClientSession) -> None:
+        nonlocal received
+        while time.monotonic() < deadline:
+            async with session.get(url) as response:
+                async for chunk in response.content.iter_chunked(256 * 1024):
+                    received += len(chunk)
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(one(session) for _ in range(streams)))
+    return received
+
+def client(url: str, seconds: float, streams: int, results) -> None:
+    results.put(asyncio.run(download_loop(url, seconds, streams)))
+
+def wait_ready(url: str, timeout: float = 20) -> None:
+    import urllib.request
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"proxy não respondeu em {url}")
+
+def run_scenario(workers: int, clients: int, streams: int, seconds: float, stub_port: int, port: int) -> Dict:
+    state = tempfile.mkdtemp(prefix="proxy-workers-bench-")
+    config = os.path.join(state, "config.json")
+    with open(config, "w", encoding="utf-8") as f:
+        json.dump({"stream_index_file": os.path.join(state, "index.db"),
+                   "proxy_state_file": os.path.join(state, "state.db")}, f)
+    proxy = subprocess.Popen(
+        [sys.executable, "-m", "src.services.proxy_server", "--workers", str(workers),
+         "--port", str(port), "--config", config]
+    )
+    try:
+        wait_ready(f"http://127.0.0.1:{port}/status")
+        # Arquivos diferentes por cliente: sem fan-out nem cache entre eles
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=client, args=(
+                f"http://127.0.0.1:{port}/proxy?url=http://127.0.0.1:{stub_port}/movie/{n}.mp4",
+                seconds, streams, results))
+            for n in range(clients)
+        ]
+        for process in processes:
+            process.start()
+        received = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+        with __import__("urllib.request").request.urlopen(f"http://127.0.0.1:{port}/metrics?format=json") as r:
+            metrics = json.load(r)
+        return {"workers": workers, "mb_per_sec": received / seconds / 1e6,
+                "workers_reporting": metrics.get("workers", 1), "requests": metrics["requests"]}
+    finally:
+        proxy.terminate()
+        proxy.wait()
+        shutil.rmtree(state, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--clients", type=int, default=os.cpu_count() or 1, help="processos de carga")
+    parser.add_argument("--streams", type=int, default=4, help="downloads simultâneos por processo")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--file-mb", type=float, default=8)
+    parser.add_argument("--stub-port", type=int, default=18780)
+    parser.add_argument("--port", type=int, default=18781)
+    args = parser.parse_args()
+
+    stub = multiprocessing.Process(target=serve_stub, args=(args.stub_port, int(args.file_mb * 1e6)), daemon=True)
+    stub.start()
+    time.sleep(1)
+    try:
+        print(f"cpus: {os.cpu_count()}")
+        for workers in dict.fromkeys(args.workers):
+            result = run_scenario(workers, args.clients, args.streams, args.seconds, args.stub_port, args.port)
+            print(", ".join(f"{k}: {v:,.1f}" if isinstance(v, float) else f"{k}: {v}" for k, v in result.items()))
+    finally:
+        stub.terminate()
+
+if __name__ == "__main__":
+    main()
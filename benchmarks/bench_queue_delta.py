@@ -0,0 +1,122 @@
+"""Tamanho das mensagens `queue_status` com o histórico da fila crescendo.
+
+Uma fila com `--history` itens já concluídos recebe `--events` mudanças
+(novo item, conclusão ou cancelamento). Compara os bytes enviados por
+cliente com a fila inteira a cada mudança (como antes) e com os deltas
+versionados; um cliente de mentira aplica os deltas, perde um deles de
+propósito, faz o resync pelo snapshot e confere que termina igual à fila.
+
+    python -m benchmarks.bench_queue_delta --history 5000 --events 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Dict, Optional
+
+from starlette.websockets import WebSocketState
+
+from src.api.core import websocket
+from src.api.core.websocket import broadcast_queue_status, queue_snapshot_message
+from src.services.queue_manager import QueueItem, QueueManager
+
+class DeltaClient:
+    """Aplica snapshots e deltas como o WebSocketProvider do frontend"""
+
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self, manager: QueueManager, drop_seq: Optional[int] = None):
+        self.manager = manager
+        self.drop_seq = drop_seq
+        self.items: Dict[str, Dict] = {}
+        self.seq: Optional[int] = None
+        self.bytes = 0
+        self.resync_bytes = 0
+        self.resyncs = 0
+
+    def apply_snapshot(self, message: Dict):
+        self.seq = message["seq"]
+        self.items = {item["id"]: item for item in message["data"]}
+
+    async def send_text(self, text: str):
+        message = json.loads(text)
+        if message["type"] != "queue_delta" or self.seq is None or message["seq"] <= self.seq:
+            return
+        if message["seq"] == self.drop_seq:
+            return  # mensagem perdida de propósito
+        self.bytes += len(text)
+        if message["seq"] != self.seq + 1:
+            self.resyncs += 1
+            snapshot = queue_snapshot_message(self.manager)
+            self.resync_bytes += len(json.dumps(snapshot))
+            self.apply_snapshot(snapshot)
+            return
+        self.seq = message["seq"]
+        for item in message["data"]["added"] + message["data"]["changed"]:
+            self.items[item["id"]] = item
+        for item_id in message["data"]["removed"]:
+            self.items.pop(item_id, None)
+
+async def run(history: int, events: int) -> Dict:
+    directory = tempfile.mkdtemp(prefix="queue-delta-bench-")
+    try:
+        manager = QueueManager(queue_db=os.path.join(directory, "queue.db"),
+                               queue_file=os.path.join(directory, "queue.json"))
+        now = datetime.now()
+        for n in range(history):
+            item = QueueItem(id=f"old{n}", filename=f"Filme antigo {n}", url=f"http://h/v/{n}",
+                             format_id="best", output_format="mp4", status="completed",
+                             progress=100.0, created_at=now, completed_at=now)
+            manager.queue[item.id] = item
+
+        client = DeltaClient(manager, drop_seq=events // 2)
+        client.apply_snapshot(queue_snapshot_message(manager))
+        websocket.connected_clients.clear()
+        websocket.connected_clients.add(client)
+        # Mesmo handler da aplicação (settings.py): cada mudança vira um queue_delta
+        manager.broadcast_handlers = {'queue_status': broadcast_queue_status}
+
+        rng = random.Random(1)
+        full_bytes = 0
+        pending = []
+        for n in range(events):
+            if pending and rng.random() < 0.5:
+                item_id = pending.pop(0)
+                if rng.random() < 0.8:
+                    await manager.complete_item(item_id)
+                else:
+                    await manager.cancel_item(item_id)
+            else:
+                pending.append(await manager.add_item(f"novo{n}", f"http://h{n % 4}/n/{n}", "best", "mp4"))
+            full_bytes += len(json.dumps({"type": "queue_status", "data": manager.get_queue_status()}))
+        delta_bytes = client.bytes
+
+        # Limpeza do histórico: um delta com todos os removidos
+        manager.cleanup_old_items(days=-1)
+        await broadcast_queue_status(manager)
+        manager.store.close()
+        expected = {item["id"]: item for item in manager.get_queue_status()}
+        return {
+            "full_kb_per_event": round(full_bytes / events / 1024, 2),
+            "delta_kb_per_event": round(delta_bytes / events / 1024, 3),
+            "resyncs": client.resyncs,
+            "resync_kb": round(client.resync_bytes / 1024, 1),
+            "cleanup_delta_kb": round((client.bytes - delta_bytes) / 1024, 1),
+            "client_in_sync": client.items == expected
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=5000, help="itens concluídos já na fila")
+    parser.add_argument("--events", type=int, default=200)
+    args = parser.parse_args()
+    print(asyncio.run(run(args.history, args.events)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Custo de agendamento da fila de downloads com um downloader de mentira.
+
+Enfileira `--jobs` itens que "baixam" em `--job-ms` milissegundos e mede
+quanto o total passa do ideal (jobs × duração / workers). Compara o
+despachante por eventos (QueueManager.dispatch) com o laço antigo do
+QueueProcessor, que chamava process_queue e dormia `--poll-interval`
+segundos; por ser lento, o laço antigo roda com `--poll-jobs` itens.
+
+    python -m benchmarks.bench_queue_dispatch --jobs 1000 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict
+
+from src.services.queue_manager import QueueManager
+
+class StubDownloader:
+    """Faz o papel do VideoHandler: cada download só espera `job_time` segundos"""
+
+    def __init__(self, job_time: float, directory: str):
+        self.job_time = job_time
+        self.directories = {"download_dir": directory}
+
+    async def download_video(self, url, output_path, format_id="best", item_id=None,
+                             on_process=None, on_progress=None):
+        await asyncio.sleep(self.job_time)
+        if on_progress:
+            await on_progress(100)
+        return None, True
+
+async def run(mode: str, jobs: int, workers: int, job_time: float, poll_interval: float) -> Dict[str, float]:
+    directory = tempfile.mkdtemp(prefix="queue-bench-")
+    try:
+        manager = QueueManager(max_workers=workers, max_per_host=0,
+                               queue_db=os.path.join(directory, "queue.db"),
+                               queue_file=os.path.join(directory, "queue.json"))
+        downloader = StubDownloader(job_time, directory)
+
+        start = time.perf_counter()
+        for n in range(jobs):
+            await manager.add_item(f"job{n}", f"http://host{n % 8}.local/v/{n}", "best", "mp4")
+        enqueued = time.perf_counter() - start
+
+        if mode == "event":
+            manager.start_dispatcher(downloader)
+            while manager.processing_queue or manager.running:
+                async with manager.work_changed:
+                    await manager.work_changed.wait()
+            manager.dispatcher.cancel()
+        else:
+            # O laço antigo: despacha o que der e dorme
+            while manager.processing_queue or manager.running:
+                await manager.process_queue(downloader)
+                await asyncio.sleep(poll_interval)
+
+        elapsed = time.perf_counter() - start
+        ideal = jobs * job_time / workers
+        completed = sum(item.status == "completed" for item in manager.queue.values())
+        return {
+            "jobs": jobs,
+            "completed": completed,
+            "enqueue_s": enqueued,
+            "elapsed_s": elapsed,
+            "ideal_s": ideal,
+            "overhead_ms_per_job": (elapsed - ideal) / jobs * 1000
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--job-ms", type=float, default=1)
+    parser.add_argument("--poll-interval", type=float, default=5)
+    parser.add_argument("--poll-jobs", type=int, default=12)
+    args = parser.parse_args()
+
+    for mode, jobs in (("event", args.jobs), ("poll", args.poll_jobs)):
+        result = asyncio.run(run(mode, jobs, args.workers, args.job_ms / 1000, args.poll_interval))
+        print(f"{mode}: " + ", ".join(
+            f"{k}: {v:,.3f}" if isinstance(v, float) else f"{k}: {v}" for k, v in result.items()
+        ))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Tempo até o primeiro byte no proxy para URLs que passam por redirecionamentos.
+
+Sobe um provedor local em que a URL da playlist redireciona para um
+balanceador, que redireciona para a borda que entrega a mídia; cada salto
+paga `--hop-ms` de latência. Mede o TTFB de trocas de canal (requisições
+sequenciais às mesmas URLs) com e sem o cache de redirecionamentos, e
+confere que a borda respondendo 403 faz o proxy voltar à origem.
+
+    python -m benchmarks.bench_redirect_cache --channels 10 --rounds 5
+"""
+import argparse
+import asyncio
+import threading
+import time
+from typing import Dict, List
+
+import aiohttp
+import uvicorn
+from aiohttp import web
+
+from src.services.proxy_server import ProxyServer
+from src.services.stream_index import StreamIndex
+
+class RedirectingStub:
+    """origem /live/<n> → /lb/<n> → /edge/<n>?token=..."""
+
+    def __init__(self, port: int, hop: float):
+        self.port = port
+        self.hop = hop
+        self.token = "a"
+        self.requests = 0
+
+    async def origin(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.hop)
+        raise web.HTTPFound(f"/lb/{request.match_info['channel']}")
+
+    async def balancer(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.hop)
+        raise web.HTTPFound(f"/edge/{request.match_info['channel']}?token={self.token}")
+
+    async def edge(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await asyncio.sleep(self.hop)
+        if request.query.get("token") != self.token:
+            raise web.HTTPForbidden()
+        return web.Response(body=b"\x47" * 188 * 100, content_type="video/mp4")
+
+    def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/live/{channel}", self.origin)
+        app.router.add_get("/lb/{channel}", self.balancer)
+        app.router.add_get("/edge/{channel}", self.edge)
+        threading.Thread(
+            target=lambda: web.run_app(app, host="127.0.0.1", port=self.port, print=None, handle_signals=False),
+            daemon=True
+        ).start()
+
+async def zap(proxy_port: int, stub_port: int, channels: int, rounds: int) -> List[float]:
+    timings = []
+    async with aiohttp.ClientSession() as session:
+        for _ in range(rounds):
+            for channel in range(channels):
+                url = f"http://127.0.0.1:{proxy_port}/proxy?url=http://127.0.0.1:{stub_port}/live/{channel}.mp4"
+                start = time.perf_counter()
+                async with session.get(url) as response:
+                    await response.content.readany()
+                    timings.append(time.perf_counter() - start)
+                    if response.status != 200:
+                        raise RuntimeError(f"proxy respondeu {response.status}")
+                    await response.read()
+    return sorted(timings)
+
+def run(channels: int, rounds: int, hop_ms: float, stub_port: int, proxy_port: int) -> Dict[str, float]:
+    stub = RedirectingStub(stub_port, hop_ms / 1000)
+    stub.start()
+    results = {}
+    for label, ttl, port in (("uncached", 0, proxy_port), ("cached", 300, proxy_port + 1)):
+        proxy = ProxyServer(port=port, stream_index=StreamIndex(":memory:"), redirect_ttl=ttl)
+        threading.Thread(
+            target=lambda: uvicorn.run(proxy.app, host="127.0.0.1", port=port, log_level="warning"),
+            daemon=True
+        ).start()
+        time.sleep(1.5)
+
+        stub.requests = 0
+        timings = asyncio.run(zap(port, stub_port, channels, rounds))
+        results[f"{label}_ttfb_p50_ms"] = timings[len(timings) // 2] * 1000
+        results[f"{label}_ttfb_p90_ms"] = timings[int(len(timings) * 0.9)] * 1000
+        results[f"{label}_upstream_requests"] = stub.requests
+
+        if ttl:
+            # Token trocado na borda: a URL final em cache passa a dar 403
+            stub.token = "b"
+            asyncio.run(zap(port, stub_port, channels, 1))
+            stats = proxy.redirect_cache.stats()
+            results.update({f"cache_{name}": value for name, value in stats.items()})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--hop-ms", type=float, default=40, help="latência de cada salto do provedor")
+    parser.add_argument("--stub-port", type=int, default=18768)
+    parser.add_argument("--proxy-port", type=int, default=18769)
+    args = parser.parse_args()
+
+    results = run(args.channels, args.rounds, args.hop_ms, args.stub_port, args.proxy_port)
+    for name, value in results.items():
+        print(f"{name}: {value:,.2f}" if isinstance(value, float) else f"{name}: {value}")
+
+if __name__ == "__main__":
+    main()
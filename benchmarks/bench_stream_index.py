@@ -0,0 +1,76 @@
+"""Consultas ao índice de streams (/proxy/s/<id>) com muitas entradas.
+
+Preenche o índice em lotes, como a sincronização faz, simula uma troca de
+token em todas as URLs e mede a latência de resolve() com ids aleatórios.
+
+    python -m benchmarks.bench_stream_index --entries 1000000
+"""
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, List
+
+from src.services.stream_index import StreamIndex
+
+BATCH = 5000
+
+def make_id(n: int) -> str:
+    return hashlib.blake2b(str(n).encode(), digest_size=8).hexdigest()
+
+def fill(index: StreamIndex, entries: int, token: str) -> float:
+    start = time.perf_counter()
+    index.begin()
+    for first in range(0, entries, BATCH):
+        index.update(
+            (make_id(n), f"http://provider.example/movie/user/{token}/{n}.mp4", "movie")
+            for n in range(first, min(first + BATCH, entries))
+        )
+    index.prune()
+    return time.perf_counter() - start
+
+def lookups(index: StreamIndex, entries: int, count: int) -> List[float]:
+    ids = [make_id(random.randrange(entries)) for _ in range(count)]
+    timings = []
+    for stream_id in ids:
+        start = time.perf_counter()
+        if index.resolve(stream_id) is None:
+            raise RuntimeError(f"id não encontrado: {stream_id}")
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)
+
+def run(entries: int, count: int) -> Dict[str, float]:
+    root = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    directory = tempfile.mkdtemp(prefix="stream-index-bench-", dir=root)
+    try:
+        index = StreamIndex(os.path.join(directory, "index.db"))
+        results = {"fill_sec": fill(index, entries, "token-a")}
+        # Troca de token: todas as URLs mudam, nenhum .strm precisaria ser reescrito
+        results["rotate_sec"] = fill(index, entries, "token-b")
+        index.close()
+
+        # O proxy abre sua própria conexão, como em produção
+        reader = StreamIndex(os.path.join(directory, "index.db"))
+        timings = lookups(reader, entries, count)
+        reader.close()
+        results["lookup_p50_us"] = timings[len(timings) // 2] * 1e6
+        results["lookup_p99_us"] = timings[int(len(timings) * 0.99)] * 1e6
+        results["lookup_max_us"] = timings[-1] * 1e6
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for name, value in run(args.entries, args.lookups).items():
+        print(f"{name}: {value:,.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Vazão do StrmWriter contra a escrita sequencial anterior.
+
+Roda contra um diretório local (tmpfs quando /dev/shm existe) e contra um
+diretório "lento", em que cada operação no sistema de arquivos paga uma
+latência fixa, simulando o round-trip de NFS/SMB: criação de diretório,
+escrita de arquivo (open/write/close) e rename. O StrmWriter paga também o
+rename do temporário, que a escrita sequencial não faz.
+
+    python -m benchmarks.bench_strm_writer --entries 20000 --latency-ms 2
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from src.models.m3u_processor import M3UProcessor
+from src.services.strm_writer import StrmWriter
+from .synthetic import generate_lines
+
+class ThrottledStrmWriter(StrmWriter):
+    def __init__(self, latency: float, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+
+    def _ensure_dir(self, directory: str) -> None:
+        if directory not in self.created_dirs:
+            time.sleep(self.latency)
+        super()._ensure_dir(directory)
+
+    def _write_file(self, path: str, content: str) -> None:
+        # Mesmas operações do StrmWriter._write_file, cada uma com o seu round-trip
+        directory, filename = os.path.split(path)
+        tmp_path = os.path.join(directory, f".{filename}.{threading.get_ident()}.tmp")
+        time.sleep(self.latency)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        time.sleep(self.latency)
+        os.replace(tmp_path, path)
+
+def build_jobs(entries: int, base_dir: str) -> List[Tuple[str, str]]:
+    processor = M3UProcessor()
+    items = processor.iter_items(generate_lines(entries))
+    jobs = {}
+    for item in items:
+        sub = "series" if item.is_series else "movies"
+        jobs[processor.get_strm_path(item, os.path.join(base_dir, sub))] = processor.get_strm_content(item)
+    return list(jobs.items())
+
+def sequential(jobs: List[Tuple[str, str]], latency: float) -> None:
+    """Comportamento anterior: makedirs + open/write/close por item"""
+    for path, content in jobs:
+        if latency:
+            time.sleep(latency)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if latency:
+            time.sleep(latency)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+def parallel(jobs: List[Tuple[str, str]], latency: float, workers: int) -> None:
+    writer = ThrottledStrmWriter(latency, max_workers=workers) if latency else StrmWriter(max_workers=workers)
+    with writer:
+        for path, content in jobs:
+            writer.write(path, content)
+
+def run(entries: int, latency_ms: float, workers: int) -> Dict[str, float]:
+    root = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    results = {}
+    for label, latency in (("local", 0.0), ("throttled", latency_ms / 1000)):
+        for name in ("sequential", "writer"):
+            base_dir = tempfile.mkdtemp(prefix="strm-bench-", dir=root)
+            try:
+                jobs = build_jobs(entries, base_dir)
+                start = time.perf_counter()
+                if name == "sequential":
+                    sequential(jobs, latency)
+                else:
+                    parallel(jobs, latency, workers)
+                elapsed = time.perf_counter() - start
+                results[f"{label}_{name}_files_per_sec"] = len(jobs) / elapsed
+            finally:
+                shutil.rmtree(base_dir, ignore_errors=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=20_000)
+    parser.add_argument("--latency-ms", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    for name, value in run(args.entries, args.latency_ms, args.workers).items():
+        print(f"{name}: {value:,.0f}")
+
+if __name__ == "__main__":
+    main()
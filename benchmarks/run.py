@@ -0,0 +1,228 @@
+"""Benchmark por estágio do pipeline playlist → STRM, mais a execução completa.
+
+Estágios medidos sobre a mesma playlist sintética:
+    load         leitura do arquivo em fluxo (M3UProcessor.stream_file)
+    parse        tokenização das linhas #EXTINF (parse_extinf)
+    classify     montagem dos itens e classificação filme/série com o caminho do .strm
+    create_strm  escrita individual com M3UProcessor.create_strm num diretório temporário
+    end_to_end   AppController.process_playlist num diretório temporário: primeira
+                 sincronização (tudo escrito) e uma segunda sem mudanças
+
+    python -m benchmarks.run --entries 100000 --noise 0.1 --output results.json
+    python -m benchmarks.run --entries 100000 --noise 0.1 --compare results.json
+
+Os resultados são gravados em JSON junto com os parâmetros, a versão
+(commit do git) e o ambiente, para comparar execuções entre versões.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from src.controllers.app_controller import AppController
+from src.models.m3u_processor import M3UProcessor, is_valid_item, parse_extinf
+from .synthetic import write_playlist
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+def _best_of(repeat: int, func: Callable[[], int]) -> Dict[str, float]:
+    """Executa `func` `repeat` vezes e guarda a melhor; `func` devolve o nº de unidades processadas"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best[0]:
+            best = (elapsed, count)
+    elapsed, count = best
+    return {"seconds": elapsed, "count": count, "per_sec": count / elapsed if elapsed else 0.0}
+
+def bench_load(processor: M3UProcessor, path: str, repeat: int) -> Dict[str, float]:
+    def load():
+        with processor.stream_file(path) as stream:
+            return sum(1 for _ in stream)
+    return _best_of(repeat, load)
+
+def bench_parse(info_lines: List[str], repeat: int) -> Dict[str, float]:
+    def parse():
+        for line in info_lines:
+            parse_extinf(line)
+        return len(info_lines)
+    return _best_of(repeat, parse)
+
+def bench_classify(processor: M3UProcessor, lines: List[str], base_dirs: Dict[str, str],
+                   repeat: int) -> Dict[str, float]:
+    def classify():
+        items = processor.iter_items(lines, is_valid_item)
+        return sum(1 for _ in processor.iter_entries(items, base_dirs))
+    return _best_of(repeat, classify)
+
+def bench_create_strm(processor: M3UProcessor, lines: List[str], root: str, limit: int) -> Dict[str, float]:
+    items = []
+    for item in processor.iter_items(lines, is_valid_item):
+        items.append(item)
+        if len(items) >= limit:
+            break
+
+    base_dir = tempfile.mkdtemp(prefix="create-strm-", dir=root)
+    try:
+        def create():
+            for item in items:
+                processor.create_strm(item, base_dir)
+            return len(items)
+        return _best_of(1, create)
+    finally:
+        shutil.rmtree(base_dir, ignore_errors=True)
+
+def bench_end_to_end(path: str, root: str, workers: int) -> Dict[str, Dict[str, Any]]:
+    work_dir = tempfile.mkdtemp(prefix="end-to-end-", dir=root)
+    try:
+        controller = AppController()
+        # Manifesto, índice de streams e cache ficam no diretório temporário,
+        # nunca nos de data/ da instalação (prune apagaria os ids reais)
+        controller.config.update({
+            "manifest_file": os.path.join(work_dir, "strm_manifest.db"),
+            "stream_index_file": os.path.join(work_dir, "stream_index.db"),
+            "playlist_cache_dir": os.path.join(work_dir, "playlist_cache"),
+            "workers": workers,
+            "keep_playlist": False,
+        })
+        controller.processor.cache_dir = controller.get_path("playlist_cache_dir")
+        config = {
+            **controller.config,
+            "use_file": True,
+            "m3u_file": path,
+            "process_movies": True,
+            "process_series": True,
+            "movies_dir": os.path.join(work_dir, "filmes"),
+            "series_dir": os.path.join(work_dir, "series"),
+        }
+
+        results = {}
+        for label in ("initial", "noop"):
+            start = time.perf_counter()
+            stats = controller.process_playlist(config)
+            elapsed = time.perf_counter() - start
+            results[label] = {"seconds": elapsed, "stats": stats}
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def run(entries: int, seed: int, series_ratio: float, noise: float, repeat: int,
+        strm_limit: int, workers: int, root: Optional[str]) -> Dict[str, Any]:
+    processor = M3UProcessor()
+    base_dirs = {"series": "/strm/series", "movie": "/strm/movies"}
+    playlist_dir = tempfile.mkdtemp(prefix="playlist-", dir=root)
+    try:
+        path = write_playlist(os.path.join(playlist_dir, "playlist.m3u"), entries, seed, series_ratio, noise)
+        with processor.stream_file(path) as stream:
+            lines = list(stream)
+        info_lines = [line for line in lines if line.startswith("#EXTINF")]
+
+        stages = {
+            "load": bench_load(processor, path, repeat),
+            "parse": bench_parse(info_lines, repeat),
+            "classify": bench_classify(processor, lines, base_dirs, repeat),
+            "create_strm": bench_create_strm(processor, lines, root, strm_limit),
+        }
+        stages["load"]["bytes"] = os.path.getsize(path)
+        end_to_end = bench_end_to_end(path, root, workers)
+    finally:
+        shutil.rmtree(playlist_dir, ignore_errors=True)
+
+    return {
+        "revision": _git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "temp_dir": root or tempfile.gettempdir(),
+        },
+        "params": {
+            "entries": entries,
+            "seed": seed,
+            "series_ratio": series_ratio,
+            "noise": noise,
+            "repeat": repeat,
+            "strm_limit": strm_limit,
+            "workers": workers,
+        },
+        "stages": stages,
+        "end_to_end": end_to_end,
+    }
+
+def _metrics(results: Dict[str, Any]) -> Dict[str, float]:
+    """Tempos comparáveis entre duas execuções (menor é melhor)"""
+    metrics = {f"{name}.seconds": stage["seconds"] for name, stage in results["stages"].items()}
+    for name, run_ in results["end_to_end"].items():
+        metrics[f"end_to_end.{name}.seconds"] = run_["seconds"]
+    return metrics
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[str]:
+    """Imprime a razão atual/base de cada tempo e devolve os que pioraram além de `threshold`"""
+    if baseline.get("params") != current.get("params"):
+        print("Aviso: parâmetros diferentes entre as execuções; a comparação é aproximada")
+
+    regressions = []
+    old = _metrics(baseline)
+    for name, seconds in _metrics(current).items():
+        if not old.get(name):
+            continue
+        ratio = seconds / old[name]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  <- regressão"
+        print(f"{name}: {old[name]:.3f}s -> {seconds:.3f}s ({ratio:.2f}x){flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--series-ratio", type=float, default=0.4)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--repeat", type=int, default=3, help="execuções por estágio (vale a melhor)")
+    parser.add_argument("--strm-limit", type=int, default=10_000, help="máximo de itens no estágio create_strm")
+    parser.add_argument("--workers", type=int, default=1, help="workers do process_playlist")
+    parser.add_argument("--tmp-dir", default=None, help="diretório dos arquivos temporários")
+    parser.add_argument("--output", help="grava os resultados neste arquivo JSON")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="piora tolerada na comparação")
+    args = parser.parse_args()
+
+    results = run(args.entries, args.seed, args.series_ratio, args.noise, args.repeat,
+                  args.strm_limit, args.workers, args.tmp_dir)
+
+    for name, stage in results["stages"].items():
+        print(f"{name}: {stage['seconds']:.3f}s ({stage['per_sec']:,.0f}/s)")
+    for name, run_ in results["end_to_end"].items():
+        print(f"end_to_end.{name}: {run_['seconds']:.3f}s {run_['stats']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+        print(f"Resultados gravados em {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print()
+        if compare(baseline, results, args.threshold):
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Gerador determinístico de playlists M3U sintéticas"""
+import random
+from typing import Iterator
+
+MOVIE_GROUPS = ["Filmes | Ação", "Filmes | Drama", "Filmes | Comédia"]
+SERIES_GROUPS = ["Séries | Drama", "Séries | Crime"]
+CHANNEL_GROUPS = ["Canais | Esportes", "Canais | Notícias"]
+GROUPS = MOVIE_GROUPS + SERIES_GROUPS
+
+def generate_lines(entries: int, seed: int = 42, series_ratio: float = 0.4,
+                   noise: float = 0.0) -> Iterator[str]:
+    """Gera as linhas de uma playlist com `entries` itens (#EXTINF + URL).
+
+    Args:
+        entries: quantidade de itens
+        seed: semente; a mesma combinação de parâmetros gera sempre a mesma playlist
+        series_ratio: fração dos itens que são episódios de série
+        noise: probabilidade de cada item ter alguma irregularidade vista em
+            listas reais (atributos extras, sem tvg-name, aspas ou vírgulas no
+            título, diretivas #EXTVLCOPT, linhas em branco, canais ao vivo)
+    """
+    rng = random.Random(seed)
+    yield "#EXTM3U"
+    for i in range(entries):
+        kind = rng.randrange(6) if rng.random() < noise else None
+
+        if kind == 5:
+            name = f"Canal {i} HD"
+            yield f'#EXTINF:-1 tvg-id="canal{i}" tvg-name="{name}" group-title="{rng.choice(CHANNEL_GROUPS)}",{name}'
+            yield f"http://provider.example.com/live/user/pass/{i}.ts"
+            continue
+
+        if rng.random() < series_ratio:
+            group = rng.choice(SERIES_GROUPS)
+            name = f"Serie {i % 5000} S{rng.randint(1, 9):02d}E{rng.randint(1, 24):02d}"
+            url = f"http://provider.example.com/series/user/pass/{i}.mkv"
+        else:
+            group = rng.choice(MOVIE_GROUPS)
+            name = f"Filme {i}"
+            url = f"http://provider.example.com/movie/user/pass/{i}.mp4"
+
+        attributes = f'tvg-id="{i}" tvg-name="{name}" tvg-logo="http://img.example.com/{i}.jpg" group-title="{group}"'
+        display_name = name
+        if kind == 0:
+            attributes += f' tvg-chno="{i}" catchup="default" tvg-country="BR" tvg-language="Portuguese"'
+        elif kind == 1:
+            attributes = f'tvg-id="{i}" tvg-logo="http://img.example.com/{i}.jpg" group-title="{group}"'
+        elif kind == 2:
+            display_name = f'{name}, Versão "Estendida"'
+
+        yield f"#EXTINF:-1 {attributes},{display_name}"
+        if kind == 3:
+            yield "#EXTVLCOPT:http-user-agent=Mozilla/5.0"
+        elif kind == 4:
+            yield ""
+        yield url
+
+def write_playlist(path: str, entries: int, seed: int = 42, series_ratio: float = 0.4,
+                   noise: float = 0.0) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        for line in generate_lines(entries, seed, series_ratio, noise):
+            f.write(line + "\n")
+    return path
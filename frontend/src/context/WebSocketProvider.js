@@ -10,6 +10,8 @@ export function WebSocketProvider({ children }) {
   const reconnectTimeout = useRef(null);
   const wsRef = useRef(null);
   const mountedRef = useRef(false);
+  // Versão da fila já aplicada; null até chegar o primeiro snapshot
+  const queueSeq = useRef(null);
 
   const connect = useCallback(() => {
     if (globalWs?.readyState === WebSocket.OPEN) {
@@ -35,6 +37,7 @@ export function WebSocketProvider({ children }) {
     ws.onopen = () => {
       console.log('WebSocket conectado');
       setIsConnected(true);
+      queueSeq.current = null;
       ws.send(JSON.stringify({ type: 'get_status' }));
     };
 
@@ -47,7 +50,27 @@ export function WebSocketProvider({ children }) {
         
         if (data.type === 'queue_status') {
           console.log('Atualizando status da fila:', data.data);
+          queueSeq.current = data.seq ?? null;
           setQueueStatus(data.data || []);
+        } else if (data.type === 'queue_delta') {
+          if (queueSeq.current === null || data.seq <= queueSeq.current) return;
+          if (data.seq !== queueSeq.current + 1) {
+            // Perdeu algum delta: pede a fila inteira de novo
+            queueSeq.current = null;
+            ws.send(JSON.stringify({ type: 'get_status' }));
+            return;
+          }
+          queueSeq.current = data.seq;
+          const { added = [], changed = [], removed = [] } = data.data || {};
+          const updates = new Map([...added, ...changed].map(item => [item.id, item]));
+          const removedIds = new Set(removed);
+          setQueueStatus(prev => {
+            const known = new Set(prev.map(item => item.id));
+            return prev
+              .filter(item => !removedIds.has(item.id))
+              .map(item => updates.get(item.id) || item)
+              .concat([...updates.values()].filter(item => !known.has(item.id)));
+          });
         } else if (data.type === 'progress') {
           console.log('Atualizando progresso:', data.data);
           setQueueStatus(prev => prev.map(item => 
@@ -55,6 +78,13 @@ export function WebSocketProvider({ children }) {
               ? { ...item, progress: data.data.progress, status: data.data.status }
               : item
           ));
+        } else if (data.type === 'progress_batch') {
+          // Último progresso de cada item em download, enviado em lote algumas vezes por segundo
+          const updates = new Map((data.data || []).map(update => [update.item_id, update]));
+          setQueueStatus(prev => prev.map(item => {
+            const update = updates.get(item.id);
+            return update ? { ...item, progress: update.progress, status: update.status } : item;
+          }));
         }
       } catch (error) {
         console.error('Erro ao processar mensagem:', error);
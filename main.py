@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 from src.views.main_window import MainWindow
 from src.services.system_tray import SystemTray
-from src.api.app import app
+from src.api.app import app, services
 import threading
+import multiprocessing
 import uvicorn
 import logging
 import signal
@@ -54,7 +55,7 @@ def main():
 
     try:
         # Criar a interface principal
-        app_window = MainWindow()
+        app_window = MainWindow(controller=services["app_controller"])
         
         # Iniciar system tray
         tray = SystemTray(app_window)
@@ -79,4 +80,7 @@ def main():
         sys.exit(0)
 
 if __name__ == "__main__":
+    # Executável do PyInstaller: os processos do parse paralelo (workers > 1)
+    # param aqui em vez de abrir outra interface
+    multiprocessing.freeze_support()
     main()
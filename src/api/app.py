@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import media, queue, config, content, websocket, stats
+from .routers import media, queue, config, content, websocket, stats, playlist
 from .core.settings import setup_cors, initialize_services
 from .workers.queue_processor import QueueProcessor
 import asyncio
@@ -54,5 +54,6 @@ app.include_router(media.router, prefix="/api/media", tags=["media"])
 app.include_router(queue.router, prefix="/api/queue", tags=["queue"])
 app.include_router(config.router, prefix="/api/config", tags=["config"])
 app.include_router(content.router, prefix="/api/content", tags=["content"])
+app.include_router(playlist.router, prefix="/api/playlist", tags=["playlist"])
 app.include_router(stats.router, prefix="/api/stats", tags=["stats"])
 app.include_router(websocket.router, prefix="/ws", tags=["websocket"])
@@ -2,8 +2,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import os
 import asyncio
+from typing import Dict, Optional
 from dotenv import load_dotenv
-from .websocket import broadcast_progress, broadcast_queue_status
+from .websocket import ProgressAggregator, broadcast_queue_status
 
 # Usar importações relativas
 from ...services.video_handler import VideoHandler
@@ -22,15 +23,35 @@ def setup_cors(app: FastAPI):
         allow_headers=["*"],
     )
 
-def initialize_services():
+# Serviços da API, criados uma vez e compartilhados por app.py e todos os routers
+_services: Optional[Dict] = None
+
+def initialize_services() -> Dict:
+    """Serviços compartilhados da API.
+
+    A fila, o controller e o progresso guardam estado (itens em andamento,
+    versão enviada aos clientes, playlist em memória); com uma instância
+    por router, o WebSocket não via os itens enfileirados pelo router de
+    mídia nem conseguia cancelar seus downloads.
+    """
+    global _services
+    if _services is None:
+        _services = _create_services()
+    return _services
+
+def _create_services() -> Dict:
     app_controller = AppController()
     
     # Garantir que os diretórios existam primeiro
     app_controller.ensure_directories()
     
+    # Progresso dos downloads vai aos clientes em lotes, até `progress_rate` por segundo
+    download_options = app_controller.get("download", {})
+    progress = ProgressAggregator(rate=download_options.get("progress_rate", 4))
+
     # Configurar VideoHandler com diretórios
     video_handler = VideoHandler(
-        progress_callback=broadcast_progress,
+        progress_callback=progress.update,
         ffmpeg_options=app_controller.get("ffmpeg", {}),
         download_options=app_controller.get("download", {})
     )
@@ -39,9 +60,11 @@ def initialize_services():
     video_handler.directories = app_controller.get_media_paths()
     
     queue_manager = QueueManager(
+        max_workers=download_options.get("max_parallel", 3),
+        max_per_host=download_options.get("max_parallel_per_host", 2),
         broadcast_handlers={
             'queue_status': lambda manager: broadcast_queue_status(manager),
-            'progress': lambda data: broadcast_progress(
+            'progress': lambda data: progress.update(
                 data['item_id'], 
                 data['progress'], 
                 data['status']
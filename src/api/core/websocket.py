@@ -1,5 +1,6 @@
 from fastapi import WebSocket, status
-from typing import Set
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
 import logging
 from starlette.websockets import WebSocketState
 import json
@@ -8,10 +9,13 @@ connected_clients: Set[WebSocket] = set()
 
 async def safe_send(websocket: WebSocket, message: dict) -> bool:
     """Envia mensagem com tratamento de erro"""
+    return await _send_text(websocket, json.dumps(message))
+
+async def _send_text(websocket: WebSocket, text: str) -> bool:
     try:
         if websocket.client_state == WebSocketState.CONNECTED:
-            logging.debug(f"Sending message: {message}")
-            await websocket.send_text(json.dumps(message)) # Alterado para send_text
+            logging.debug("Sending message: %s", text)
+            await websocket.send_text(text)
             return True
     except Exception as e:
         logging.error(f"Erro ao enviar mensagem: {str(e)}")
@@ -24,20 +28,40 @@ async def safe_send(websocket: WebSocket, message: dict) -> bool:
 async def broadcast_message(message: dict):
     """Envia mensagem para todos os clientes conectados"""
     disconnected = set()
-    
-    for client in connected_clients:
-        if not await safe_send(client, message):
+    # Serializada uma vez só, não uma por cliente
+    text = json.dumps(message)
+
+    for client in list(connected_clients):
+        if not await _send_text(client, text):
             disconnected.add(client)
             
     # Remove clientes desconectados
     connected_clients.difference_update(disconnected)
 
+# Deltas da fila saem um de cada vez, para chegarem a todos na ordem do seq
+queue_delta_lock = asyncio.Lock()
+
+def queue_snapshot_message(queue_manager) -> dict:
+    """Fila inteira, enviada ao conectar e quando o cliente pede resync (get_status)"""
+    snapshot = queue_manager.snapshot()
+    return {"type": "queue_status", "seq": snapshot["seq"], "data": snapshot["items"]}
+
 async def broadcast_queue_status(queue_manager):
-    """Envia status atual da fila para todos os clientes"""
-    await broadcast_message({
-        "type": "queue_status",
-        "data": queue_manager.get_queue_status()
-    })
+    """Envia aos clientes só o que mudou na fila desde o último envio.
+
+    A mensagem `queue_delta` traz os itens adicionados, alterados e
+    removidos e o `seq` da nova versão; um cliente que receber um seq fora
+    de ordem pede o snapshot de novo com `get_status`.
+    """
+    async with queue_delta_lock:
+        delta = queue_manager.take_delta()
+        if delta is None:
+            return
+        await broadcast_message({
+            "type": "queue_delta",
+            "seq": delta.pop("seq"),
+            "data": delta
+        })
 
 async def broadcast_progress(item_id: str, progress: float, status: str):
     """Envia atualização de progresso para todos os clientes"""
@@ -49,5 +73,69 @@ async def broadcast_progress(item_id: str, progress: float, status: str):
             "status": status
         }
     }
-    logging.debug(f"Broadcasting progress: {message}")
+    logging.debug("Broadcasting progress: %s", message)
     await broadcast_message(message)
+
+async def broadcast_progress_batch(updates: List[Dict]):
+    """Envia várias atualizações de progresso numa única mensagem"""
+    await broadcast_message({"type": "progress_batch", "data": updates})
+
+class ProgressAggregator:
+    """Junta o progresso dos downloads e envia no máximo `rate` lotes por segundo.
+
+    O yt-dlp imprime várias linhas de progresso por segundo para cada item;
+    repassar cada uma a cada cliente sobrecarrega o loop e o navegador. Aqui
+    fica só o último valor de cada item, enviado em lote a cada 1/rate
+    segundos. Mudanças de status (pending -> downloading, cancelled...) não
+    esperam: vão na hora, pelo `send_now`.
+    """
+
+    # Status depois dos quais o item não manda mais progresso
+    FINAL_STATUSES = ("completed", "error", "cancelled")
+
+    def __init__(self, send_now: Callable[[str, float, str], Awaitable] = broadcast_progress,
+                 send_batch: Callable[[List[Dict]], Awaitable] = broadcast_progress_batch,
+                 rate: float = 4.0):
+        """
+        Args:
+            rate: lotes por segundo (0 = sem agrupamento, envia cada atualização)
+        """
+        self.send_now = send_now
+        self.send_batch = send_batch
+        self.interval = 1 / rate if rate and rate > 0 else 0
+        self.pending: Dict[str, Dict] = {}
+        self.statuses: Dict[str, Optional[str]] = {}
+        self.flusher: Optional[asyncio.Task] = None
+
+    async def update(self, item_id: str, progress: float, status: Optional[str]):
+        """Registra o progresso de um item; callback do QueueManager/VideoHandler"""
+        previous = self.statuses.get(item_id, False)
+        if status in self.FINAL_STATUSES:
+            self.statuses.pop(item_id, None)
+        else:
+            self.statuses[item_id] = status
+
+        if not self.interval or status != previous:
+            # Transição de status: descarta o valor pendente do item e envia já
+            self.pending.pop(item_id, None)
+            await self.send_now(item_id, progress, status)
+            return
+
+        self.pending[item_id] = {"item_id": item_id, "progress": round(progress, 2), "status": status}
+        if self.flusher is None or self.flusher.done():
+            self.flusher = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        await self.flush()
+
+    async def flush(self):
+        """Envia o lote pendente"""
+        if not self.pending:
+            return
+        updates = list(self.pending.values())
+        self.pending.clear()
+        try:
+            await self.send_batch(updates)
+        except Exception as e:
+            logging.error(f"Erro ao enviar progresso: {str(e)}")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from typing import Optional, Dict, List
 import os
 import asyncio
@@ -130,7 +130,7 @@ async def update_cache():
 @router.get("")
 async def get_content(
     page: int = 1,
-    limit: int = 20,
+    limit: int = Query(20, ge=1),
     search: Optional[str] = None,
     force_refresh: bool = False
 ):
@@ -195,3 +195,65 @@ async def get_content(
     except Exception as e:
         logging.error(f"Erro ao listar conteúdo: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+async def get_playlist():
+    """Playlist compacta em memória, lida sob demanda na primeira consulta.
+
+    É a mesma do controller que sincroniza (GUI e /api/playlist): uma
+    sincronização com keep_playlist a substitui; as demais a descartam,
+    e ela é relida aqui na próxima consulta.
+    """
+    if app_controller.playlist is None:
+        async with LOCK:
+            if app_controller.playlist is None:
+                await asyncio.to_thread(app_controller.load_playlist)
+    return app_controller.playlist
+
+@router.get("/playlist/groups")
+async def get_playlist_groups():
+    """Lista os grupos da playlist com a quantidade de itens"""
+    playlist = await get_playlist()
+    if playlist is None:
+        raise HTTPException(status_code=404, detail="Playlist não configurada ou indisponível")
+    return playlist.group_counts()
+
+@router.get("/playlist")
+async def get_playlist_items(
+    group: Optional[str] = None,
+    type: Optional[str] = None,
+    page: int = 1,
+    limit: int = Query(50, ge=1)
+):
+    """Lista itens da playlist filtrando por grupo e tipo (movie/series)"""
+    playlist = await get_playlist()
+    if playlist is None:
+        raise HTTPException(status_code=404, detail="Playlist não configurada ou indisponível")
+
+    is_series = None if type is None else type == "series"
+    rows = playlist.rows(group=group, is_series=is_series)
+    total_pages = (len(rows) + limit - 1) // limit
+    page = min(max(1, page), total_pages) if total_pages > 0 else 1
+    start_idx = (page - 1) * limit
+
+    return {
+        'items': [
+            {
+                "title": item.title,
+                "url": item.url,
+                "logo": item.logo,
+                "group": item.group,
+                "is_series": item.is_series,
+                "series_name": item.series_name,
+                "season": item.season,
+                "episode": item.episode,
+                "tvg_id": item.tvg_id
+            }
+            for item in (playlist[row] for row in rows[start_idx:start_idx + limit])
+        ],
+        'pagination': {
+            'total': len(rows),
+            'page': page,
+            'limit': limit,
+            'pages': total_pages
+        }
+    }
@@ -97,8 +97,8 @@ async def download_media(
             output_format=output_format
         )
         
-        # Inicia processamento da fila de forma assíncrona
-        asyncio.create_task(queue_manager.process_queue(video_handler))
+        # Garante o despachante da fila; add_item já o acordou
+        queue_manager.start_dispatcher(video_handler)
         
         return {
             "item_id": item_id,
@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Body, HTTPException
+from typing import Optional, Dict, Any
+import asyncio
+import logging
+import time
+from ..core.settings import initialize_services
+from ..core.websocket import broadcast_message
+
+router = APIRouter()
+services = initialize_services()
+app_controller = services["app_controller"]
+
+# Intervalo mínimo entre mensagens de progresso enviadas pelo WebSocket
+PROGRESS_INTERVAL = 0.5
+
+processing = {
+    'task': None,
+    'status': 'idle',
+    'started_at': None,
+    'finished_at': None,
+    'last_broadcast': 0.0
+}
+
+async def broadcast_playlist_progress(progress: Dict[str, Any]):
+    """Repassa o progresso do pipeline aos clientes, no máximo a cada PROGRESS_INTERVAL"""
+    now = time.monotonic()
+    if now - processing['last_broadcast'] < PROGRESS_INTERVAL:
+        return
+    processing['last_broadcast'] = now
+    await broadcast_message({"type": "playlist_progress", "data": progress})
+
+async def run_processing(config: Dict[str, Any]):
+    try:
+        stats = await app_controller.process_playlist_async(config, progress_callback=broadcast_playlist_progress)
+        if stats is None:
+            processing['status'] = 'error'
+        elif app_controller.is_cancelled:
+            processing['status'] = 'cancelled'
+        else:
+            processing['status'] = 'completed'
+    except Exception as e:
+        logging.error(f"Erro ao processar playlist: {str(e)}")
+        processing['status'] = 'error'
+    finally:
+        processing['finished_at'] = time.time()
+        app_controller.release_sync()
+
+    await broadcast_message({"type": "playlist_status", "data": get_status()})
+
+def get_status() -> Dict[str, Any]:
+    return {
+        "status": processing['status'],
+        "started_at": processing['started_at'],
+        "finished_at": processing['finished_at'],
+        "progress": app_controller.progress,
+        "stats": app_controller.last_sync_stats
+    }
+
+@router.post("/process")
+async def process_playlist(overrides: Optional[Dict[str, Any]] = Body(None)):
+    """Inicia a sincronização da playlist configurada (opções em `overrides` valem só para esta execução)"""
+    # Vale também para uma sincronização iniciada pela GUI no mesmo controller
+    if not app_controller.reserve_sync():
+        raise HTTPException(status_code=409, detail="Processamento já em andamento")
+
+    # A GUI pode ter salvo outra configuração desde a inicialização
+    try:
+        app_controller.config = app_controller.load_config()
+        config = {**app_controller.config, **(overrides or {})}
+    except BaseException:
+        app_controller.release_sync()
+        raise
+
+    processing.update({'status': 'running', 'started_at': time.time(), 'finished_at': None, 'last_broadcast': 0.0})
+    processing['task'] = asyncio.create_task(run_processing(config))
+    await broadcast_message({"type": "playlist_status", "data": get_status()})
+    return {"status": "started"}
+
+@router.post("/cancel")
+async def cancel_processing():
+    """Cancela a sincronização em andamento (vale a partir do próximo lote)"""
+    task = processing['task']
+    if task is None or task.done():
+        raise HTTPException(status_code=404, detail="Nenhum processamento em andamento")
+    app_controller.cancel_processing()
+    return {"status": "cancelling"}
+
+@router.get("/status")
+async def get_processing_status():
+    """Estado da última sincronização iniciada pela API"""
+    return get_status()
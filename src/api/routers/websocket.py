@@ -1,5 +1,5 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
-from ..core.websocket import connected_clients, broadcast_queue_status
+from ..core.websocket import connected_clients, broadcast_queue_status, queue_snapshot_message
 from ..core.settings import initialize_services
 import logging
 import json
@@ -20,10 +20,7 @@ async def websocket_endpoint(websocket: WebSocket):
 
         try:
             # Enviar status inicial
-            await websocket.send_json({
-                "type": "queue_status",
-                "data": queue_manager.get_queue_status()
-            })
+            await websocket.send_json(queue_snapshot_message(queue_manager))
 
             # Loop de mensagens
             while True:
@@ -32,10 +29,7 @@ async def websocket_endpoint(websocket: WebSocket):
                     message = await websocket.receive_json()
 
                     if message.get("type") == "get_status":
-                        await websocket.send_json({
-                            "type": "queue_status",
-                            "data": queue_manager.get_queue_status()
-                        })
+                        await websocket.send_json(queue_snapshot_message(queue_manager))
                     elif message.get("type") == "cancel_item":
                         item_id = message.get("item_id")
                         if item_id:
@@ -3,6 +3,9 @@ import logging
 from typing import Optional, Dict
 
 class QueueProcessor:
+    # Intervalo da limpeza dos itens antigos da fila
+    MAINTENANCE_INTERVAL = 24 * 3600
+
     def __init__(self, services: Dict):
         self.services = services
         self.queue_manager = services["queue_manager"]
@@ -10,42 +13,46 @@ class QueueProcessor:
         self.app_controller = services["app_controller"]
         self.running = False
         self.current_task: Optional[asyncio.Task] = None
-        
+        self.maintenance_task: Optional[asyncio.Task] = None
+
         # Configurar diretórios do VideoHandler
         media_paths = self.app_controller.get_media_paths()
         self.video_handler.directories = media_paths
-        
+
     async def start(self):
-        """Inicia o processador de fila"""
+        """Inicia o processador de fila.
+
+        Os itens são despachados pela própria fila assim que chegam ou que um
+        download termina (QueueManager.dispatch); aqui só fica a limpeza
+        periódica.
+        """
         if self.running:
             return
-            
+
         self.running = True
-        cleanup_counter = 0
-        
+        self.current_task = self.queue_manager.start_dispatcher(self.video_handler)
+        self.maintenance_task = asyncio.create_task(self._maintenance())
+        try:
+            await asyncio.gather(self.current_task, self.maintenance_task)
+        except asyncio.CancelledError:
+            pass
+
+    async def _maintenance(self):
+        """Limpa itens antigos da fila a cada MAINTENANCE_INTERVAL segundos"""
         while self.running:
+            await asyncio.sleep(self.MAINTENANCE_INTERVAL)
             try:
-                # Processa itens pendentes
-                await self.queue_manager.process_queue(self.video_handler)
-                
-                # Limpa itens antigos a cada 24 horas
-                cleanup_counter += 1
-                if cleanup_counter >= (24 * 60 * 12):  # 12 checks por minuto = 24h
-                    self.queue_manager.cleanup_old_items()
-                    cleanup_counter = 0
-                
-                # Aguarda 5 segundos antes de verificar novamente
-                await asyncio.sleep(5)
+                self.queue_manager.cleanup_old_items()
             except Exception as e:
-                logging.error(f"Erro no processador de fila: {str(e)}")
-                await asyncio.sleep(10)  # Aguarda mais tempo em caso de erro
-                
+                logging.error(f"Erro na limpeza da fila: {str(e)}")
+
     async def stop(self):
         """Para o processador de fila"""
         self.running = False
-        if self.current_task:
-            self.current_task.cancel()
-            try:
-                await self.current_task
-            except asyncio.CancelledError:
-                pass
+        for task in (self.current_task, self.maintenance_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
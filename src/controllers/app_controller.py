@@ -1,15 +1,38 @@
 import json
 import os
+import asyncio
 import logging
-from typing import Dict, Any
-from ..models.m3u_processor import M3UProcessor
+import threading
+from contextlib import closing
+from itertools import islice
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Iterator
+from ..models.m3u_processor import M3UProcessor, M3UStream, StrmEntry, is_valid_item, logical_key
+from ..models.compact_playlist import CompactPlaylist
+from ..models.playlist_merge import MergedStream, HashIndex
+from ..services.strm_manifest import StrmManifest
+from ..services.strm_writer import StrmWriter
+from ..services.stream_index import StreamIndex
 
 class AppController:
+    # Itens por lote e lotes em espera entre as etapas do pipeline de sincronização
+    PIPELINE_BATCH_SIZE = 500
+    PIPELINE_QUEUE_SIZE = 4
+
     def __init__(self):
         self.config_file = "config.json"
         self.processor = M3UProcessor()
         self.config = self.load_config()
+        self.processor.cache_dir = self.get_path("playlist_cache_dir")
+        self.processor.timeout = tuple(self.get("download_timeout", self.processor.timeout))
+        self.processor.stream_ids = self.get("stream_ids", True)
         self.is_cancelled = False
+        # Uma sincronização por vez, venha da GUI (thread própria) ou da API (loop do servidor)
+        self._sync_lock = threading.Lock()
+        self.last_sync_stats: Optional[Dict[str, int]] = None
+        # Progresso da sincronização em andamento (processados, total estimado, escritos)
+        self.progress: Dict[str, int] = {"processed": 0, "total": 0, "written": 0}
+        # Última playlist lida, em formato compacto (ver keep_playlist)
+        self.playlist: Optional[CompactPlaylist] = None
 
     def load_config(self) -> Dict[str, Any]:
         """Carrega configuração do arquivo config.json ou cria uma nova"""
@@ -40,6 +63,34 @@ class AppController:
             "download_dir": "media/downloads",  # Atualizado diretório padrão
             "processed_dir": "media/processed",  # Atualizado diretório padrão
             "temp_dir": "temp",
+            "manifest_file": "data/strm_manifest.db",
+            "stream_ids": True,  # .strm com id curto (/proxy/s/<id>) em vez da URL do provedor
+            "stream_index_file": "data/stream_index.db",
+            "writer_workers": 8,
+            "playlist_cache_dir": "data/playlist_cache",
+            "download_timeout": [10, 60],  # conexão, leitura (segundos)
+            "workers": 1,  # > 1 lê e classifica a playlist num pool de processos
+            "keep_playlist": False,  # mantém a playlist lida em memória (só com workers = 1)
+
+            # Várias playlists mescladas: [{"url" ou "file", "priority"}], menor prioridade vence.
+            # Vazio usa m3u_url/m3u_file
+            "sources": [],
+            "merge_by": "title",  # "title" (título + temporada/episódio) ou "tvg_id"
+            "fetch_workers": 4,
+
+            # Proxy: hosts alternativos por host ({"cdn1.provedor.tv": ["cdn2.provedor.tv"]}) e
+            # segundos sem resposta até tentar também o próximo espelho
+            "mirror_hosts": {},
+            "hedge_delay": 1.5,
+            # Conexões simultâneas por conta do provedor ("provedor" ou "provedor/usuário"); 0 = sem limite.
+            # O provedor é o host, ou o nome do grupo em provider_groups ({"nome": ["host1", "host2"]})
+            "provider_limits": {},
+            "provider_limit_default": 0,
+            "provider_queue_timeout": 15,
+            "idle_preempt": 0,
+            "provider_groups": {},
+            # Estado comum aos workers do proxy standalone (python -m src.services.proxy_server --workers N)
+            "proxy_state_file": "data/proxy_state.db",
 
             # FFmpeg
             "ffmpeg": {
@@ -54,7 +105,12 @@ class AppController:
             "download": {
                 "max_quality": "1080p",
                 "preferred_format": "mp4",
-                "max_retries": 3
+                "max_retries": 3,
+                # Downloads simultâneos da fila, no total e por servidor de origem
+                "max_parallel": 3,
+                "max_parallel_per_host": 2,
+                # Lotes de progresso enviados por segundo ao navegador (0 = cada linha do yt-dlp)
+                "progress_rate": 4
             }
         }
 
@@ -87,6 +143,19 @@ class AppController:
             return os.path.abspath(path)
         return path
 
+    def get_proxy_options(self) -> Dict[str, Any]:
+        """Argumentos do ProxyServer vindos da configuração"""
+        return {
+            "stream_index": StreamIndex(self.get_path("stream_index_file")),
+            "mirror_hosts": self.get("mirror_hosts", {}),
+            "hedge_delay": self.get("hedge_delay", 1.5),
+            "provider_limits": self.get("provider_limits", {}),
+            "provider_limit_default": self.get("provider_limit_default", 0),
+            "provider_queue_timeout": self.get("provider_queue_timeout", 15),
+            "idle_preempt": self.get("idle_preempt", 0),
+            "provider_groups": self.get("provider_groups", {})
+        }
+
     def ensure_directories(self) -> None:
         """Cria diretórios necessários"""
         for dir_key in ["movies_dir", "series_dir", "download_dir", "processed_dir", "temp_dir"]:
@@ -97,51 +166,315 @@ class AppController:
             except Exception as e:
                 logging.error(f"Erro ao criar diretório {path}: {str(e)}")
 
-    def process_playlist(self, config: Dict[str, Any], callback=None) -> None:
+    def reserve_sync(self) -> bool:
+        """Reserva a sincronização; False se outra (GUI ou API) já está em andamento.
+
+        Quem reserva deve fazê-lo antes de alterar a configuração e chamar
+        release_sync() quando a sincronização terminar.
+        """
+        return self._sync_lock.acquire(blocking=False)
+
+    def release_sync(self) -> None:
+        self._sync_lock.release()
+
+    @property
+    def is_syncing(self) -> bool:
+        return self._sync_lock.locked()
+
+    def process_playlist(self, config: Dict[str, Any], callback=None,
+                         reserved: bool = False) -> Optional[Dict[str, int]]:
+        """Versão bloqueante de process_playlist_async (usada pela GUI, numa thread própria).
+
+        Reserva a sincronização (None se outra está em andamento), a menos que
+        quem chama já a tenha reservado (`reserved`); a reserva é liberada ao
+        terminar.
+        """
+        if not reserved and not self.reserve_sync():
+            logging.warning("Sincronização já em andamento")
+            return None
+        try:
+            return asyncio.run(self.process_playlist_async(config, callback))
+        finally:
+            self.release_sync()
+
+    async def process_playlist_async(self, config: Dict[str, Any], callback=None,
+                                     progress_callback: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None
+                                     ) -> Optional[Dict[str, int]]:
+        """Sincroniza os arquivos .strm com a playlist.
+
+        Só escreve arquivos novos ou alterados e remove os que sumiram da
+        playlist, usando o manifesto da última sincronização. As etapas
+        (download → leitura → filtro → escrita) rodam como um pipeline ligado
+        por filas limitadas: uma etapa lenta segura as anteriores e só alguns
+        lotes ficam em memória. O cancelamento vale a partir do próximo lote.
+        Quem chama deve ter reservado a sincronização com reserve_sync().
+
+        Args:
+            callback: chamado a cada item com (entry, processados, total estimado)
+            progress_callback: corrotina chamada a cada lote escrito com o progresso
+
+        Returns:
+            Optional[Dict[str, int]]: contagem de added/changed/unchanged/removed
+        """
         self.is_cancelled = False
+        # Sem resultado até a sincronização terminar: uma falha não mostra a contagem anterior
+        self.last_sync_stats = None
         self.processor.tmdb_api_key = config["tmdb_api_key"]
-        
-        source = config["m3u_file"] if config["use_file"] else config["m3u_url"]
-        lines = self.processor.load_m3u(source, not config["use_file"])
-        
-        if not lines:
-            return
-
-        def is_valid_item(line: str) -> bool:
-            # Ignora linhas que contêm indicadores de canais de TV
-            invalid_patterns = [
-                "Canais |", 
-                "HD", 
-                "FHD", 
-                "SD",
-                "4K",
-                "CHANNELS",
-                "CHANNEL"
-            ]
-            return not any(pattern in line for pattern in invalid_patterns)
-
-        total_valid_items = sum(1 for i in range(len(lines)) 
-                              if lines[i].startswith("#EXTINF") and is_valid_item(lines[i]))
-
-        processed = 0
-        i = 0
-        while i < len(lines) and not self.is_cancelled:
-            if lines[i].startswith("#EXTINF"):
-                if is_valid_item(lines[i]):  # Usa a mesma função para verificar
-                    url = lines[i + 1] if i + 1 < len(lines) else ""
-                    info = self.processor.extract_info(lines[i], url)
-                    
-                    if callback:
-                        callback(info, processed, total_valid_items)
-                        processed += 1
-
-                    if info.is_series and config["process_series"]:
-                        self.processor.create_strm(info, config["series_dir"])
-                    elif not info.is_series and config["process_movies"]:
-                        self.processor.create_strm(info, config["movies_dir"])
-                i += 2
+        self.progress = {"processed": 0, "total": 0, "written": 0}
+
+        sources = self.get_sources(config)
+        stream = await asyncio.to_thread(self._open_sources, sources)
+        if not stream:
+            return None
+        # Com mais de uma fonte, cada item lógico gera um único .strm (o da fonte prioritária)
+        merge_by = config.get("merge_by", self.get("merge_by", "title")) if len(sources) > 1 else None
+        index = HashIndex()
+
+        base_dirs = {}
+        if config["process_series"]:
+            base_dirs["series"] = os.path.abspath(config["series_dir"])
+        if config["process_movies"]:
+            base_dirs["movie"] = os.path.abspath(config["movies_dir"])
+        kinds = list(base_dirs)
+
+        manifest = StrmManifest(self.get_path("manifest_file"))
+        streams = StreamIndex(self.get_path("stream_index_file")) if self.processor.stream_ids else None
+
+        # Playlist inalterada (304) e mesmas opções da última sincronização:
+        # nada a fazer, nem precisa ler a playlist
+        fingerprint = self._sync_fingerprint(sources, base_dirs, kinds, merge_by)
+        if (stream.not_modified and manifest.get_meta("fingerprint") == fingerprint
+                and (streams is None or not streams.is_empty())):
+            stream.close()
+            manifest.close()
+            if streams is not None:
+                streams.close()
+            self.last_sync_stats = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0}
+            logging.info("Playlist não modificada desde a última sincronização")
+            return self.last_sync_stats
+
+        # A playlist em memória (/api/content/playlist) fica velha com a sincronização:
+        # com keep_playlist ela é recolhida de novo abaixo; sem, é relida sob demanda
+        self.playlist = None
+        writer = StrmWriter(max_workers=self.get("writer_workers", 8))
+        try:
+            manifest.begin()
+            manifest.set_meta("fingerprint", "")
+            if streams is not None:
+                streams.begin()
+
+            # A playlist é lida e processada em fluxo: a memória não cresce com o
+            # tamanho do arquivo e o total é estimado pelos bytes já lidos
+            workers = self.get("workers", 1)
+            if workers > 1:
+                entries = self.processor.iter_entries_parallel(stream, base_dirs, workers, is_valid_item,
+                                                               merge_by=merge_by)
             else:
-                i += 1
+                items = self.processor.iter_items(stream, is_valid_item)
+                if self.get("keep_playlist", False):
+                    playlist = CompactPlaylist()
+                    items = self._collect(items, playlist)
+                entries = self.processor.iter_entries(items, base_dirs, merge_by)
+
+            parsed = asyncio.Queue(maxsize=self.PIPELINE_QUEUE_SIZE)
+            to_write = asyncio.Queue(maxsize=self.PIPELINE_QUEUE_SIZE)
+            with stream, closing(entries):
+                await self._run_stages(
+                    self._parse_stage(entries, parsed),
+                    self._filter_stage(parsed, to_write, manifest, streams, index if merge_by else None,
+                                       stream, callback),
+                    self._write_stage(to_write, writer, manifest, progress_callback)
+                )
+
+            await asyncio.to_thread(writer.close)
+            self.progress.update(total=self.progress["processed"], written=writer.written)
+            if writer.failed:
+                manifest.forget(writer.failed)
+
+            # Uma leitura interrompida (ou sem alguma das fontes) não pode apagar o que não foi visto
+            if not self.is_cancelled and not getattr(stream, "missing", 0):
+                await asyncio.to_thread(self._remove_stale, manifest, kinds)
+                if streams is not None:
+                    # Com um tipo desligado, os .strm dele ficam no disco: os ids também
+                    await asyncio.to_thread(streams.prune,
+                                            None if config["process_movies"] and config["process_series"] else kinds)
+                manifest.set_meta("fingerprint", "" if writer.failed else fingerprint)
+
+            self.last_sync_stats = dict(manifest.stats)
+            if merge_by:
+                self.last_sync_stats["merged"] = index.duplicates
+            logging.info(f"Sincronização concluída: {self.last_sync_stats}")
+            return self.last_sync_stats
+        finally:
+            writer.close()
+            manifest.close()
+            if streams is not None:
+                streams.close()
+
+    async def _run_stages(self, *stages) -> None:
+        """Executa as etapas do pipeline; se uma falhar, as demais são canceladas"""
+        tasks = [asyncio.create_task(stage) for stage in stages]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _parse_stage(self, entries: Iterator[StrmEntry], parsed: asyncio.Queue) -> None:
+        """Lê e classifica a playlist em lotes (numa thread: E/S e CPU bloqueantes)"""
+        while not self.is_cancelled:
+            reading = asyncio.ensure_future(asyncio.to_thread(list, islice(entries, self.PIPELINE_BATCH_SIZE)))
+            try:
+                batch = await asyncio.shield(reading)
+            except asyncio.CancelledError:
+                # Cancelar a tarefa não para a thread, que segue lendo `entries` e o
+                # stream: o lote termina antes de eles serem fechados
+                await asyncio.gather(reading, return_exceptions=True)
+                raise
+            if not batch:
+                break
+            await parsed.put(batch)
+        await parsed.put(None)
+
+    async def _filter_stage(self, parsed: asyncio.Queue, to_write: asyncio.Queue, manifest: StrmManifest,
+                            streams: Optional[StreamIndex], index: Optional[HashIndex], stream: M3UStream,
+                            callback) -> None:
+        """Descarta duplicados e itens sem alteração, repassando só o que precisa ser escrito"""
+        while True:
+            batch = await parsed.get()
+            if batch is None:
+                break
+            # Cancelado: continua esvaziando a fila para a leitura não travar no put
+            if self.is_cancelled:
+                continue
+            pending = await asyncio.to_thread(self._filter_batch, batch, manifest, streams, index, stream, callback)
+            await to_write.put(pending)
+        await to_write.put(None)
+
+    def _filter_batch(self, batch: List[StrmEntry], manifest: StrmManifest, streams: Optional[StreamIndex],
+                      index: Optional[HashIndex], stream: M3UStream, callback) -> List[StrmEntry]:
+        pending = []
+        resolved = []
+        progress = self.progress
+        for entry in batch:
+            if callback:
+                callback(entry, progress["processed"], stream.estimate_total(progress["processed"]))
+            progress["processed"] += 1
+
+            if index is not None and not index.add(entry.key, entry.stream_id):
+                # Duplicados também entram no índice: a URL deles fica como espelho do .strm escrito
+                if entry.stream_id:
+                    resolved.append((index.get(entry.key), entry.url, entry.kind))
+                continue
+            if entry.stream_id:
+                resolved.append((entry.stream_id, entry.url, entry.kind))
+            if manifest.track(entry.path, entry.content, entry.url, entry.title, entry.kind):
+                pending.append(entry)
+        # URLs novas (token trocado) entram no índice; o .strm só muda se o id mudar
+        if streams is not None and resolved:
+            streams.update(resolved)
+        progress["total"] = stream.estimate_total(progress["processed"])
+        return pending
+
+    async def _write_stage(self, to_write: asyncio.Queue, writer: StrmWriter, manifest: StrmManifest,
+                           progress_callback) -> None:
+        while True:
+            batch = await to_write.get()
+            if batch is None:
+                break
+            if batch:
+                await asyncio.to_thread(self._write_batch, writer, batch)
+            self.progress["written"] = writer.written
+            if progress_callback:
+                await progress_callback({**self.progress, "stats": dict(manifest.stats)})
+
+    def _write_batch(self, writer: StrmWriter, batch: List[StrmEntry]) -> None:
+        for entry in batch:
+            writer.write(entry.path, entry.content)
+
+    def _remove_stale(self, manifest: StrmManifest, kinds: List[str]) -> None:
+        """Remove os .strm de itens que sumiram da playlist"""
+        for kind in kinds:
+            stale = manifest.stale_paths(kind)
+            for path in stale:
+                # Episódios ficam em <série>/<temporada>/; filmes direto no diretório base
+                self._remove_strm(path, prune_dirs=2 if kind == "series" else 0)
+            manifest.remove(stale)
+
+    def load_playlist(self) -> Optional[CompactPlaylist]:
+        """Lê a playlist configurada para a memória, em formato compacto"""
+        sources = self.get_sources(self.config)
+        if not sources:
+            return None
+        stream = self._open_sources(sources)
+        if not stream:
+            return None
+        with stream:
+            items = self.processor.iter_items(stream, is_valid_item)
+            if len(sources) > 1:
+                merge_by = self.get("merge_by", "title")
+                index = HashIndex()
+                items = (item for item in items if index.add(logical_key(item, merge_by)))
+            self.playlist = CompactPlaylist(items)
+        return self.playlist
+
+    def get_sources(self, config: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Fontes habilitadas em ordem de prioridade; sem `sources`, usa m3u_url/m3u_file"""
+        sources = [
+            source for source in config.get("sources", self.get("sources")) or []
+            if source.get("enabled", True) and (source.get("url") or source.get("file"))
+        ]
+        if sources:
+            return sorted(sources, key=lambda source: source.get("priority", 0))
+
+        if config.get("use_file"):
+            return [{"file": config["m3u_file"]}] if config.get("m3u_file") else []
+        return [{"url": config["m3u_url"]}] if config.get("m3u_url") else []
+
+    def _open_sources(self, sources: List[Dict[str, Any]]) -> Optional[M3UStream]:
+        if len(sources) == 1:
+            source = sources[0]
+            if source.get("url"):
+                return self.processor.stream_m3u(source["url"], True)
+            return self.processor.stream_m3u(source["file"], False)
+
+        streams = self.processor.open_sources(sources, self.get("fetch_workers", 4))
+        return MergedStream(streams, missing=len(sources) - len(streams)) if streams else None
+
+    def _collect(self, items, playlist: CompactPlaylist):
+        """Repassa os itens guardando-os na playlist compacta"""
+        for item in items:
+            playlist.append(item)
+            yield item
+        self.playlist = playlist
+
+    def _sync_fingerprint(self, sources: List[Dict[str, Any]], base_dirs: Dict[str, str], kinds: list,
+                          merge_by: Optional[str] = None) -> str:
+        """Identifica as opções que mudam o resultado de uma sincronização"""
+        processor = self.processor
+        return json.dumps({
+            "sources": [source.get("url") or source.get("file") for source in sources],
+            "merge_by": merge_by,
+            "dirs": base_dirs,
+            "kinds": kinds,
+            "proxy": processor._get_stream_url("") if processor.stream_ids else processor._get_proxy_url("")
+        }, sort_keys=True)
+
+    def _remove_strm(self, path: str, prune_dirs: int = 0) -> None:
+        """Remove um .strm e até `prune_dirs` diretórios pais que ficarem vazios"""
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+            parent = os.path.dirname(path)
+            for _ in range(prune_dirs):
+                if os.listdir(parent):
+                    break
+                os.rmdir(parent)
+                parent = os.path.dirname(parent)
+        except OSError as e:
+            logging.error(f"Erro ao remover {path}: {str(e)}")
 
     def cancel_processing(self) -> None:
         self.is_cancelled = True
@@ -0,0 +1,166 @@
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from .m3u_processor import M3UItem
+
+# Atributos que já têm coluna própria; os demais vão para `extras`
+_NAMED_ATTRIBUTES = ("tvg-name", "tvg-logo", "group-title", "tvg-id", "tvg-chno", "catchup")
+
+# Bits da coluna `flags`
+_FLAG_SERIES = 1
+_FLAG_TVG_NAME = 2  # o título veio de tvg-name (e não do nome após a vírgula)
+
+class StringTable:
+    """Tabela de strings internadas: cada valor distinto é guardado uma única vez"""
+
+    def __init__(self):
+        self._index: Dict[str, int] = {"": 0}
+        self._strings: List[str] = [""]
+
+    def intern(self, value: str) -> int:
+        idx = self._index.get(value)
+        if idx is None:
+            idx = len(self._strings)
+            self._index[value] = idx
+            self._strings.append(value)
+        return idx
+
+    def lookup(self, value: str) -> Optional[int]:
+        return self._index.get(value)
+
+    def __getitem__(self, idx: int) -> str:
+        return self._strings[idx]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+class CompactPlaylist:
+    """Playlist lida guardada em colunas.
+
+    Títulos, URLs e logos (quase sempre únicos) ficam em listas simples; os
+    campos muito repetidos (grupo, série, temporada, episódio...) viram
+    índices de 32 bits numa StringTable. Itens são reconstruídos como
+    M3UItem só quando acessados.
+    """
+
+    def __init__(self, items: Iterable[M3UItem] = ()):
+        self.strings = StringTable()
+        self.titles: List[str] = []
+        self.urls: List[str] = []
+        self.logos: List[str] = []
+        self.flags = bytearray()
+        self.groups = array("I")
+        self.series_names = array("I")
+        self.seasons = array("I")
+        self.episodes = array("I")
+        self.tvg_ids = array("I")
+        self.tvg_chnos = array("I")
+        self.catchups = array("I")
+        self.durations = array("I")
+        self.display_names: List[Optional[str]] = []
+        self.extras: Dict[int, Tuple[Tuple[int, int], ...]] = {}
+        self._group_rows: Dict[int, array] = {}
+        self.extend(items)
+
+    def append(self, item: M3UItem) -> None:
+        row = len(self.titles)
+        intern = self.strings.intern
+
+        self.titles.append(item.title)
+        self.urls.append(item.url)
+        self.logos.append(item.logo)
+        flags = _FLAG_SERIES if item.is_series else 0
+        if item.attributes.get("tvg-name"):
+            flags |= _FLAG_TVG_NAME
+        self.flags.append(flags)
+        group = intern(item.group)
+        self.groups.append(group)
+        self.series_names.append(intern(item.series_name))
+        self.seasons.append(intern(item.season))
+        self.episodes.append(intern(item.episode))
+        self.tvg_ids.append(intern(item.tvg_id))
+        self.tvg_chnos.append(intern(item.tvg_chno))
+        self.catchups.append(intern(item.catchup))
+        self.durations.append(intern(item.duration))
+        # O nome após a vírgula costuma repetir o título; nesse caso não é guardado
+        self.display_names.append(None if item.display_name == item.title else item.display_name)
+
+        extras = tuple(
+            (intern(key), intern(value))
+            for key, value in item.attributes.items()
+            if key not in _NAMED_ATTRIBUTES
+        )
+        if extras:
+            self.extras[row] = extras
+
+        rows = self._group_rows.get(group)
+        if rows is None:
+            rows = self._group_rows[group] = array("I")
+        rows.append(row)
+
+    def extend(self, items: Iterable[M3UItem]) -> None:
+        for item in items:
+            self.append(item)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def __getitem__(self, row: int) -> M3UItem:
+        strings = self.strings
+        title = self.titles[row]
+        display_name = self.display_names[row]
+        item = M3UItem(
+            title=title,
+            url=self.urls[row],
+            logo=self.logos[row],
+            group=strings[self.groups[row]],
+            is_series=bool(self.flags[row] & _FLAG_SERIES),
+            series_name=strings[self.series_names[row]],
+            season=strings[self.seasons[row]],
+            episode=strings[self.episodes[row]],
+            tvg_id=strings[self.tvg_ids[row]],
+            tvg_chno=strings[self.tvg_chnos[row]],
+            catchup=strings[self.catchups[row]],
+            duration=strings[self.durations[row]],
+            display_name=title if display_name is None else display_name
+        )
+        item.attributes = self._attributes(item, row)
+        return item
+
+    def __iter__(self) -> Iterator[M3UItem]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def _attributes(self, item: M3UItem, row: int) -> Dict[str, str]:
+        named = (
+            ("tvg-id", item.tvg_id), ("tvg-logo", item.logo), ("group-title", item.group),
+            ("tvg-chno", item.tvg_chno), ("catchup", item.catchup)
+        )
+        attributes = {key: value for key, value in named if value}
+        if self.flags[row] & _FLAG_TVG_NAME:
+            attributes["tvg-name"] = item.title
+        strings = self.strings
+        for key, value in self.extras.get(row, ()):
+            attributes[strings[key]] = strings[value]
+        return attributes
+
+    def group_counts(self) -> Dict[str, int]:
+        """Quantidade de itens por grupo"""
+        return {self.strings[group]: len(rows) for group, rows in self._group_rows.items()}
+
+    def rows(self, group: Optional[str] = None, is_series: Optional[bool] = None) -> List[int]:
+        """Índices dos itens que atendem aos filtros"""
+        if group is not None:
+            group_idx = self.strings.lookup(group)
+            candidates = self._group_rows.get(group_idx, ()) if group_idx is not None else ()
+        else:
+            candidates = range(len(self))
+
+        if is_series is None:
+            return list(candidates)
+        wanted = _FLAG_SERIES if is_series else 0
+        flags = self.flags
+        return [row for row in candidates if flags[row] & _FLAG_SERIES == wanted]
+
+    def filter(self, group: Optional[str] = None, is_series: Optional[bool] = None) -> Iterator[M3UItem]:
+        for row in self.rows(group, is_series):
+            yield self[row]
@@ -1,10 +1,93 @@
 import os
 import re
+import gzip
+import json
+import hashlib
+import logging
+import unicodedata
 import requests
-from dataclasses import dataclass
-from typing import Optional, List, Dict
+from urllib.parse import quote
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict, Iterable, Iterator, Callable, Tuple, NamedTuple
 
-@dataclass
+# Padrões que identificam canais de TV (ignorados no processamento)
+INVALID_PATTERNS = [
+    "Canais |",
+    "HD",
+    "FHD",
+    "SD",
+    "4K",
+    "CHANNELS",
+    "CHANNEL"
+]
+
+# Duração logo após "#EXTINF:" e, no caminho lento, pares key="value" ou a
+# vírgula que inicia o título (valores entre aspas são consumidos inteiros)
+_EXTINF_DURATION_RE = re.compile(r'#EXTINF:\s*(-?\d+(?:\.\d+)?)?')
+_EXTINF_TOKEN_RE = re.compile(r'([\w-]+)="([^"]*)"|,\s*(.*)')
+_SERIES_RE = re.compile(r'(.*?)\s*(S(\d+)E(\d+))')
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+# urllib3 só decodifica brotli quando o pacote está instalado
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip"
+
+def is_valid_item(line: str) -> bool:
+    """Ignora linhas que contêm indicadores de canais de TV"""
+    return not any(pattern in line for pattern in INVALID_PATTERNS)
+
+def parse_extinf(info_line: str) -> Tuple[str, Dict[str, str], str]:
+    """Lê uma linha #EXTINF em uma única passada.
+
+    Separar a linha pelas aspas deixa os valores nas posições ímpares e cada
+    `key=` no fim do segmento anterior; linhas fora desse formato (aspas ou
+    vírgulas no título, por exemplo) caem no tokenizador por regex.
+
+    Returns:
+        Tuple[str, Dict[str, str], str]: (duração, atributos, título após a vírgula)
+    """
+    parts = info_line.split('"')
+    if len(parts) % 2 == 0 or not info_line.startswith("#EXTINF:"):
+        return _parse_extinf_tokens(info_line)
+
+    segments = iter(parts)
+    head = next(segments)
+    attributes: Dict[str, str] = {}
+    for value in segments:
+        key = head.rpartition(' ')[2]
+        if key[-1:] != '=' or ',' in head:
+            return _parse_extinf_tokens(info_line)
+        attributes[key[:-1]] = value
+        head = next(segments)
+
+    first = parts[0][8:].lstrip()
+    duration = first.partition(' ')[0] if attributes else first.partition(',')[0]
+    return duration.strip(), attributes, head.partition(',')[2].strip()
+
+def _parse_extinf_tokens(info_line: str) -> Tuple[str, Dict[str, str], str]:
+    duration = ""
+    pos = 0
+    match = _EXTINF_DURATION_RE.match(info_line)
+    if match:
+        duration = match.group(1) or ""
+        pos = match.end()
+
+    attributes: Dict[str, str] = {}
+    display_name = ""
+    for token in _EXTINF_TOKEN_RE.finditer(info_line, pos):
+        key = token.group(1)
+        if key is None:
+            display_name = token.group(3).strip()
+            break
+        attributes[key] = token.group(2)
+    return duration, attributes, display_name
+
+@dataclass(slots=True)
 class M3UItem:
     title: str
     url: str
@@ -14,100 +97,425 @@ class M3UItem:
     series_name: str = ""
     season: str = ""
     episode: str = ""
+    tvg_id: str = ""
+    tvg_chno: str = ""
+    catchup: str = ""
+    duration: str = ""
+    display_name: str = ""
+    attributes: Dict[str, str] = field(default_factory=dict)
+
+class StrmEntry(NamedTuple):
+    """Um .strm a ser escrito: o que o estágio de escrita precisa de cada item"""
+    kind: str
+    path: str
+    content: str
+    url: str
+    title: str
+    # Chave lógica do item, preenchida só quando há fontes a mesclar
+    key: str = ""
+    # Id curto do .strm no índice de streams (vazio com URLs completas)
+    stream_id: str = ""
+
+def normalize_title(title: str) -> str:
+    """Título sem acentos, caixa e pontuação, para comparar itens de provedores diferentes"""
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(c for c in title if not unicodedata.combining(c))
+    return _NON_WORD_RE.sub(" ", title.casefold()).strip()
+
+def logical_key(item: M3UItem, merge_by: str = "title") -> str:
+    """Identifica o mesmo conteúdo em playlists diferentes.
+
+    Episódios são identificados pela série normalizada + temporada/episódio e
+    filmes pelo título normalizado; com `merge_by="tvg_id"`, itens que têm
+    tvg-id usam só ele.
+    """
+    if merge_by == "tvg_id" and item.tvg_id:
+        return f"id:{item.tvg_id}"
+    if item.is_series:
+        return f"s:{normalize_title(item.series_name)}:{int(item.season)}:{int(item.episode)}"
+    return f"m:{normalize_title(item.title)}"
+
+def stream_id(kind: str, strm_path: str) -> str:
+    """Id curto e estável de um .strm (16 dígitos hex), usado em /proxy/s/<id>.
+
+    Vem do tipo e do caminho do .strm dentro do diretório do tipo, e não da
+    URL: continua o mesmo quando o provedor troca token ou servidor, e cada
+    arquivo tem o seu id.
+    """
+    key = f"{kind}:{strm_path.replace(os.sep, '/')}"
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+class M3UStream:
+    """Linhas de uma playlist lidas em blocos, sem carregar o arquivo inteiro.
+
+    Mantém a contagem de bytes consumidos para estimar o progresso quando o
+    tamanho total é conhecido (tamanho do arquivo ou Content-Length).
+    """
+
+    def __init__(self, raw_lines: Iterable[bytes], total_bytes: int = 0,
+                 bytes_read: Optional[Callable[[], int]] = None,
+                 closer: Optional[Callable[[], None]] = None,
+                 not_modified: bool = False):
+        self._raw_lines = raw_lines
+        self._bytes_read_fn = bytes_read
+        self._closer = closer
+        self._consumed = 0
+        self.total_bytes = total_bytes
+        # True quando o servidor respondeu 304 e as linhas vêm da cópia local
+        self.not_modified = not_modified
+
+    @property
+    def bytes_read(self) -> int:
+        if self._bytes_read_fn:
+            return self._bytes_read_fn()
+        return self._consumed
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for raw in self._raw_lines:
+                self._consumed += len(raw)
+                yield raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        finally:
+            self.close()
+
+    def estimate_total(self, processed: int) -> int:
+        """Estima o total de itens a partir da fração de bytes já lida"""
+        read = self.bytes_read
+        if self.total_bytes <= 0 or read <= 0:
+            return processed + 1
+        return max(processed + 1, int(processed * self.total_bytes / read))
+
+    def close(self) -> None:
+        close_lines = getattr(self._raw_lines, "close", None)
+        if close_lines:
+            close_lines()
+        if self._closer:
+            self._closer()
+            self._closer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def iter_shards(lines: Iterable[str], shard_size: int) -> Iterator[str]:
+    """Agrupa linhas em blocos de até `shard_size` itens, sempre cortando antes de um #EXTINF"""
+    shard: List[str] = []
+    entries = 0
+    for line in lines:
+        if line.startswith("#EXTINF"):
+            if entries >= shard_size:
+                yield "\n".join(shard)
+                shard = []
+                entries = 0
+            entries += 1
+        shard.append(line)
+    if shard:
+        yield "\n".join(shard)
+
+def parse_shard(processor: "M3UProcessor", shard: str, base_dirs: Dict[str, str],
+                line_filter: Optional[Callable[[str], bool]] = None,
+                merge_by: Optional[str] = None) -> List["StrmEntry"]:
+    """Lê e classifica um bloco de playlist (executado nos processos do pool)"""
+    items = processor.iter_items(shard.split("\n"), line_filter)
+    return list(processor.iter_entries(items, base_dirs, merge_by))
 
 class M3UProcessor:
     def __init__(self, tmdb_api_key: str = ""):
         self.tmdb_api_key = tmdb_api_key
         self.proxy_host = "127.0.0.1"
         self.proxy_port = 55950
+        # .strm com id curto resolvido pelo índice do proxy; False grava a URL completa
+        self.stream_ids = True
+        self.chunk_size = 1024 * 1024
+        # (conexão, leitura): a leitura vale por bloco, não pelo download inteiro
+        self.timeout = (10, 60)
+        self.cache_dir = "data/playlist_cache"
 
     def _get_proxy_url(self, url: str) -> str:
-        return f"http://{self.proxy_host}:{self.proxy_port}/proxy?url={url}"
+        # Codificada: "&" e "#" da URL do provedor quebrariam a query string
+        return f"http://{self.proxy_host}:{self.proxy_port}/proxy?url={quote(url, safe='')}"
+
+    def _get_stream_url(self, stream_id: str) -> str:
+        return f"http://{self.proxy_host}:{self.proxy_port}/proxy/s/{stream_id}"
 
-    def load_m3u(self, source: str, is_url: bool = True) -> Optional[List[str]]:
+    def stream_m3u(self, source: str, is_url: bool = True) -> Optional[M3UStream]:
+        """Abre a playlist para leitura incremental (memória constante)"""
         if is_url:
-            return self.download_m3u(source)
-        return self.read_m3u_file(source)
+            return self.stream_download(source)
+        return self.stream_file(source)
 
-    def read_m3u_file(self, filepath: str) -> Optional[List[str]]:
+    def stream_file(self, filepath: str) -> Optional[M3UStream]:
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return f.read().splitlines()
+            f = open(filepath, 'rb', buffering=self.chunk_size)
+            return M3UStream(f, total_bytes=os.path.getsize(filepath), closer=f.close)
         except Exception:
             return None
 
-    def download_m3u(self, url: str) -> Optional[List[str]]:
+    def stream_download(self, url: str) -> Optional[M3UStream]:
+        """Baixa a playlist com requisição condicional e resposta comprimida.
+
+        Uma resposta 304 devolve a cópia local com `not_modified=True`, para
+        que o chamador possa pular o processamento; se a cópia não puder ser
+        aberta, a playlist é baixada de novo sem requisição condicional. Uma resposta 200 é gravada
+        comprimida no cache conforme é lida e só substitui a cópia anterior
+        quando termina de ser lida por inteiro.
+        """
+        cache_path, meta_path = self._cache_paths(url)
+        meta = self._load_cache_meta(meta_path) if os.path.exists(cache_path) else {}
+
+        headers = {"Accept-Encoding": ACCEPT_ENCODING}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
         try:
-            response = requests.get(url, timeout=10)
+            response = requests.get(url, headers=headers, timeout=self.timeout, stream=True)
+            if response.status_code == 304:
+                response.close()
+                cached = self._stream_cache(cache_path, meta, not_modified=True)
+                if cached is not None:
+                    return cached
+                # Sem cópia local para reaproveitar (apagada, ou 304 a um pedido sem validadores): baixa de novo
+                logging.warning(f"Resposta 304 sem cópia local da playlist, baixando de novo: {url}")
+                meta = {}
+                response = requests.get(url, headers={"Accept-Encoding": ACCEPT_ENCODING},
+                                        timeout=self.timeout, stream=True)
+                if response.status_code == 304:
+                    response.close()
+                    logging.error(f"Servidor respondeu 304 a um pedido sem validadores: {url}")
+                    return None
             response.raise_for_status()
-            return response.text.splitlines()
-        except requests.RequestException:
+        except requests.RequestException as e:
+            if meta:
+                logging.warning(f"Falha ao baixar playlist ({str(e)}), usando cópia local")
+                return self._stream_cache(cache_path, meta)
             return None
 
-    def extract_info(self, info_line: str, url: str = "") -> M3UItem:
-        info: Dict[str, str] = {
-            'url': url  # Adicionando url como parâmetro opcional
+        total = int(response.headers.get('content-length') or 0)
+        new_meta = {
+            "url": url,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified")
         }
-        
-        tvg_name_match = re.search(r'tvg-name="([^"]+)"', info_line)
-        info['title'] = tvg_name_match.group(1) if tvg_name_match else ""
-        
-        tvg_logo_match = re.search(r'tvg-logo="([^"]+)"', info_line)
-        info['logo'] = tvg_logo_match.group(1) if tvg_logo_match else ""
-        
-        group_match = re.search(r'group-title="([^"]+)"', info_line)
-        info['group'] = group_match.group(1) if group_match else ""
-        
-        series_info = self._extract_series_info(info['title'])
-        return M3UItem(**info, **series_info)
-
-    def _extract_series_info(self, title: str) -> Dict[str, str]:
+        return M3UStream(
+            self._cache_lines(response.iter_lines(chunk_size=self.chunk_size), cache_path, meta_path, new_meta),
+            total_bytes=total,
+            bytes_read=response.raw.tell,
+            closer=response.close
+        )
+
+    def fetch_m3u(self, url: str) -> Optional[M3UStream]:
+        """Baixa a playlist inteira para o cache e a devolve lida do disco.
+
+        Usado quando várias fontes são baixadas em paralelo e lidas uma de
+        cada vez: a rede não fica parada enquanto outra fonte é processada.
+        """
+        stream = self.stream_download(url)
+        if stream is None or stream.not_modified:
+            return stream
+
+        cache_path, meta_path = self._cache_paths(url)
+        try:
+            with stream:
+                for _ in stream:
+                    pass
+        except (requests.RequestException, OSError) as e:
+            logging.error(f"Erro ao baixar playlist {url}: {str(e)}")
+            if not os.path.exists(cache_path):
+                return None
+        return self._stream_cache(cache_path, self._load_cache_meta(meta_path))
+
+    def open_sources(self, sources: List[Dict], max_workers: int = 4) -> List[M3UStream]:
+        """Abre várias fontes (`{"url": ...}` ou `{"file": ...}`), baixando as URLs em paralelo.
+
+        Devolve os streams na ordem de `sources`; fontes que falham são ignoradas.
+        """
+        def open_source(source: Dict) -> Optional[M3UStream]:
+            if source.get("url"):
+                return self.fetch_m3u(source["url"])
+            return self.stream_file(source.get("file", ""))
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="m3u-fetch") as pool:
+            results = list(pool.map(open_source, sources))
+
+        streams = []
+        for source, stream in zip(sources, results):
+            if stream is None:
+                logging.warning(f"Fonte ignorada: {source.get('url') or source.get('file')}")
+            else:
+                streams.append(stream)
+        return streams
+
+    def _cache_paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.m3u.gz", f"{base}.json"
+
+    def _load_cache_meta(self, meta_path: str) -> Dict[str, str]:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _stream_cache(self, cache_path: str, meta: Dict, not_modified: bool = False) -> Optional[M3UStream]:
+        try:
+            f = gzip.open(cache_path, "rb")
+        except OSError:
+            return None
+        return M3UStream(f, total_bytes=meta.get("size", 0), closer=f.close, not_modified=not_modified)
+
+    def _cache_lines(self, lines: Iterable[bytes], cache_path: str, meta_path: str,
+                     meta: Dict) -> Iterator[bytes]:
+        """Repassa as linhas gravando uma cópia comprimida da playlist"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        completed = False
+        size = 0
+        try:
+            # Nível 1: o gargalo é a rede, não o tamanho do cache
+            with gzip.open(tmp_path, "wb", compresslevel=1) as cache:
+                for line in lines:
+                    cache.write(line + b"\n")
+                    size += len(line) + 1
+                    yield line
+            completed = True
+        finally:
+            if completed:
+                os.replace(tmp_path, cache_path)
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump({**meta, "size": size}, f)
+            elif os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def iter_items(self, lines: Iterable[str],
+                   line_filter: Optional[Callable[[str], bool]] = None) -> Iterator[M3UItem]:
+        """Gera M3UItems conforme as linhas são lidas.
+
+        Cada #EXTINF é associado à próxima linha que não é diretiva
+        (#EXTVLCOPT, #EXTGRP etc. são ignoradas).
+        """
+        info_line = None
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#EXTINF"):
+                info_line = line if line_filter is None or line_filter(line) else None
+            elif line.startswith("#"):
+                continue
+            elif info_line is not None:
+                yield self.extract_info(info_line, line)
+                info_line = None
+
+    def iter_entries(self, items: Iterable[M3UItem], base_dirs: Dict[str, str],
+                     merge_by: Optional[str] = None) -> Iterator[StrmEntry]:
+        """Classifica os itens em "series"/"movie" e monta o .strm de cada um.
+
+        Tipos ausentes de `base_dirs` são ignorados. Com `merge_by`, cada
+        entrada leva a chave lógica do item (ver logical_key).
+        """
+        for item in items:
+            kind = "series" if item.is_series else "movie"
+            base_dir = base_dirs.get(kind)
+            if base_dir is not None:
+                item_id = self.get_stream_id(item) if self.stream_ids else ""
+                content = self._get_stream_url(item_id) if item_id else self._get_proxy_url(item.url)
+                yield StrmEntry(kind, self.get_strm_path(item, base_dir), content, item.url, item.title,
+                                logical_key(item, merge_by) if merge_by else "", item_id)
+
+    def iter_entries_parallel(self, lines: Iterable[str], base_dirs: Dict[str, str], workers: int,
+                              line_filter: Optional[Callable[[str], bool]] = None,
+                              shard_size: int = 5000,
+                              merge_by: Optional[str] = None) -> Iterator[StrmEntry]:
+        """Como iter_entries, mas lê e classifica blocos da playlist num ProcessPoolExecutor.
+
+        Os blocos são cortados sempre antes de um #EXTINF, as entradas saem na
+        ordem da playlist e no máximo dois blocos por processo ficam em voo,
+        então a memória continua limitada.
+        """
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            try:
+                for shard in iter_shards(lines, shard_size):
+                    pending.append(pool.submit(parse_shard, self, shard, base_dirs, line_filter, merge_by))
+                    if len(pending) >= workers * 2:
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def extract_info(self, info_line: str, url: str = "") -> M3UItem:
+        duration, attributes, display_name = parse_extinf(info_line)
+        # tvg-name é o título preferido; sem ele, usa o nome após a vírgula
+        title = attributes.get('tvg-name') or display_name
+
+        item = M3UItem(
+            title=title,
+            url=url,
+            logo=attributes.get('tvg-logo', ""),
+            group=attributes.get('group-title', ""),
+            tvg_id=attributes.get('tvg-id', ""),
+            tvg_chno=attributes.get('tvg-chno', ""),
+            catchup=attributes.get('catchup', ""),
+            duration=duration,
+            display_name=display_name,
+            attributes=attributes
+        )
         if "S" in title and "E" in title:
-            series_match = re.search(r'(.*?)\s*(S(\d+)E(\d+))', title)
+            series_match = _SERIES_RE.search(title)
             if series_match:
-                return {
-                    'series_name': series_match.group(1).strip(),
-                    'season': series_match.group(3),
-                    'episode': series_match.group(4),
-                    'is_series': True
-                }
-        return {'is_series': False}
-
-    def create_strm(self, item: M3UItem, base_dir: str) -> None:
+                item.series_name = series_match.group(1).strip()
+                item.season = series_match.group(3)
+                item.episode = series_match.group(4)
+                item.is_series = True
+        return item
+
+    def get_strm_path(self, item: M3UItem, base_dir: str) -> str:
+        """Caminho do arquivo .strm de um item dentro do diretório base"""
         if item.is_series:
-            self._create_series_strm(item, base_dir)
-        else:
-            self._create_movie_strm(item, base_dir)
-
-    def _create_series_strm(self, item: M3UItem, base_dir: str) -> None:
-        series_dir = os.path.join(base_dir, item.series_name)
-        season_dir = os.path.join(series_dir, f"Season {item.season.zfill(2)}")
-        os.makedirs(season_dir, exist_ok=True)
-        
-        filename = f"S{item.season.zfill(2)}E{item.episode.zfill(2)}.strm"
-        filepath = os.path.join(season_dir, filename)
-        
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(self._get_proxy_url(item.url))
+            season_dir = os.path.join(base_dir, item.series_name, f"Season {item.season.zfill(2)}")
+            filename = f"S{item.season.zfill(2)}E{item.episode.zfill(2)}.strm"
+            return os.path.join(season_dir, filename)
 
-    def _create_movie_strm(self, item: M3UItem, base_dir: str) -> None:
-        os.makedirs(base_dir, exist_ok=True)
-        
         safe_title = "".join(c for c in item.title if c.isalnum() or c in (' ', '-', '_'))
-        filepath = os.path.join(base_dir, f"{safe_title}.strm")
-        
+        return os.path.join(base_dir, f"{safe_title}.strm")
+
+    def get_stream_id(self, item: M3UItem) -> str:
+        """Id do .strm do item no índice de streams (ver stream_id)"""
+        return stream_id("series" if item.is_series else "movie", self.get_strm_path(item, ""))
+
+    def get_strm_content(self, item: M3UItem) -> str:
+        if self.stream_ids:
+            return self._get_stream_url(self.get_stream_id(item))
+        return self._get_proxy_url(item.url)
+
+    def create_strm(self, item: M3UItem, base_dir: str) -> str:
+        filepath = self.get_strm_path(item, base_dir)
+        self.write_strm(filepath, self.get_strm_content(item))
+        return filepath
+
+    def write_strm(self, filepath: str, content: str) -> None:
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
         with open(filepath, "w", encoding="utf-8") as f:
-            f.write(self._get_proxy_url(item.url))
+            f.write(content)
 
     def test_connection(self, url: str) -> tuple[bool, str]:
-        """Testa a conexão com a URL da playlist.
+        """Testa a conexão com a URL da playlist lendo só o início da resposta.
         Returns:
             tuple[bool, str]: (sucesso, mensagem)
         """
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            if not response.text.strip().startswith("#EXTM3U"):
+            with requests.get(url, headers={"Accept-Encoding": ACCEPT_ENCODING},
+                              timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                head = next(response.iter_content(chunk_size=1024), b"")
+            if not head.decode("utf-8", errors="ignore").lstrip("\ufeff \t\r\n").startswith("#EXTM3U"):
                 return False, "URL não retorna uma playlist M3U válida"
             return True, "Conexão estabelecida com sucesso"
         except requests.Timeout:
@@ -0,0 +1,66 @@
+import hashlib
+from typing import Dict, Iterator, List
+from .m3u_processor import M3UStream
+
+class MergedStream(M3UStream):
+    """Linhas de várias playlists lidas em sequência, na ordem de prioridade.
+
+    Mantém a interface de M3UStream (progresso pelos bytes lidos, fechamento,
+    `not_modified`), então o restante do pipeline não sabe quantas fontes há.
+    """
+
+    def __init__(self, streams: List[M3UStream], missing: int = 0):
+        super().__init__(())
+        self.streams = streams
+        # Fontes configuradas que não puderam ser abertas
+        self.missing = missing
+        self.total_bytes = sum(stream.total_bytes for stream in streams)
+        # Só dá para pular a sincronização se nenhuma fonte mudou
+        self.not_modified = bool(streams) and all(stream.not_modified for stream in streams)
+
+    @property
+    def bytes_read(self) -> int:
+        return sum(stream.bytes_read for stream in self.streams)
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            for stream in self.streams:
+                yield from stream
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        for stream in self.streams:
+            stream.close()
+
+class HashIndex:
+    """Conjunto de chaves lógicas já vistas, guardadas como digests de 8 bytes.
+
+    A memória cresce com o número de itens distintos, não com o tamanho das
+    playlists: a chave em si (título, série, temporada...) não é guardada.
+    Cada chave pode levar um valor curto do primeiro item (ex.: o id do
+    .strm escrito para ele).
+    """
+
+    def __init__(self):
+        self._seen: Dict[bytes, str] = {}
+        self.duplicates = 0
+
+    def _digest(self, key: str) -> bytes:
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+
+    def add(self, key: str, value: str = "") -> bool:
+        """Registra a chave com `value`; False se ela já tinha sido vista"""
+        digest = self._digest(key)
+        if digest in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen[digest] = value
+        return True
+
+    def get(self, key: str) -> str:
+        """Valor registrado com a chave ("" se não foi vista)"""
+        return self._seen.get(self._digest(key), "")
+
+    def __len__(self) -> int:
+        return len(self._seen)
@@ -2,5 +2,9 @@ from .video_handler import VideoHandler
 from .queue_manager import QueueManager
 from .playlist_manager import PlaylistManager
 from .media_info import MediaInfo
+from .strm_manifest import StrmManifest
+from .strm_writer import StrmWriter
+from .stream_index import StreamIndex
+from .queue_store import QueueStore
 
-__all__ = ['VideoHandler', 'QueueManager', 'PlaylistManager', 'MediaInfo']
+__all__ = ['VideoHandler', 'QueueManager', 'PlaylistManager', 'MediaInfo', 'StrmManifest', 'StrmWriter', 'StreamIndex', 'QueueStore']
@@ -0,0 +1,67 @@
+import re
+import zlib
+from typing import Callable, Optional
+from urllib.parse import urljoin, urlparse
+
+# Tipos de conteúdo usados para playlists HLS
+HLS_CONTENT_TYPES = ("application/vnd.apple.mpegurl", "application/x-mpegurl", "audio/mpegurl", "audio/x-mpegurl")
+
+_URI_ATTRIBUTE_RE = re.compile(r'URI="([^"]*)"')
+
+def is_hls(url: str, content_type: Optional[str]) -> bool:
+    """Indica se a resposta parece ser uma playlist HLS (.m3u8)"""
+    if content_type and content_type.split(";")[0].strip().lower() in HLS_CONTENT_TYPES:
+        return True
+    return urlparse(url).path.lower().endswith(".m3u8")
+
+def decode_body(data: bytes, encoding: Optional[str]) -> Optional[bytes]:
+    """Descomprime o corpo conforme o Content-Encoding; None se a codificação não é suportada"""
+    encoding = (encoding or "").strip().lower()
+    if encoding in ("", "identity"):
+        return data
+    if encoding in ("gzip", "deflate"):
+        # wbits 47: detecta cabeçalho gzip ou zlib
+        return zlib.decompress(data, 47)
+    if encoding == "br":
+        try:
+            import brotli
+        except ImportError:
+            return None
+        return brotli.decompress(data)
+    return None
+
+def rewrite_manifest(text: str, base_url: str, proxy_url: Callable[[str, bool], str]) -> str:
+    """Reescreve as URIs de uma playlist HLS para passarem pelo proxy.
+
+    A reescrita é feita linha a linha, então tags desconhecidas são mantidas
+    como estão. URIs relativas são resolvidas contra `base_url` (a URL final,
+    depois de redirecionamentos).
+
+    Args:
+        proxy_url: recebe (URL absoluta, é segmento) e devolve a URL no proxy.
+            Segmentos de mídia e o #EXT-X-MAP são marcados como segmento;
+            variantes, renditions e chaves, não.
+    """
+    lines = []
+    next_is_playlist = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            lines.append(line)
+            continue
+
+        if stripped.startswith("#"):
+            tag = stripped.partition(":")[0]
+            if tag == "#EXT-X-STREAM-INF":
+                next_is_playlist = True
+            elif 'URI="' in stripped:
+                is_segment = tag == "#EXT-X-MAP"
+                line = _URI_ATTRIBUTE_RE.sub(
+                    lambda match: f'URI="{proxy_url(urljoin(base_url, match.group(1)), is_segment)}"', line
+                )
+            lines.append(line)
+            continue
+
+        lines.append(proxy_url(urljoin(base_url, stripped), not next_is_playlist))
+        next_is_playlist = False
+    return "\n".join(lines) + "\n"
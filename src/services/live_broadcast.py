@@ -0,0 +1,139 @@
+import re
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, Optional, Set
+from urllib.parse import urlparse
+import aiohttp
+
+# Canais do Xtream Codes: /live/<usuário>/<senha>/<id> ou a forma curta /<usuário>/<senha>/<id>[.ts]
+_XTREAM_SHORT_LIVE = re.compile(r"^/[^/]+/[^/]+/\d+(\.ts)?$")
+
+def is_live_source(url: str) -> bool:
+    """Se a URL é de um canal ao vivo, cujo fluxo pode ser repartido entre players.
+
+    Filmes e episódios (mesmo servidos sem Content-Length) não entram: um
+    segundo espectador receberia o arquivo a partir do meio.
+    """
+    path = urlparse(url).path
+    return "/live/" in path or bool(_XTREAM_SHORT_LIVE.match(path))
+
+class LiveSubscriber:
+    """Um player ouvindo um canal ao vivo.
+
+    Os blocos ficam num buffer circular próprio: um player lento perde os
+    blocos mais antigos (pula para perto do ao vivo) em vez de segurar o
+    provedor e os demais espectadores.
+    """
+
+    def __init__(self, buffer_chunks: int, backlog: Deque[bytes]):
+        self.buffer: Deque[bytes] = deque(backlog, maxlen=buffer_chunks)
+        self.dropped = 0
+        self.closed = False
+        self.last_read = time.monotonic()
+        self._ready = asyncio.Event()
+        if self.buffer:
+            self._ready.set()
+
+    def push(self, chunk: bytes) -> None:
+        if len(self.buffer) == self.buffer.maxlen:
+            self.dropped += 1
+        self.buffer.append(chunk)
+        self._ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        while True:
+            self.last_read = time.monotonic()
+            if self.buffer:
+                yield self.buffer.popleft()
+            elif self.closed:
+                return
+            else:
+                self._ready.clear()
+                await self._ready.wait()
+
+class LiveBroadcast:
+    """Uma conexão com o provedor repartida entre todos os players do mesmo canal.
+
+    O primeiro player abre a conexão; os seguintes se inscrevem no mesmo
+    fluxo de bytes, começando pelos últimos `backlog_chunks` blocos para o
+    player ter dados de imediato. A conexão é fechada quando o último
+    player sai ou quando o provedor encerra o fluxo.
+    """
+
+    def __init__(self, url: str, upstream: aiohttp.ClientResponse, headers: Dict[str, str],
+                 chunk_size: int = 64 * 1024, buffer_chunks: int = 128, backlog_chunks: int = 16,
+                 idle_timeout: float = 60,
+                 on_close: Optional[Callable[["LiveBroadcast"], None]] = None,
+                 on_data: Optional[Callable[[int], None]] = None):
+        self.url = url
+        self.upstream = upstream
+        self.media_type = upstream.headers.get("content-type")
+        self.headers = headers
+        self.chunk_size = chunk_size
+        self.buffer_chunks = buffer_chunks
+        # Inscrito que não lê há mais que isso (resposta abandonada) é descartado
+        self.idle_timeout = idle_timeout
+        self.subscribers: Set[LiveSubscriber] = set()
+        self.backlog: Deque[bytes] = deque(maxlen=backlog_chunks)
+        self.bytes_received = 0
+        self.closed = False
+        self._on_close = on_close
+        self._on_data = on_data
+        self._pump = asyncio.create_task(self._run())
+
+    def subscribe(self) -> LiveSubscriber:
+        subscriber = LiveSubscriber(self.buffer_chunks, self.backlog)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: LiveSubscriber) -> None:
+        self.subscribers.discard(subscriber)
+        if not self.subscribers and not self.closed:
+            self.close()
+
+    async def stream(self, subscriber: LiveSubscriber) -> AsyncIterator[bytes]:
+        """Corpo da resposta de um player; sair do gerador cancela a inscrição"""
+        try:
+            async for chunk in subscriber.chunks():
+                yield chunk
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def _run(self) -> None:
+        try:
+            async for chunk in self.upstream.content.iter_chunked(self.chunk_size):
+                self.bytes_received += len(chunk)
+                if self._on_data:
+                    self._on_data(len(chunk))
+                self.backlog.append(chunk)
+                now = time.monotonic()
+                for subscriber in list(self.subscribers):
+                    if now - subscriber.last_read > self.idle_timeout:
+                        subscriber.close()
+                        self.unsubscribe(subscriber)
+                    else:
+                        subscriber.push(chunk)
+                if self.closed:
+                    break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error(f"Erro ao ler canal ao vivo: {str(e)}")
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if not self._pump.done() and self._pump is not asyncio.current_task():
+            self._pump.cancel()
+        self.upstream.close()
+        for subscriber in self.subscribers:
+            subscriber.close()
+        if self._on_close:
+            self._on_close(self)
@@ -0,0 +1,114 @@
+import time
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import urlsplit, urlunsplit
+
+T = TypeVar("T")
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+def rewrite_hosts(url: str, mirror_hosts: Dict[str, List[str]]) -> List[str]:
+    """URLs equivalentes em outros servidores, pelas trocas de host configuradas.
+
+    `mirror_hosts` mapeia um host (com porta, se houver) para os hosts que
+    servem o mesmo conteúdo: {"cdn1.provedor.tv": ["cdn2.provedor.tv"]}.
+    """
+    parts = urlsplit(url)
+    hosts = mirror_hosts.get(parts.netloc.lower()) or mirror_hosts.get((parts.hostname or "").lower()) or []
+    return [urlunsplit(parts._replace(netloc=host)) for host in hosts]
+
+class CircuitBreaker:
+    """Rebaixa hosts que falham seguidamente.
+
+    Após `threshold` falhas consecutivas o host fica "aberto" por
+    `cooldown` segundos: vai para o fim da lista de espelhos. Passado esse
+    tempo ele volta a ser tentado; um sucesso zera a contagem e uma nova
+    falha o abre de novo.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 30):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        # host → (falhas consecutivas, aberto até)
+        self.hosts: Dict[str, Tuple[int, float]] = {}
+
+    def is_open(self, host: str) -> bool:
+        state = self.hosts.get(host)
+        return state is not None and state[1] > time.monotonic()
+
+    def success(self, host: str) -> None:
+        self.hosts.pop(host, None)
+
+    def failure(self, host: str) -> None:
+        failures = self.hosts.get(host, (0, 0))[0] + 1
+        open_until = time.monotonic() + self.cooldown if failures >= self.threshold else 0
+        self.hosts[host] = (failures, open_until)
+
+    def order(self, urls: Sequence[str]) -> List[str]:
+        """Mantém a ordem, com os hosts abertos por último (ainda tentados se nenhum outro servir)"""
+        return sorted(urls, key=lambda url: self.is_open(host_of(url)))
+
+    def stats(self) -> Dict[str, Dict]:
+        now = time.monotonic()
+        return {
+            host: {"failures": failures, "open_for": round(max(0.0, until - now), 1)}
+            for host, (failures, until) in self.hosts.items()
+        }
+
+async def hedge(attempts: Sequence[Callable[[], Awaitable[T]]], delay: float,
+                accept: Callable[[T], bool], discard: Callable[[T], None]) -> Tuple[Optional[T], int]:
+    """Corre as tentativas em ordem, abrindo a próxima se a atual demorar ou falhar.
+
+    A primeira começa imediatamente; a seguinte começa quando a anterior
+    falha ou quando passam `delay` segundos sem resposta. Vence o primeiro
+    resultado aceito por `accept`; as demais tentativas são canceladas e os
+    resultados que chegarem depois são passados a `discard`.
+
+    Returns:
+        Tuple[Optional[T], int]: (resultado vencedor ou o último recusado, índice da
+        tentativa); (None, -1) se todas levantaram exceção — a última é relançada
+    """
+    pending: Dict[asyncio.Task, int] = {}
+    next_attempt = 0
+    fallback: Tuple[Optional[T], int] = (None, -1)
+    last_error: Optional[BaseException] = None
+
+    def start_next() -> None:
+        nonlocal next_attempt
+        if next_attempt < len(attempts):
+            pending[asyncio.ensure_future(attempts[next_attempt]())] = next_attempt
+            next_attempt += 1
+
+    start_next()
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                # Nenhuma resposta dentro do prazo: dispara a próxima sem cancelar as atuais
+                start_next()
+                continue
+            for task in done:
+                index = pending.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    last_error = e
+                    start_next()
+                    continue
+                if accept(result):
+                    if fallback[0] is not None:
+                        discard(fallback[0])
+                    return result, index
+                # Resposta recusada (erro do provedor): guarda a última para devolver se nada der certo
+                if fallback[0] is not None:
+                    discard(fallback[0])
+                fallback = (result, index)
+                start_next()
+        if fallback[0] is None and last_error is not None:
+            raise last_error
+        return fallback
+    finally:
+        for task in pending:
+            task.cancel()
+            task.add_done_callback(lambda t: discard(t.result()) if not t.cancelled() and not t.exception() else None)
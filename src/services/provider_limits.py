@@ -0,0 +1,254 @@
+import time
+import asyncio
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlsplit
+from .shared_store import SharedStore
+
+# Primeiro trecho do caminho das URLs de stream do Xtream Codes: /<tipo>/<usuário>/<senha>/<id>
+XTREAM_STREAM_TYPES = {"live", "movie", "series", "timeshift"}
+
+def provider_of(url: str, groups: Optional[Dict[str, str]] = None) -> str:
+    """Conta do provedor a que a URL pertence: "provedor/usuário", ou só o provedor.
+
+    O limite de conexões dos provedores é por conta; o usuário vem do
+    caminho das URLs do Xtream Codes (/live/<usuário>/<senha>/<id>,
+    /<usuário>/<senha>/<id>) ou do parâmetro `username`. O provedor é o
+    grupo do host em `groups` (host → grupo), para que os domínios
+    alternativos de um mesmo provedor contem na mesma conta; hosts fora
+    dos grupos valem cada um como um provedor.
+    """
+    parts = urlsplit(url)
+    host = parts.netloc.lower()
+    if groups:
+        host = groups.get(host) or groups.get((parts.hostname or "").lower()) or host
+    segments = [segment for segment in parts.path.split("/") if segment]
+    account = None
+    if len(segments) >= 4 and segments[0] in XTREAM_STREAM_TYPES:
+        account = segments[1]
+    elif len(segments) == 3 and segments[2].split(".")[0].isdigit():
+        account = segments[0]
+    else:
+        account = (parse_qs(parts.query).get("username") or [None])[0]
+    return f"{host}/{account}" if account else host
+
+def group_hosts(groups: Optional[Dict[str, List[str]]] = None,
+                    mirror_hosts: Optional[Dict[str, List[str]]] = None) -> Dict[str, str]:
+    """Host → grupo, a partir dos grupos configurados e das trocas de host.
+
+    Os hosts alternativos de `mirror_hosts` entram no grupo do host de
+    origem (que dá nome ao grupo), a menos que já estejam em `groups`.
+    """
+    mapping: Dict[str, str] = {}
+    for origin, alternates in (mirror_hosts or {}).items():
+        for host in [origin, *alternates]:
+            mapping.setdefault(host.lower(), origin.lower())
+    for name, hosts in (groups or {}).items():
+        for host in hosts:
+            mapping[host.lower()] = name.lower()
+    return mapping
+
+class ProviderBusy(Exception):
+    """A conta do provedor está no limite de conexões e a fila não andou a tempo"""
+
+class Lease:
+    """Uma conexão com o provedor contada no limite da conta.
+
+    Quem abre a conexão marca cada bloco entregue com touch(); um stream
+    que não anda há muito tempo (player pausado, resposta abandonada) pode
+    ser interrompido por preempt() para dar lugar a um novo.
+    """
+
+    def __init__(self, limiter: "ProviderLimiter", provider: str, url: str, counted: bool):
+        self.limiter = limiter
+        self.provider = provider
+        self.url = url
+        # False para provedores sem limite: a conexão só aparece nas estatísticas
+        self.counted = counted
+        self.started = self.last_active = time.monotonic()
+        self.bytes = 0
+        self.released = False
+        # Fecha a conexão com o provedor; definido por quem a abriu
+        self.on_preempt: Optional[Callable[[], None]] = None
+
+    def touch(self, size: int) -> None:
+        self.bytes += size
+        self.last_active = time.monotonic()
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self.last_active
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.limiter._release(self)
+
+    def preempt(self) -> None:
+        if self.on_preempt is not None:
+            self.on_preempt()
+        self.release()
+
+class _ProviderState:
+    def __init__(self):
+        self.leases: Set[Lease] = set()
+        self.waiters: Deque[asyncio.Event] = deque()
+
+class ProviderLimiter:
+    """Limita as conexões simultâneas com cada conta de provedor.
+
+    Acima do limite, novos streams entram numa fila por conta (na ordem de
+    chegada) e esperam até `queue_timeout` segundos por uma vaga; sem vaga,
+    acquire() levanta ProviderBusy e o player recebe 503 em vez de o
+    provedor derrubar todos os streams da conta. Com `idle_timeout`, um
+    stream parado há mais que isso cede a vaga para quem está na fila.
+
+    Com `store`, a contagem vale para todos os workers do proxy; cada worker
+    só interrompe os streams que ele mesmo serve.
+
+    As contas são identificadas por provider_of(): usuário das URLs e grupo
+    do host, então um espelho em outro domínio do mesmo provedor (ver
+    group_hosts()) ocupa vaga na mesma conta.
+    """
+
+    # Com vários workers: intervalo em que a fila confere vagas liberadas por outros processos
+    POLL_INTERVAL = 0.25
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None, default_limit: int = 0,
+                 queue_timeout: float = 15, max_queue: int = 50, idle_timeout: float = 0,
+                 store: Optional[SharedStore] = None, groups: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            limits: conexões por conta ("provedor/usuário") ou por provedor (vale para cada conta dele)
+            default_limit: limite dos provedores fora de `limits` (0 = sem limite)
+            queue_timeout: segundos que um stream espera na fila por uma vaga
+            max_queue: streams na fila de uma conta; acima disso, recusa na hora
+            idle_timeout: segundos sem entregar bytes até o stream poder ser interrompido (0 = nunca)
+            groups: host → grupo do provedor (ver group_hosts); sem grupo, o provedor é o host
+        """
+        self.limits = {key.lower(): limit for key, limit in (limits or {}).items()}
+        self.default_limit = default_limit
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.idle_timeout = idle_timeout
+        self.shared = store
+        self.groups = groups or {}
+        self.providers: Dict[str, _ProviderState] = {}
+        self.queued = 0
+        self.rejected = 0
+        self.preempted = 0
+
+    def account(self, url: str) -> str:
+        return provider_of(url, self.groups)
+
+    def limit_for(self, provider: str) -> int:
+        """Limite da conta, do provedor (grupo ou host, com porta se houver) ou o padrão"""
+        host = provider.split("/", 1)[0]
+        for key in (provider, host, urlsplit(f"//{host}").hostname):
+            if key in self.limits:
+                return self.limits[key]
+        return self.default_limit
+
+    async def acquire(self, url: str) -> Lease:
+        """Vaga para abrir `url`, esperando na fila da conta se preciso"""
+        provider = self.account(url)
+        limit = self.limit_for(provider)
+        state = self._state(provider)
+        if not limit:
+            return self._grant(state, provider, url)
+        if not state.waiters and await self._take(state, provider, limit):
+            return self._grant(state, provider, url)
+        if len(state.waiters) >= self.max_queue:
+            self.rejected += 1
+            raise ProviderBusy(provider)
+
+        waiter = asyncio.Event()
+        state = self.providers.setdefault(provider, state)
+        state.waiters.append(waiter)
+        self.queued += 1
+        deadline = time.monotonic() + self.queue_timeout
+        try:
+            while True:
+                # Só o primeiro da fila disputa a vaga: quem chegou antes entra antes
+                if state.waiters[0] is waiter:
+                    if await self._take(state, provider, limit):
+                        return self._grant(state, provider, url)
+                    if self._preempt_idle(state):
+                        continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    raise ProviderBusy(provider)
+                if self.shared is not None or self.idle_timeout:
+                    remaining = min(remaining, self.POLL_INTERVAL)
+                waiter.clear()
+                try:
+                    await asyncio.wait_for(waiter.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            state.waiters.remove(waiter)
+            if state.waiters:
+                state.waiters[0].set()
+            elif not state.leases and self.providers.get(provider) is state:
+                del self.providers[provider]
+
+    async def try_acquire(self, url: str) -> Optional[Lease]:
+        """Vaga imediata, sem fila e sem interromper ninguém; None se a conta está no limite"""
+        provider = self.account(url)
+        limit = self.limit_for(provider)
+        state = self._state(provider)
+        if limit and (state.waiters or not await self._take(state, provider, limit)):
+            return None
+        return self._grant(state, provider, url)
+
+    def _state(self, provider: str) -> _ProviderState:
+        """Estado da conta; um novo só é registrado em providers ao ganhar vaga ou entrar na fila"""
+        return self.providers.get(provider) or _ProviderState()
+
+    async def _take(self, state: _ProviderState, provider: str, limit: int) -> bool:
+        if self.shared is not None:
+            return await self.shared.run(self.shared.incr_below, f"provider:{provider}", limit)
+        return len(state.leases) < limit
+
+    def _grant(self, state: _ProviderState, provider: str, url: str) -> Lease:
+        lease = Lease(self, provider, url, counted=bool(self.limit_for(provider)))
+        # A conta pode ter sido descartada enquanto _take esperava o estado compartilhado
+        self.providers.setdefault(provider, state).leases.add(lease)
+        return lease
+
+    def _preempt_idle(self, state: _ProviderState) -> bool:
+        """Interrompe o stream parado há mais tempo, se passou de `idle_timeout`"""
+        if not self.idle_timeout or not state.leases:
+            return False
+        lease = max(state.leases, key=Lease.idle_for)
+        if lease.idle_for() < self.idle_timeout:
+            return False
+        self.preempted += 1
+        lease.preempt()
+        return True
+
+    def _release(self, lease: Lease) -> None:
+        state = self.providers.get(lease.provider)
+        if state is None or lease not in state.leases:
+            return
+        state.leases.discard(lease)
+        if self.shared is not None and lease.counted:
+            # Na mesma fila do incr_below de quem for acordado abaixo, então é aplicado antes
+            self.shared.submit(self.shared.incr, f"provider:{lease.provider}", -1)
+        if state.waiters:
+            state.waiters[0].set()
+        elif not state.leases:
+            del self.providers[lease.provider]
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            "admission": {
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "preempted": self.preempted,
+                "waiting": sum(len(state.waiters) for state in self.providers.values())
+            },
+            "provider_connections": {
+                provider: len(state.leases) for provider, state in self.providers.items() if state.leases
+            }
+        }
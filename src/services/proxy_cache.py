@@ -0,0 +1,236 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Optional, Tuple
+import aiofiles
+from .shared_store import SharedStore
+
+class SegmentCache:
+    """Cache LRU em disco dos segmentos HLS (.ts/.m4s) servidos pelo proxy.
+
+    O índice (chave → tamanho) fica em memória, em ordem de uso, e é
+    reconstruído a partir dos arquivos ao iniciar. Ao passar de `max_bytes`
+    os segmentos usados há mais tempo são apagados. Um segmento sendo
+    baixado é registrado como "em andamento": outros espectadores esperam
+    por ele em vez de buscá-lo de novo no provedor.
+
+    Com `store` (vários workers no mesmo diretório), a reserva do download
+    vale entre processos, segmentos gravados por outro worker são
+    reconhecidos no disco e o limite de tamanho é conferido relendo o
+    diretório.
+    """
+
+    # Com vários workers: segundos entre releituras do diretório para conferir o tamanho total
+    RESCAN_INTERVAL = 10
+
+    def __init__(self, cache_dir: str = "data/segment_cache", max_bytes: int = 1024 ** 3,
+                 max_segment_bytes: int = 32 * 1024 ** 2, wait_timeout: float = 30,
+                 store: Optional[SharedStore] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_segment_bytes = max_segment_bytes
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+        self.total = 0
+        self.hits = 0
+        self.misses = 0
+        # Segmentos sendo baixados: url → (evento de conclusão, início)
+        self.wait_timeout = wait_timeout
+        self.inflight: Dict[str, Tuple[asyncio.Event, float]] = {}
+        self.shared = store
+        self._load()
+
+    def _key(self, url: str) -> str:
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.seg")
+
+    def _load(self) -> None:
+        """Reconstrói o índice com os segmentos já em disco, do mais antigo ao mais novo"""
+        self.entries.clear()
+        self.total = 0
+        self._scanned = time.monotonic()
+        if not os.path.isdir(self.cache_dir):
+            return
+        found = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if name.endswith(".tmp"):
+                    # Com outros workers, só as sobras antigas: as recentes podem estar sendo gravadas
+                    if self.shared is None or now - os.path.getmtime(path) > self.wait_timeout:
+                        os.remove(path)
+                elif name.endswith(".seg"):
+                    found.append((os.path.getmtime(path), name[:-4], os.path.getsize(path)))
+            except OSError:
+                continue
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total += size
+        self._evict()
+
+    def get(self, url: str) -> Optional[str]:
+        """Caminho do segmento em cache, ou None"""
+        key = self._key(url)
+        path = self._path(key)
+        if key not in self.entries:
+            if self.shared is None or not self._adopt(key, path):
+                self.misses += 1
+                return None
+        elif not os.path.exists(path):
+            self.total -= self.entries.pop(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        if self.shared is not None:
+            # O LRU entre workers é pela data do arquivo
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        self.hits += 1
+        return path
+
+    def _adopt(self, key: str, path: str) -> bool:
+        """Registra um segmento gravado por outro worker"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        self.entries[key] = size
+        self.total += size
+        return True
+
+    async def begin(self, url: str) -> bool:
+        """Reserva o download do segmento; False se outro espectador já está baixando.
+
+        Quem reserva deve passar a resposta por store() ou chamar abandon().
+        """
+        if self._reserved(url):
+            return False
+        if self.shared is not None:
+            if not await self.shared.run(self.shared.claim, f"segment:{self._key(url)}", self.wait_timeout):
+                return False
+            # A reserva entre workers é do processo: outro espectador deste worker pode ter chegado antes
+            if self._reserved(url):
+                return False
+        self.inflight[url] = (asyncio.Event(), time.monotonic())
+        return True
+
+    def _reserved(self, url: str) -> bool:
+        claim = self.inflight.get(url)
+        # Reserva esquecida (resposta nunca iniciada): expira com o tempo de espera
+        return claim is not None and time.monotonic() - claim[1] < self.wait_timeout
+
+    def abandon(self, url: str) -> None:
+        """Libera a reserva sem gravar nada; quem esperava busca no provedor"""
+        claim = self.inflight.pop(url, None)
+        if claim is not None:
+            claim[0].set()
+            if self.shared is not None:
+                self.shared.submit(self.shared.release, f"segment:{self._key(url)}")
+
+    async def wait(self, url: str) -> Optional[str]:
+        """Se o segmento está sendo baixado, aguarda e devolve o caminho em cache"""
+        claim = self.inflight.get(url)
+        if claim is None:
+            if self.shared is not None and await self.shared.run(self.shared.claimed, f"segment:{self._key(url)}"):
+                return await self._wait_other_worker(url)
+            return None
+        try:
+            await asyncio.wait_for(claim[0].wait(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.get(url)
+
+    async def _wait_other_worker(self, url: str) -> Optional[str]:
+        """Segmento sendo baixado por outro processo: consulta a reserva até ela ser liberada"""
+        claim_key = f"segment:{self._key(url)}"
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            if not await self.shared.run(self.shared.claimed, claim_key):
+                return self.get(url)
+        return None
+
+    async def store(self, url: str, chunks: AsyncIterator[bytes], size: Optional[int]) -> AsyncIterator[bytes]:
+        """Repassa `chunks` gravando o segmento reservado com begin(); só entra no cache se chegar inteiro.
+
+        Sem tamanho conhecido ou acima de `max_segment_bytes`, apenas repassa.
+        """
+        if not size or size > self.max_segment_bytes:
+            self.abandon(url)
+            try:
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                await chunks.aclose()
+            return
+
+        key = self._key(url)
+        path = self._path(key)
+        tmp_path = f"{path}.{id(chunks)}.tmp"
+        received = 0
+        f = None
+        try:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                f = await aiofiles.open(tmp_path, "wb")
+            except OSError as e:
+                logging.error(f"Erro ao abrir segmento em cache: {str(e)}")
+
+            async for chunk in chunks:
+                if f is not None:
+                    try:
+                        await f.write(chunk)
+                    except OSError as e:
+                        # Falha no disco não interrompe o player: segue só repassando
+                        logging.error(f"Erro ao gravar segmento em cache: {str(e)}")
+                        await f.close()
+                        f = None
+                received += len(chunk)
+                yield chunk
+
+            if f is not None and received == size:
+                await f.close()
+                f = None
+                try:
+                    os.replace(tmp_path, path)
+                    self._add(key, size)
+                except OSError as e:
+                    logging.error(f"Erro ao gravar segmento em cache: {str(e)}")
+        finally:
+            await chunks.aclose()
+            if f is not None:
+                await f.close()
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            self.abandon(url)
+
+    def _add(self, key: str, size: int) -> None:
+        if key in self.entries:
+            self.total -= self.entries.pop(key)
+        self.entries[key] = size
+        self.total += size
+        # O índice local não vê o que os outros workers gravaram; o disco vê
+        if self.shared is not None and (self.total > self.max_bytes
+                                       or time.monotonic() - self._scanned > self.RESCAN_INTERVAL):
+            self._load()
+        else:
+            self._evict()
+
+    def _evict(self) -> None:
+        while self.total > self.max_bytes and self.entries:
+            key, size = self.entries.popitem(last=False)
+            self.total -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
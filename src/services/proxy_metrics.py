@@ -0,0 +1,268 @@
+import time
+import itertools
+from collections import Counter
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Sequence
+import aiohttp
+
+# Limites (segundos) dos histogramas de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, limit in enumerate(self.buckets):
+            if value <= limit:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> List[int]:
+        return list(itertools.accumulate(self.counts))
+
+    def to_dict(self) -> Dict:
+        return {
+            "buckets": dict(zip((str(b) for b in self.buckets), self.cumulative())),
+            "sum": round(self.sum, 6),
+            "count": self.count,
+            "avg": round(self.sum / self.count, 6) if self.count else 0
+        }
+
+class StreamStats:
+    """Uma requisição em andamento no /proxy"""
+
+    def __init__(self, stream_id: int, path: str):
+        self.id = stream_id
+        self.path = path
+        self.started = time.monotonic()
+        self.status: Optional[int] = None
+        self.bytes_out = 0
+        self.ttfb: Optional[float] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "path": self.path,
+            "status": self.status,
+            "seconds": round(time.monotonic() - self.started, 3),
+            "bytes_out": self.bytes_out,
+            "ttfb": round(self.ttfb, 6) if self.ttfb is not None else None
+        }
+
+class ProxyMetrics:
+    """Contadores do proxy, expostos em /metrics (texto do Prometheus ou JSON).
+
+    O tráfego para os players é medido por um middleware ASGI (ver
+    MetricsMiddleware), que vê todas as respostas, inclusive as servidas do
+    cache; o tráfego vindo dos provedores e os tempos de conexão, pelos
+    pontos que leem do provedor e por um TraceConfig do aiohttp.
+    """
+
+    PREFIX = "m3utostrm_proxy"
+
+    def __init__(self):
+        self.started = time.time()
+        self.streams: Dict[int, StreamStats] = {}
+        self.requests = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.errors: Counter = Counter()  # status devolvido ao player
+        self.upstream_errors: Counter = Counter()  # status do provedor, ou "connection"
+        self.failovers = 0  # respostas vindas de um espelho, não da URL principal
+        self.ttfb = Histogram()
+        self.upstream_connect = Histogram()
+        self.upstream_response = Histogram()
+        self._ids = itertools.count(1)
+
+    def open_stream(self, path: str) -> StreamStats:
+        stream = StreamStats(next(self._ids), path)
+        self.streams[stream.id] = stream
+        self.requests += 1
+        return stream
+
+    def close_stream(self, stream: StreamStats) -> None:
+        self.streams.pop(stream.id, None)
+        if stream.status is not None and stream.status >= 400:
+            self.errors[stream.status] += 1
+
+    def count_in(self, size: int) -> None:
+        self.bytes_in += size
+
+    def upstream_error(self, status) -> None:
+        self.upstream_errors[str(status)] += 1
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """Mede a abertura de conexões e o tempo até os cabeçalhos de cada requisição ao provedor"""
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, context: SimpleNamespace, params) -> None:
+            context.request_start = time.monotonic()
+
+        async def on_request_end(session, context: SimpleNamespace, params) -> None:
+            self.upstream_response.observe(time.monotonic() - context.request_start)
+
+        async def on_connection_create_start(session, context: SimpleNamespace, params) -> None:
+            context.connect_start = time.monotonic()
+
+        async def on_connection_create_end(session, context: SimpleNamespace, params) -> None:
+            self.upstream_connect.observe(time.monotonic() - context.connect_start)
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_connection_create_start.append(on_connection_create_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        return trace
+
+    def snapshot(self, extra: Optional[Dict] = None) -> Dict:
+        data = {
+            "uptime": round(time.time() - self.started, 1),
+            "active_streams": len(self.streams),
+            "requests": self.requests,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "errors": {str(k): v for k, v in self.errors.items()},
+            "upstream_errors": dict(self.upstream_errors),
+            "failovers": self.failovers,
+            "ttfb": self.ttfb.to_dict(),
+            "upstream_connect": self.upstream_connect.to_dict(),
+            "upstream_response": self.upstream_response.to_dict(),
+            "streams": [stream.to_dict() for stream in self.streams.values()]
+        }
+        if extra:
+            data.update(extra)
+        return data
+
+# Histogramas de uma foto de métricas: (nome no Prometheus, chave na foto, descrição)
+_HISTOGRAMS = (
+    ("ttfb_seconds", "ttfb", "Tempo até o primeiro byte enviado ao player"),
+    ("upstream_connect_seconds", "upstream_connect", "Tempo para abrir uma conexão com o provedor"),
+    ("upstream_response_seconds", "upstream_response", "Tempo até os cabeçalhos do provedor"),
+)
+_HISTOGRAM_KEYS = {key for _, key, _ in _HISTOGRAMS}
+
+def merge_snapshots(snapshots: List[Dict]) -> Dict:
+    """Soma as fotos de métricas de vários workers numa só"""
+    merged: Dict = {}
+    for snapshot in snapshots:
+        for key, value in snapshot.items():
+            if key == "streams":
+                merged.setdefault(key, []).extend(value)
+            elif key == "uptime":
+                merged[key] = max(merged.get(key, 0), value)
+            elif key in _HISTOGRAM_KEYS:
+                histogram = merged.setdefault(key, {"buckets": {}, "sum": 0.0, "count": 0})
+                for limit, count in value["buckets"].items():
+                    histogram["buckets"][limit] = histogram["buckets"].get(limit, 0) + count
+                histogram["sum"] += value["sum"]
+                histogram["count"] += value["count"]
+                histogram["avg"] = histogram["sum"] / histogram["count"] if histogram["count"] else 0
+            elif isinstance(value, dict):
+                counts = merged.setdefault(key, {})
+                for name, count in value.items():
+                    # Contagens são somadas; o resto (ex.: estado de um host) fica com o último worker
+                    if isinstance(count, (int, float)) and not isinstance(count, bool):
+                        counts[name] = counts.get(name, 0) + count
+                    else:
+                        counts[name] = count
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                merged[key] = merged.get(key, 0) + value
+    merged["workers"] = len(snapshots)
+    return merged
+
+def render_prometheus(snapshot: Dict, gauges: Optional[Dict[str, float]] = None) -> str:
+    """Foto de métricas (ProxyMetrics.snapshot ou merge_snapshots) no formato de texto do Prometheus"""
+    p = ProxyMetrics.PREFIX
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str, value) -> None:
+        lines.extend((f"# HELP {p}_{name} {help_text}", f"# TYPE {p}_{name} {kind}", f"{p}_{name} {value}"))
+
+    metric("active_streams", "gauge", "Requisições em andamento no /proxy", snapshot["active_streams"])
+    metric("requests_total", "counter", "Requisições recebidas no /proxy", snapshot["requests"])
+    metric("bytes_in_total", "counter", "Bytes recebidos dos provedores", snapshot["bytes_in"])
+    metric("bytes_out_total", "counter", "Bytes enviados aos players", snapshot["bytes_out"])
+    metric("failovers_total", "counter", "Respostas servidas por um espelho em vez da URL principal",
+           snapshot["failovers"])
+    for name, key, help_text in (
+        ("errors_total", "errors", "Respostas de erro enviadas aos players, por status"),
+        ("upstream_errors_total", "upstream_errors", "Falhas dos provedores, por status ou conexão"),
+    ):
+        lines.append(f"# HELP {p}_{name} {help_text}")
+        lines.append(f"# TYPE {p}_{name} counter")
+        lines += [f'{p}_{name}{{status="{k}"}} {v}' for k, v in sorted(snapshot[key].items())]
+    for name, key, help_text in _HISTOGRAMS:
+        histogram = snapshot[key]
+        lines.append(f"# HELP {p}_{name} {help_text}")
+        lines.append(f"# TYPE {p}_{name} histogram")
+        lines += [f'{p}_{name}_bucket{{le="{limit}"}} {count}' for limit, count in histogram["buckets"].items()]
+        lines.append(f'{p}_{name}_bucket{{le="+Inf"}} {histogram["count"]}')
+        lines.append(f"{p}_{name}_sum {histogram['sum']:.6f}")
+        lines.append(f"{p}_{name}_count {histogram['count']}")
+    if "provider_connections" in snapshot:
+        lines.append(f"# HELP {p}_provider_connections Conexões abertas com cada conta de provedor")
+        lines.append(f"# TYPE {p}_provider_connections gauge")
+        lines += [f'{p}_provider_connections{{provider="{k}"}} {v}'
+                  for k, v in sorted(snapshot["provider_connections"].items())]
+    if "admission" in snapshot:
+        admission = snapshot["admission"]
+        metric("admission_queued_total", "counter", "Streams que esperaram vaga no limite do provedor",
+               admission["queued"])
+        metric("admission_rejected_total", "counter", "Streams recusados (503) pelo limite do provedor",
+               admission["rejected"])
+        metric("admission_preempted_total", "counter", "Streams parados interrompidos para liberar vaga",
+               admission["preempted"])
+        metric("admission_waiting", "gauge", "Streams esperando vaga agora", admission["waiting"])
+    for name, value in (gauges or {}).items():
+        lines.append(f"# TYPE {p}_{name} gauge")
+        lines.append(f"{p}_{name} {value}")
+    return "\n".join(lines) + "\n"
+
+class MetricsMiddleware:
+    """Middleware ASGI que mede as requisições do /proxy.
+
+    Trabalha no nível do `send`, então não interfere no streaming nem na
+    detecção de desconexão do player (ao contrário de BaseHTTPMiddleware).
+    """
+
+    def __init__(self, app, metrics: ProxyMetrics, prefix: str = "/proxy"):
+        self.app = app
+        self.metrics = metrics
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            await self.app(scope, receive, send)
+            return
+
+        metrics = self.metrics
+        stream = metrics.open_stream(scope["path"])
+
+        async def send_counted(message):
+            if message["type"] == "http.response.start":
+                stream.status = message["status"]
+            elif message["type"] == "http.response.body":
+                size = len(message.get("body", b""))
+                if size:
+                    if stream.ttfb is None:
+                        stream.ttfb = time.monotonic() - stream.started
+                        metrics.ttfb.observe(stream.ttfb)
+                    stream.bytes_out += size
+                    metrics.bytes_out += size
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_counted)
+        except Exception:
+            if stream.status is None:
+                stream.status = 500
+            raise
+        finally:
+            metrics.close_stream(stream)
@@ -1,50 +1,626 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse, JSONResponse
-import requests
-from urllib.parse import unquote
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, JSONResponse, Response, FileResponse, PlainTextResponse
+import os
+import json
+import argparse
+import aiohttp
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote, unquote, urlparse
 import threading
 from .media_tester import MediaTester
+from .range_cache import RangeCache, parse_range
+from .proxy_cache import SegmentCache
+from .hls import is_hls, decode_body, rewrite_manifest
+from .live_broadcast import LiveBroadcast, is_live_source
+from .stream_index import StreamIndex
+from .redirect_cache import RedirectCache
+from .proxy_metrics import ProxyMetrics, MetricsMiddleware, merge_snapshots, render_prometheus
+from .shared_store import SharedStore
+from .mirrors import CircuitBreaker, hedge, host_of, rewrite_hosts
+from .provider_limits import Lease, ProviderBusy, ProviderLimiter, group_hosts
+
+# Cabeçalhos que valem só para uma conexão e não são repassados
+HOP_BY_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailer", "transfer-encoding", "upgrade"
+}
+
+# Cabeçalhos do player repassados ao provedor
+FORWARDED_REQUEST_HEADERS = ("range", "if-range", "user-agent")
+
+# Playlists HLS maiores que isso são repassadas sem reescrita
+MAX_MANIFEST_BYTES = 4 * 1024 * 1024
+
+# Opções do ProxyServer passadas aos workers do modo multiprocesso (JSON)
+WORKER_OPTIONS_ENV = "M3UTOSTRM_PROXY_OPTIONS"
+
+SEGMENT_CONTENT_TYPES = {".ts": "video/mp2t", ".m4s": "video/iso.segment", ".mp4": "video/mp4", ".aac": "audio/aac"}
 
 class ProxyServer:
-    def __init__(self, host="127.0.0.1", port=55950):
+    # Com vários workers: intervalo de publicação das métricas e idade máxima de uma publicação válida
+    METRICS_INTERVAL = 1
+    METRICS_MAX_AGE = 10
+
+    def __init__(self, host="127.0.0.1", port=55950, pool_limit: int = 200,
+                 pool_limit_per_host: int = 0, keepalive_timeout: float = 30,
+                 connect_timeout: float = 10, read_timeout: float = 60,
+                 chunk_size: int = 64 * 1024, range_cache: Optional[RangeCache] = None,
+                 segment_cache: Optional[SegmentCache] = None, live_fanout: bool = True,
+                 stream_index: Optional[StreamIndex] = None, redirect_ttl: float = 300,
+                 mirror_hosts: Optional[Dict[str, List[str]]] = None, hedge_delay: Optional[float] = 1.5,
+                 breaker_threshold: int = 3, breaker_cooldown: float = 30,
+                 provider_limits: Optional[Dict[str, int]] = None, provider_limit_default: int = 0,
+                 provider_queue_timeout: float = 15, idle_preempt: float = 0,
+                 provider_groups: Optional[Dict[str, List[str]]] = None,
+                 shared_store: Optional[SharedStore] = None):
+        """
+        Args:
+            pool_limit: conexões simultâneas com os provedores (0 = sem limite)
+            pool_limit_per_host: conexões simultâneas por provedor (0 = sem limite)
+            keepalive_timeout: segundos que uma conexão ociosa fica no pool
+            read_timeout: segundos sem receber dados do provedor até desistir
+            range_cache: cópia local usada quando o provedor ignora Range
+            segment_cache: cache LRU dos segmentos HLS
+            live_fanout: players do mesmo canal ao vivo compartilham uma conexão com o provedor
+            stream_index: índice que resolve os ids curtos de /proxy/s/<id>
+            redirect_ttl: segundos que a URL final de um redirecionamento é reaproveitada (0 = desativado)
+            mirror_hosts: hosts alternativos por host de origem, somados aos espelhos da playlist
+            hedge_delay: segundos sem resposta até tentar também o próximo espelho
+                (None = só após uma falha)
+            breaker_threshold: falhas seguidas que rebaixam um host por `breaker_cooldown` segundos
+            provider_limits: conexões simultâneas por conta ("provedor/usuário") ou por provedor
+            provider_limit_default: limite das contas fora de `provider_limits` (0 = sem limite)
+            provider_queue_timeout: segundos que um stream acima do limite espera por uma vaga
+            idle_preempt: segundos sem entregar bytes até um stream ceder a vaga a outro (0 = nunca)
+            provider_groups: hosts de cada provedor ({"nome": [hosts]}), que contam como uma só
+                conta por usuário; os hosts de `mirror_hosts` já são agrupados com o de origem
+            shared_store: estado comum aos workers quando o proxy roda em vários processos
+                (ver run_workers); None = processo único
+        """
         self.host = host
         self.port = port
-        self.app = FastAPI()
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.timeout = aiohttp.ClientTimeout(total=None, connect=connect_timeout, sock_read=read_timeout)
+        self.chunk_size = chunk_size
+        self.store = shared_store
+        self.range_cache = range_cache or RangeCache(chunk_size=chunk_size, store=shared_store)
+        self.segment_cache = segment_cache or SegmentCache(store=shared_store)
+        self.live_fanout = live_fanout
+        self.stream_index = stream_index if stream_index is not None else StreamIndex()
+        self.redirect_cache = RedirectCache(ttl=redirect_ttl, store=shared_store)
+        self.mirror_hosts = {host.lower(): hosts for host, hosts in (mirror_hosts or {}).items()}
+        self.hedge_delay = hedge_delay
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.limiter = ProviderLimiter(provider_limits, provider_limit_default, provider_queue_timeout,
+                                       idle_timeout=idle_preempt, store=shared_store,
+                                       groups=group_hosts(provider_groups, self.mirror_hosts))
+        self.metrics = ProxyMetrics()
+        self.range_cache.on_data = self.metrics.count_in
+        self.broadcasts: Dict[str, LiveBroadcast] = {}
+        # Conexões sendo abertas: outros players da mesma URL aguardam para saber se é ao vivo
+        self._opening: Dict[str, asyncio.Event] = {}
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.app = FastAPI(lifespan=self.lifespan)
+        self.app.add_middleware(MetricsMiddleware, metrics=self.metrics)
         self.server = None
         self.media_tester = MediaTester()
         self.setup_routes()
 
+    @asynccontextmanager
+    async def lifespan(self, app: FastAPI):
+        publisher = asyncio.create_task(self._publish_metrics()) if self.store is not None else None
+        yield
+        if publisher is not None:
+            publisher.cancel()
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.store is not None:
+            await asyncio.to_thread(self.store.close)
+
+    async def _publish_metrics(self) -> None:
+        """Publica as métricas deste worker no estado compartilhado e limpa o de workers que pararam"""
+        ticks = 0
+        while True:
+            try:
+                await self.store.run(self.store.publish, self._local_snapshot())
+                if ticks % 30 == 0:
+                    await self.store.run(self.store.reap, self.METRICS_MAX_AGE)
+            except Exception as e:
+                logging.error(f"Erro ao publicar métricas do worker: {str(e)}")
+            ticks += 1
+            await asyncio.sleep(self.METRICS_INTERVAL)
+
+    def _local_snapshot(self) -> Dict:
+        return self.metrics.snapshot({
+            "broadcasts": len(self.broadcasts),
+            "open_circuits": sum(self.breaker.is_open(host) for host in self.breaker.hosts),
+            "redirect_cache": self.redirect_cache.stats(),
+            "circuit_breaker": self.breaker.stats(),
+            **self.limiter.stats(),
+            "segment_cache": {"hits": self.segment_cache.hits, "misses": self.segment_cache.misses}
+        })
+
+    def metrics_snapshot(self) -> Dict:
+        """Métricas deste processo ou, com vários workers, a soma de todos"""
+        local = self._local_snapshot()
+        if self.store is None:
+            return local
+        return merge_snapshots([local, *self.store.snapshots(self.METRICS_MAX_AGE)])
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """Sessão compartilhada por todos os streams (criada no loop do servidor)"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_limit,
+                limit_per_host=self.pool_limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            # Sem descompressão: os bytes chegam ao player como vieram do provedor,
+            # com Content-Encoding e Content-Length originais
+            self.session = aiohttp.ClientSession(
+                connector=connector, timeout=self.timeout, auto_decompress=False,
+                trace_configs=[self.metrics.trace_config()]
+            )
+        return self.session
+
     def setup_routes(self):
         @self.app.get("/status")
         async def status():
-            return JSONResponse({"status": "active"})
+            return JSONResponse({"status": "active", "redirect_cache": self.redirect_cache.stats()})
+
+        @self.app.get("/metrics")
+        async def metrics(format: Optional[str] = None):
+            """Métricas no formato de texto do Prometheus; ?format=json para a GUI"""
+            snapshot = await asyncio.to_thread(self.metrics_snapshot)
+            if format == "json":
+                return JSONResponse(snapshot)
+            return PlainTextResponse(
+                render_prometheus(snapshot, {
+                    "workers": snapshot.get("workers", 1),
+                    "live_broadcasts": snapshot["broadcasts"],
+                    "open_circuits": snapshot["open_circuits"],
+                    "redirect_cache_hits": snapshot["redirect_cache"]["hits"],
+                    "redirect_cache_misses": snapshot["redirect_cache"]["misses"],
+                    "segment_cache_bytes": self.segment_cache.total,
+                    "segment_cache_hits": snapshot["segment_cache"]["hits"],
+                    "segment_cache_misses": snapshot["segment_cache"]["misses"]
+                }),
+                media_type="text/plain; version=0.0.4"
+            )
 
         @self.app.get("/proxy")
-        async def proxy(url: str):
-            try:
-                decoded_url = unquote(url)
-                response = requests.get(decoded_url, stream=True, allow_redirects=True)
-                response.raise_for_status()
-                
-                return StreamingResponse(
-                    response.iter_content(chunk_size=8192),
-                    media_type=response.headers.get('content-type'),
-                    headers=dict(response.headers)
-                )
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=str(e))
+        async def proxy(request: Request, url: str, hls: Optional[str] = None):
+            # URLs geradas pela reescrita de HLS chegam codificadas uma única vez
+            decoded_url = url if "://" in url else unquote(url)
+            # .strm antigos gravavam a URL sem codificar: um "&" dela cortava o parâmetro
+            query = request.url.query
+            if hls is None and query.startswith("url=") and "://" in query[4:16] and "&" in query:
+                decoded_url = query[4:]
+            return await self._serve(request, decoded_url, hls == "segment")
+
+        @self.app.get("/proxy/s/{stream_id}")
+        async def proxy_stream(request: Request, stream_id: str):
+            url = self.stream_index.resolve(stream_id)
+            if url is None:
+                raise HTTPException(status_code=404, detail="Stream não encontrado")
+            return await self._serve(request, url, False, self.stream_index.mirrors(stream_id))
 
         @self.app.get("/test")
         async def test_media(url: str):
             try:
-                success, info = self.media_tester.test_media(url)
-                if success:
-                    return JSONResponse(info)
-                else:
-                    raise HTTPException(status_code=400, detail=info["error"])
+                # ffprobe bloqueia por até 10s; fora do loop para não travar os streams
+                success, info = await asyncio.to_thread(self.media_tester.test_media, url)
             except Exception as e:
                 raise HTTPException(status_code=500, detail=str(e))
+            if success:
+                return JSONResponse(info)
+            raise HTTPException(status_code=400, detail=info["error"])
+
+    async def _serve(self, request: Request, decoded_url: str, is_segment: bool,
+                     mirrors: Sequence[str] = ()) -> Response:
+        range_header = request.headers.get("range")
+
+        # Arquivo já (ou sendo) copiado para o cache: a busca nem chega ao provedor
+        if range_header:
+            cached = self._cached_range_response(decoded_url, range_header, request.headers.get("if-range"))
+            if cached is not None:
+                return cached
+
+        # Segmento já em disco, ou sendo baixado para outro espectador
+        claimed = False
+        if is_segment and not range_header:
+            cached = self.segment_cache.get(decoded_url) or await self.segment_cache.wait(decoded_url)
+            if cached is not None:
+                return FileResponse(cached, media_type=self._segment_type(decoded_url))
+            claimed = await self.segment_cache.begin(decoded_url)
+
+        # Canal ao vivo já aberto por outro player: entra no mesmo fluxo
+        shared = self.live_fanout and not range_header and not is_segment and is_live_source(decoded_url)
+        opening = None
+        if shared:
+            joined = await self._join_broadcast(decoded_url)
+            if joined is not None:
+                return joined
+            opening = self._opening[decoded_url] = asyncio.Event()
+
+        try:
+            return await self._proxy_upstream(request, decoded_url, range_header, is_segment, claimed, shared,
+                                              mirrors)
+        except BaseException:
+            if claimed:
+                self.segment_cache.abandon(decoded_url)
+            raise
+        finally:
+            if opening is not None:
+                if self._opening.get(decoded_url) is opening:
+                    del self._opening[decoded_url]
+                opening.set()
+
+    async def _proxy_upstream(self, request: Request, decoded_url: str, range_header: Optional[str],
+                              is_segment: bool, claimed: bool, shared: bool,
+                              mirrors: Sequence[str] = ()) -> Response:
+        headers = {
+            name: request.headers[name] for name in FORWARDED_REQUEST_HEADERS if name in request.headers
+        }
+        try:
+            upstream, lease = await self._open_upstream(decoded_url, headers, mirrors)
+        except ProviderBusy as e:
+            logging.warning(f"Limite de conexões do provedor atingido: {str(e)}")
+            raise HTTPException(status_code=503, detail="Limite de conexões do provedor atingido",
+                                headers={"Retry-After": str(max(1, int(self.limiter.queue_timeout)))})
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error(f"Erro ao conectar ao provedor: {str(e)}")
+            raise HTTPException(status_code=502, detail=str(e) or "Tempo limite de conexão excedido")
+
+        try:
+            if upstream.status == 416:
+                upstream.release()
+                lease.release()
+                return Response(status_code=416, headers=self._response_headers(upstream))
+            if upstream.status >= 400:
+                upstream.release()
+                raise HTTPException(status_code=502, detail=f"Provedor respondeu {upstream.status}")
+
+            # Provedor sem suporte a Range respondeu o arquivo inteiro
+            if range_header and upstream.status == 200:
+                ranged = await self._range_fallback(decoded_url, upstream, range_header,
+                                                    request.headers.get("if-range"), lease)
+                if ranged is not None:
+                    return ranged
+
+            if upstream.status == 200 and not is_segment and is_hls(str(upstream.url), upstream.headers.get("content-type")):
+                manifest = await self._manifest_response(upstream)
+                if manifest is not None:
+                    lease.release()
+                    return manifest
+
+            # Canal sem Content-Length, sem compressão e sem busca por Range: fluxo ao
+            # vivo, repartido entre os players
+            if (shared and upstream.status == 200 and upstream.content_length is None
+                    and not upstream.headers.get("content-encoding")
+                    and upstream.headers.get("accept-ranges", "none").lower() == "none"):
+                def on_data(size: int) -> None:
+                    self.metrics.count_in(size)
+                    lease.touch(size)
+
+                def on_close(broadcast: LiveBroadcast) -> None:
+                    self._broadcast_closed(broadcast)
+                    lease.release()
+
+                broadcast = LiveBroadcast(
+                    decoded_url, upstream, self._response_headers(upstream),
+                    chunk_size=self.chunk_size, on_close=on_close, on_data=on_data
+                )
+                lease.on_preempt = broadcast.close
+                self.broadcasts[decoded_url] = broadcast
+                return self._broadcast_response(broadcast)
+        except BaseException:
+            lease.release()
+            raise
+
+        body = self._relay(upstream, lease)
+        if claimed:
+            if upstream.status == 200:
+                body = self.segment_cache.store(decoded_url, body, upstream.content_length)
+            else:
+                self.segment_cache.abandon(decoded_url)
+        return StreamingResponse(
+            body,
+            status_code=upstream.status,
+            media_type=upstream.headers.get('content-type'),
+            headers=self._response_headers(upstream)
+        )
+
+    async def _open_upstream(self, url: str, headers: Dict[str, str],
+                             mirrors: Sequence[str] = ()) -> Tuple[aiohttp.ClientResponse, Lease]:
+        """Abre a URL ou um dos seus espelhos, o que responder primeiro.
+
+        Os espelhos vêm do índice de streams e das trocas de host configuradas;
+        hosts rebaixados pelo circuit breaker ficam por último. Se o primeiro
+        não responder em `hedge_delay` segundos (ou falhar), o próximo também é
+        tentado e vence a primeira resposta sem erro.
+
+        Cada conexão ocupa uma vaga no limite da conta do provedor (ver
+        ProviderLimiter): o primeiro candidato espera na fila da conta, os
+        espelhos só são tentados se a conta deles tiver vaga livre.
+        """
+        candidates = list(dict.fromkeys([url, *mirrors, *rewrite_hosts(url, self.mirror_hosts)]))
+        if len(candidates) == 1:
+            return await self._admitted_fetch(url, headers)
+
+        attempts = [lambda candidate=candidate, wait=index == 0: self._admitted_fetch(candidate, headers, wait)
+                    for index, candidate in enumerate(self.breaker.order(candidates))]
+        (upstream, lease), index = await hedge(
+            attempts, self.hedge_delay,
+            accept=lambda result: result[0].status < 400 or result[0].status == 416,
+            discard=self._discard_upstream
+        )
+        if index > 0:
+            self.metrics.failovers += 1
+        return upstream, lease
+
+    async def _admitted_fetch(self, url: str, headers: Dict[str, str],
+                              wait: bool = True) -> Tuple[aiohttp.ClientResponse, Lease]:
+        """_fetch dentro do limite de conexões da conta; sem `wait`, ProviderBusy se não há vaga livre"""
+        if wait:
+            lease = await self.limiter.acquire(url)
+        else:
+            lease = await self.limiter.try_acquire(url)
+            if lease is None:
+                raise ProviderBusy(self.limiter.account(url))
+        try:
+            upstream = await self._fetch(url, headers)
+        except BaseException:
+            lease.release()
+            raise
+        lease.on_preempt = upstream.close
+        return upstream, lease
+
+    def _discard_upstream(self, result: Tuple[aiohttp.ClientResponse, Lease]) -> None:
+        upstream, lease = result
+        upstream.close()
+        lease.release()
+
+    async def _fetch(self, url: str, headers: Dict[str, str]) -> aiohttp.ClientResponse:
+        """Abre a URL indo direto ao destino final em cache, se houver.
+
+        Se o destino em cache falhar (erro de conexão ou 4xx/5xx), a entrada é
+        descartada e a requisição refeita a partir da URL de origem.
+        """
+        session = self.get_session()
+        target = await self.redirect_cache.get(url)
+        if target is not None:
+            try:
+                upstream = await session.get(target, headers=headers, allow_redirects=True)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self.metrics.upstream_error("connection")
+                await self.redirect_cache.invalidate(url)
+            else:
+                if upstream.status < 400 or upstream.status == 416:
+                    if upstream.history:
+                        await self.redirect_cache.put(url, str(upstream.url))
+                    return upstream
+                self.metrics.upstream_error(upstream.status)
+                upstream.release()
+                await self.redirect_cache.invalidate(url)
+
+        try:
+            upstream = await session.get(url, headers=headers, allow_redirects=True)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.metrics.upstream_error("connection")
+            self.breaker.failure(host_of(url))
+            raise
+        if upstream.status >= 400:
+            self.metrics.upstream_error(upstream.status)
+        # 4xx é do pedido (token, arquivo), não do host
+        if upstream.status >= 500:
+            self.breaker.failure(host_of(url))
+        else:
+            self.breaker.success(host_of(url))
+        if upstream.history and upstream.status < 400:
+            await self.redirect_cache.put(url, str(upstream.url))
+        return upstream
+
+    async def _join_broadcast(self, url: str) -> Optional[Response]:
+        opening = self._opening.get(url)
+        if opening is not None:
+            try:
+                await asyncio.wait_for(opening.wait(), self.timeout.connect)
+            except asyncio.TimeoutError:
+                return None
+        broadcast = self.broadcasts.get(url)
+        if broadcast is None or broadcast.closed:
+            return None
+        return self._broadcast_response(broadcast)
+
+    def _broadcast_response(self, broadcast: LiveBroadcast) -> Response:
+        subscriber = broadcast.subscribe()
+        return StreamingResponse(
+            broadcast.stream(subscriber),
+            media_type=broadcast.media_type,
+            headers=broadcast.headers
+        )
+
+    def _broadcast_closed(self, broadcast: LiveBroadcast) -> None:
+        if self.broadcasts.get(broadcast.url) is broadcast:
+            del self.broadcasts[broadcast.url]
+
+    async def _relay(self, upstream: aiohttp.ClientResponse, lease: Lease) -> AsyncIterator[bytes]:
+        """Repassa o corpo da resposta; a conexão volta ao pool só se foi lida até o fim.
+
+        Quando o player desconecta, o Starlette cancela este gerador e a conexão
+        com o provedor é fechada em vez de continuar baixando. Um player
+        pausado para de consumir os blocos, e a vaga fica marcada como ociosa.
+        """
+        completed = False
+        try:
+            async for chunk in upstream.content.iter_chunked(self.chunk_size):
+                self.metrics.count_in(len(chunk))
+                yield chunk
+                lease.touch(len(chunk))
+            completed = True
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if not lease.released:
+                logging.error(f"Erro ao ler do provedor: {str(e)}")
+        finally:
+            if completed:
+                upstream.release()
+            else:
+                upstream.close()
+            lease.release()
+
+    async def _manifest_response(self, upstream: aiohttp.ClientResponse) -> Optional[Response]:
+        """Playlist HLS com variantes e segmentos apontando de volta para o proxy.
+
+        Devolve None (resposta ainda não lida) quando a playlist é grande demais.
+        """
+        if upstream.content_length and upstream.content_length > MAX_MANIFEST_BYTES:
+            return None
+        try:
+            raw = await upstream.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            upstream.close()
+            raise HTTPException(status_code=502, detail=str(e) or "Tempo limite de leitura excedido")
+        upstream.release()
+        self.metrics.count_in(len(raw))
+
+        try:
+            body = decode_body(raw, upstream.headers.get("content-encoding"))
+        except Exception as e:
+            logging.error(f"Erro ao descomprimir playlist HLS: {str(e)}")
+            body = None
+        if body is None or not body.lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"#EXTM3U"):
+            # Não é uma playlist que dê para reescrever: segue como veio
+            return Response(content=raw, media_type=upstream.headers.get("content-type"),
+                            headers=self._response_headers(upstream))
+
+        text = rewrite_manifest(body.decode("utf-8", errors="replace"), str(upstream.url), self._proxy_path)
+        return Response(content=text, media_type="application/vnd.apple.mpegurl",
+                        headers={"Cache-Control": "no-cache"})
+
+    def _proxy_path(self, url: str, is_segment: bool) -> str:
+        path = f"/proxy?url={quote(url, safe='')}"
+        return f"{path}&hls=segment" if is_segment else path
+
+    def _segment_type(self, url: str) -> str:
+        extension = os.path.splitext(urlparse(url).path)[1].lower()
+        return SEGMENT_CONTENT_TYPES.get(extension, "application/octet-stream")
+
+    def _cached_range_response(self, url: str, range_header: str, if_range: Optional[str]) -> Optional[Response]:
+        fill = self.range_cache.pending(url)
+        meta = fill.meta if fill is not None else self.range_cache.lookup(url)
+        if meta is None:
+            return None
+        # If-Range que não confere com a cópia local: o arquivo mudou, quem decide é o provedor
+        if if_range and if_range not in (meta.get("etag"), meta.get("last_modified")):
+            return None
+
+        try:
+            byte_range = parse_range(range_header, meta["size"])
+        except ValueError:
+            return self._range_not_satisfiable(meta["size"])
+        if byte_range is None:
+            return None
+        start, end = byte_range
+        return StreamingResponse(
+            self.range_cache.read(url, start, end, fill),
+            status_code=206,
+            media_type=meta.get("content_type"),
+            headers=self._range_headers(start, end, meta["size"], meta.get("etag"), meta.get("last_modified"))
+        )
+
+    async def _range_fallback(self, url: str, upstream: aiohttp.ClientResponse, range_header: str,
+                              if_range: Optional[str], lease: Lease) -> Optional[Response]:
+        """Responde 206 a partir de uma resposta 200 completa.
+
+        Arquivos que cabem no cache são copiados para o disco e o intervalo é
+        lido de lá; os demais são repassados descartando os bytes anteriores
+        ao início pedido. Sem tamanho conhecido (ao vivo) ou com corpo
+        comprimido, ou quando o If-Range não confere, devolve None e a
+        resposta segue inteira.
+        """
+        total = upstream.content_length
+        if not total or upstream.headers.get("content-encoding"):
+            return None
+        if if_range and if_range not in (upstream.headers.get("etag"), upstream.headers.get("last-modified")):
+            return None
+        try:
+            byte_range = parse_range(range_header, total)
+        except ValueError:
+            upstream.close()
+            lease.release()
+            return self._range_not_satisfiable(total)
+        if byte_range is None:
+            return None
+
+        start, end = byte_range
+        fill = None
+        if self.range_cache.can_store(total):
+            fill = await self.range_cache.fill(url, upstream, on_data=lease.touch, on_close=lease.release)
+        if fill is not None:
+            body = self.range_cache.read(url, start, end, fill)
+        else:
+            body = self._relay_range(upstream, start, end, lease)
+        return StreamingResponse(
+            body,
+            status_code=206,
+            media_type=upstream.headers.get("content-type"),
+            headers=self._range_headers(start, end, total, upstream.headers.get("etag"),
+                                        upstream.headers.get("last-modified"))
+        )
+
+    async def _relay_range(self, upstream: aiohttp.ClientResponse, start: int, end: int,
+                           lease: Lease) -> AsyncIterator[bytes]:
+        """Repassa só os bytes [start, end] de uma resposta completa"""
+        position = 0
+        try:
+            async for chunk in upstream.content.iter_chunked(self.chunk_size):
+                self.metrics.count_in(len(chunk))
+                chunk_end = position + len(chunk)
+                if chunk_end > start:
+                    yield chunk[max(0, start - position):end + 1 - position]
+                lease.touch(len(chunk))
+                position = chunk_end
+                if position > end:
+                    break
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error(f"Erro ao ler do provedor: {str(e)}")
+        finally:
+            if upstream.content.at_eof():
+                upstream.release()
+            else:
+                upstream.close()
+            lease.release()
+
+    def _range_headers(self, start: int, end: int, total: int, etag: Optional[str] = None,
+                       last_modified: Optional[str] = None) -> Dict[str, str]:
+        headers = {
+            "Accept-Ranges": "bytes",
+            "Content-Range": f"bytes {start}-{end}/{total}",
+            "Content-Length": str(end - start + 1)
+        }
+        if etag:
+            headers["ETag"] = etag
+        if last_modified:
+            headers["Last-Modified"] = last_modified
+        return headers
+
+    def _range_not_satisfiable(self, total: int) -> Response:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{total}"})
+
+    def _response_headers(self, upstream: aiohttp.ClientResponse) -> Dict[str, str]:
+        return {
+            key: value for key, value in upstream.headers.items()
+            if key.lower() not in HOP_BY_HOP_HEADERS and key.lower() != "content-type"
+        }
 
     def start(self):
         def run_server():
@@ -59,4 +635,55 @@ class ProxyServer:
         pass
 
     def get_proxy_url(self, original_url: str) -> str:
-        return f"http://{self.host}:{self.port}/proxy?url={original_url}"
+        # Codificada: "&" e "#" da URL do provedor quebrariam a query string
+        return f"http://{self.host}:{self.port}/proxy?url={quote(original_url, safe='')}"
+
+def create_app() -> FastAPI:
+    """Fábrica chamada em cada worker do modo multiprocesso (ver run_workers).
+
+    Cada processo abre suas próprias conexões com o índice de streams e com
+    o estado compartilhado; as opções chegam por WORKER_OPTIONS_ENV.
+    """
+    options = json.loads(os.environ.get(WORKER_OPTIONS_ENV, "{}"))
+    stream_index_file = options.pop("stream_index_file", "data/stream_index.db")
+    state_file = options.pop("state_file", "data/proxy_state.db")
+    server = ProxyServer(**options, stream_index=StreamIndex(stream_index_file),
+                         shared_store=SharedStore(state_file))
+    return server.app
+
+def run_workers(workers: int, host: str = "127.0.0.1", port: int = 55950, **options) -> None:
+    """Roda o proxy em `workers` processos escutando na mesma porta.
+
+    O uvicorn abre o socket uma vez e os workers aceitam conexões dele.
+    Caches, índice de streams, destinos de redirecionamento e métricas são
+    comuns a todos pelo disco e pelo SharedStore; canais ao vivo são
+    compartilhados só entre os players atendidos pelo mesmo worker.
+    """
+    os.environ[WORKER_OPTIONS_ENV] = json.dumps({"host": host, "port": port, **options})
+    uvicorn.run("src.services.proxy_server:create_app", factory=True, host=host, port=port,
+                workers=workers, log_level="warning")
+
+def main():
+    parser = argparse.ArgumentParser(description="Proxy de streams do M3UtoSTRM, sem a interface")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=55950)
+    parser.add_argument("--config", default="config.json")
+    args = parser.parse_args()
+
+    config = {}
+    if os.path.exists(args.config):
+        with open(args.config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    options = {
+        key: config[key] for key in (
+            "mirror_hosts", "hedge_delay", "provider_limits", "provider_limit_default", "provider_queue_timeout",
+            "idle_preempt", "provider_groups", "stream_index_file", "proxy_state_file"
+        ) if key in config
+    }
+    if "proxy_state_file" in options:
+        options["state_file"] = options.pop("proxy_state_file")
+    run_workers(args.workers, args.host, args.port, **options)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,14 @@
-from typing import Dict, List, Optional, Deque
+from typing import Dict, List, Optional, Deque, Set
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 import uuid
 import logging
-from collections import deque
+from collections import deque, Counter
+from functools import lru_cache
+from urllib.parse import urlsplit
 import asyncio
 import os
-import json
+from .queue_store import QueueStore
 
 @dataclass
 class QueueItem:
@@ -21,97 +23,75 @@ class QueueItem:
     completed_at: Optional[datetime] = None
     error: Optional[str] = None
 
+@lru_cache(maxsize=4096)
+def source_host(url: str) -> str:
+    """Servidor de origem de um item, para o limite de downloads por servidor"""
+    return urlsplit(url).netloc.lower()
+
 class QueueManager:
-    def __init__(self, broadcast_handlers=None):
+    # Itens nesses estados não recebem mais progresso (linhas do yt-dlp que chegam depois do fim)
+    FINAL_STATUSES = ("completed", "error", "cancelled")
+
+    def __init__(self, broadcast_handlers=None, max_workers: int = 3, max_per_host: int = 2,
+                 queue_db: Optional[str] = None, queue_file: Optional[str] = None):
+        """
+        Args:
+            max_workers: downloads simultâneos
+            max_per_host: downloads simultâneos do mesmo servidor de origem (0 = sem limite)
+            queue_db: banco da fila (padrão: src/data/queue.db)
+            queue_file: queue.json de versões anteriores, importado para o banco na primeira vez
+        """
         self.queue: Dict[str, QueueItem] = {}
         self.processing_queue: Deque[str] = deque()  # FIFO queue
-        self.is_processing = False
-        self.current_item = None
+        self.max_workers = max(1, max_workers)
+        self.max_per_host = max_per_host
         self.processing_lock = asyncio.Lock()
         self.broadcast_handlers = broadcast_handlers or {}
-        self.current_process = None  # Adicionar referência ao processo atual
-        self.queue_file = os.path.join(os.path.dirname(__file__), "../data/queue.json")
+        # Itens em andamento: tarefa do download e processo do yt-dlp de cada um
+        self.running: Dict[str, asyncio.Task] = {}
+        self.processes: Dict[str, asyncio.subprocess.Process] = {}
+        self.video_handler = None
+        # Avisado quando entra um item ou um download termina; o despachante espera nele
+        self.work_changed = asyncio.Condition()
+        self.dispatcher: Optional[asyncio.Task] = None
+        # Versão da fila enviada aos clientes: itens mudados desde o último delta
+        # e itens que os clientes já conhecem (para separar adicionados de alterados)
+        self.version = 0
+        self.dirty: Set[str] = set()
+        self.published: Set[str] = set()
+        data_dir = os.path.join(os.path.dirname(__file__), "../data")
+        self.queue_file = queue_file or os.path.join(data_dir, "queue.json")
+        self.store = QueueStore(queue_db or os.path.join(data_dir, "queue.db"))
         self.load_queue()
         
     async def _broadcast(self, event_type, data):
         """Modificar para ser async"""
         handler = self.broadcast_handlers.get(event_type)
         if handler and asyncio.iscoroutinefunction(handler):
-            return handler(data)
+            return await handler(data)
         elif handler:
             return asyncio.create_task(handler(data))
 
     def load_queue(self):
-        """Carrega fila do arquivo JSON"""
+        """Carrega a fila do banco, migrando o antigo queue.json na primeira vez"""
         try:
-            if os.path.exists(self.queue_file):
-                with open(self.queue_file, 'r') as f:
-                    data = json.load(f)
-                    for item_data in data.get('items', []):
-                        # Converter strings de data para objetos datetime
-                        if isinstance(item_data['created_at'], str):
-                            item_data['created_at'] = datetime.fromisoformat(item_data['created_at'])
-                        if item_data.get('completed_at') and isinstance(item_data['completed_at'], str):
-                            item_data['completed_at'] = datetime.fromisoformat(item_data['completed_at'])
-                            
-                        # Atualizar status de itens interrompidos
-                        if item_data['status'] in ['downloading', 'converting', 'pending']:
-                            item_data['status'] = 'error'
-                            item_data['error'] = 'Processo interrompido'
-                            item_data['completed_at'] = datetime.now()
-                            
-                        self.queue[item_data['id']] = QueueItem(**item_data)
-                        if item_data['status'] == 'pending':
-                            self.processing_queue.append(item_data['id'])
-                            
-                logging.info(f"Fila carregada com {len(self.queue)} itens")
+            self.store.migrate_json(self.queue_file)
+            # Itens interrompidos pela parada do servidor: um UPDATE pelo índice de status
+            interrupted = self.store.interrupt_unfinished()
+            for item_data in self.store.load():
+                self.queue[item_data['id']] = QueueItem(**item_data)
+            logging.info(f"Fila carregada com {len(self.queue)} itens ({interrupted} interrompidos)")
         except Exception as e:
             logging.error(f"Erro ao carregar fila: {str(e)}")
             self.queue = {}
             self.processing_queue = deque()
 
-    def save_queue(self):
-        """Salva fila no arquivo JSON"""
+    def save_item(self, item_id: str):
+        """Grava um item no banco da fila"""
         try:
-            # Criar diretório data se não existir
-            os.makedirs(os.path.dirname(self.queue_file), exist_ok=True)
-            
-            # Cria estrutura de dados inicial se arquivo não existir
-            if not os.path.exists(self.queue_file):
-                initial_data = {
-                    'items': [],
-                    'lastUpdate': datetime.now().isoformat()
-                }
-                with open(self.queue_file, 'w') as f:
-                    json.dump(initial_data, f, indent=2)
-                logging.info(f"Arquivo de fila criado: {self.queue_file}")
-
-            # Salva dados atuais
-            data = {
-                'items': [
-                    {
-                        'id': item.id,
-                        'filename': item.filename,
-                        'url': item.url,
-                        'format_id': item.format_id,
-                        'output_format': item.output_format,
-                        'status': item.status,
-                        'progress': item.progress,
-                        'created_at': item.created_at.isoformat(),
-                        'completed_at': item.completed_at.isoformat() if item.completed_at else None,
-                        'error': item.error
-                    }
-                    for item in self.queue.values()
-                ],
-                'lastUpdate': datetime.now().isoformat()
-            }
-            
-            with open(self.queue_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            logging.debug("Fila salva com sucesso")
-            
+            self.store.upsert(self.queue[item_id])
         except Exception as e:
-            logging.error(f"Erro ao salvar fila: {str(e)}")
+            logging.error(f"Erro ao salvar item {item_id} da fila: {str(e)}")
 
     async def add_item(self, filename: str, url: str, format_id: str, output_format: str) -> str:
         """Versão assíncrona do add_item"""
@@ -127,15 +107,17 @@ class QueueManager:
             created_at=datetime.now()
         )
         self.processing_queue.append(item_id)
+        self.dirty.add(item_id)
         logging.info(f"Item adicionado à fila: {filename} (ID: {item_id})")
+        await self._notify_workers()
         
         await self._broadcast('queue_status', self)
-        self.save_queue()
+        self.save_item(item_id)
         return item_id
         
     async def update_progress(self, item_id: str, progress: float, status: str = None):
         """Atualiza progresso de forma assíncrona"""
-        if item_id in self.queue:
+        if item_id in self.queue and self.queue[item_id].status not in self.FINAL_STATUSES:
             self.queue[item_id].progress = progress
             if status:
                 self.queue[item_id].status = status
@@ -155,91 +137,163 @@ class QueueManager:
             self.queue[item_id].status = "error" if error else "completed"
             if error:
                 self.queue[item_id].error = error
+            self.dirty.add(item_id)
             logging.info(f"Item completado: {item_id} {'com erro: ' + error if error else 'com sucesso'}")
-            
+
+            # Status final vai na hora e descarta progresso ainda não enviado do item
+            await self._broadcast('progress', {
+                'item_id': item_id,
+                'progress': self.queue[item_id].progress,
+                'status': self.queue[item_id].status
+            })
             await self._broadcast('queue_status', self)
-            self.save_queue()
+            self.save_item(item_id)
+
+    def _host(self, item_id: str) -> str:
+        return source_host(self.queue[item_id].url)
+
+    def _startable(self) -> bool:
+        """Há worker livre e um item pendente cujo servidor está abaixo do limite"""
+        if len(self.running) >= self.max_workers or not self.processing_queue:
+            return False
+        if not self.max_per_host:
+            return True
+        hosts = Counter(self._host(item_id) for item_id in self.running)
+        return any(hosts[self._host(item_id)] < self.max_per_host for item_id in self.processing_queue)
+
+    async def _notify_workers(self):
+        async with self.work_changed:
+            self.work_changed.notify_all()
+
+    async def dispatch(self, video_handler):
+        """Inicia itens assim que houver item pendente e vaga; dorme enquanto não houver"""
+        while True:
+            async with self.work_changed:
+                await self.work_changed.wait_for(self._startable)
+            try:
+                await self.process_queue(video_handler)
+            except Exception as e:
+                logging.error(f"Erro ao despachar itens da fila: {str(e)}")
+                await asyncio.sleep(1)
+
+    def start_dispatcher(self, video_handler) -> asyncio.Task:
+        """Inicia (uma única vez) a tarefa dispatch() desta fila"""
+        self.video_handler = video_handler
+        if self.dispatcher is None or self.dispatcher.done():
+            self.dispatcher = asyncio.create_task(self.dispatch(video_handler))
+        return self.dispatcher
 
     async def process_queue(self, video_handler):
-        """Processa itens da fila em ordem FIFO"""
+        """Inicia os próximos itens da fila (FIFO) até ocupar os workers livres.
+
+        Um item cujo servidor já está no limite `max_per_host` fica na fila
+        sem bloquear os de outros servidores que vêm depois dele. Cada item
+        que termina libera sua vaga e acorda o despachante (ver dispatch).
+        """
         async with self.processing_lock:
-            if self.is_processing or not self.processing_queue:
+            self.video_handler = video_handler
+            hosts = Counter(self._host(item_id) for item_id in self.running)
+            for item_id in list(self.processing_queue):
+                if len(self.running) >= self.max_workers:
+                    break
+                host = self._host(item_id)
+                if self.max_per_host and hosts[host] >= self.max_per_host:
+                    continue
+                hosts[host] += 1
+                self.processing_queue.remove(item_id)
+                self.running[item_id] = asyncio.create_task(self._process_item(item_id, video_handler))
+
+    async def _process_item(self, item_id: str, video_handler):
+        """Baixa um item; roda em paralelo com os demais"""
+        item = self.queue[item_id]
+        try:
+            await self.update_progress(item_id, 0, "downloading")
+            output_path = os.path.join(
+                video_handler.directories['download_dir'],
+                f"{item.filename}.{item.output_format}"
+            )
+
+            def on_process(process):
+                self.processes[item_id] = process
+
+            _, download_success = await video_handler.download_video(
+                url=item.url,
+                output_path=output_path,
+                format_id=item.format_id,
+                item_id=item_id,
+                on_process=on_process,
+                on_progress=lambda progress: self.update_progress(item_id, progress, "downloading")
+            )
+
+            # Cancelado durante o download: cancel_item já atualizou o item
+            if item.status == "cancelled":
                 return
+            if download_success:
+                await self.complete_item(item_id)
+            else:
+                await self.complete_item(item_id, error="Falha no download")
 
-            self.is_processing = True
-            try:
-                item_id = self.processing_queue[0]
-                item = self.queue[item_id]
-                self.current_item = item_id
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Erro processando item {item_id}: {str(e)}")
+            await self.complete_item(item_id, error=str(e))
+        finally:
+            self.processes.pop(item_id, None)
+            self.running.pop(item_id, None)
+            await self._notify_workers()
 
+    async def _stop_item(self, item_id: str):
+        """Mata o processo do item em andamento e aguarda a tarefa terminar"""
+        process = self.processes.get(item_id)
+        task = self.running.get(item_id)
+        if process is not None and process.returncode is None:
+            try:
+                logging.info(f"Cancelando download do item {item_id}")
+                process.terminate()
                 try:
-                    await self.update_progress(item_id, 0, "downloading")
-                    output_path = os.path.join(
-                        video_handler.directories['download_dir'],
-                        f"{item.filename}.{item.output_format}"
-                    )
-                    
-                    self.current_process, download_success = await video_handler.download_video(
-                        url=item.url,
-                        output_path=output_path,
-                        format_id=item.format_id,
-                        item_id=item_id
-                    )
-                    
-                    if download_success:
-                        await self.complete_item(item_id)
-                    else:
-                        await self.complete_item(item_id, error="Falha no download")
-                        
-                except Exception as e:
-                    logging.error(f"Erro processando item {item_id}: {str(e)}")
-                    await self.complete_item(item_id, error=str(e))
-                finally:
-                    self.processing_queue.popleft()
-                    
-            finally:
-                self.is_processing = False
-                self.current_item = None
-                self.current_process = None
+                    await asyncio.wait_for(process.wait(), 0.5)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+            except Exception as e:
+                logging.error(f"Erro ao matar processo: {str(e)}")
+        elif task is not None:
+            # Ainda sem processo (item acabou de começar): cancela a tarefa
+            task.cancel()
+        if task is not None:
+            await asyncio.wait({task}, timeout=5)
 
     async def cancel_item(self, item_id: str):
-        """Cancela um item da fila e limpa arquivos"""
+        """Cancela um item da fila ou em andamento e limpa arquivos"""
         if item_id in self.queue:
             item = self.queue[item_id]
-            
-            # Se for o item atual, mata o processo
-            if item_id == self.current_item and self.current_process:
-                try:
-                    logging.info(f"Cancelando download do item {item_id}")
-                    self.current_process.terminate()
-                    await asyncio.sleep(0.5)
-                    if self.current_process.returncode is None:
-                        self.current_process.kill()
-                    await self.current_process.wait()
-                except Exception as e:
-                    logging.error(f"Erro ao matar processo: {str(e)}")
-                
-            # Remove arquivos parciais
-            try:
-                output_path = os.path.join(
-                    self.video_handler.directories['download_dir'],
-                    f"{item.filename}.{item.output_format}"
-                )
-                if os.path.exists(output_path):
-                    os.remove(output_path)
-                    logging.info(f"Arquivo parcial removido: {output_path}")
-            except Exception as e:
-                logging.error(f"Erro ao remover arquivo: {str(e)}")
 
-            # Atualiza status imediatamente
+            # Marcado antes de matar o processo, para a tarefa não registrá-lo como erro
             item.status = "cancelled"
             item.progress = 0
             item.completed_at = datetime.now()
-            
-            # Remove da fila de processamento
+            self.dirty.add(item_id)
+
+            # Remove da fila de processamento ou interrompe o download em andamento
             if item_id in self.processing_queue:
                 self.processing_queue.remove(item_id)
-            
+            if item_id in self.running:
+                await self._stop_item(item_id)
+
+            # Remove arquivos parciais
+            if self.video_handler is not None:
+                try:
+                    output_path = os.path.join(
+                        self.video_handler.directories['download_dir'],
+                        f"{item.filename}.{item.output_format}"
+                    )
+                    if os.path.exists(output_path):
+                        os.remove(output_path)
+                        logging.info(f"Arquivo parcial removido: {output_path}")
+                except Exception as e:
+                    logging.error(f"Erro ao remover arquivo: {str(e)}")
+
             # Notifica clientes sobre o cancelamento
             await self._broadcast('progress', {
                 'item_id': item_id,
@@ -248,7 +302,7 @@ class QueueManager:
             })
             
             await self._broadcast('queue_status', self)
-            self.save_queue()
+            self.save_item(item_id)
 
     def cleanup_old_items(self, days: int = 7):
         """Remove itens antigos da fila"""
@@ -256,27 +310,59 @@ class QueueManager:
         removed = []
         
         for item_id, item in list(self.queue.items()):
-            if item.completed_at and datetime.fromisoformat(item.completed_at) < cutoff:
+            if item.completed_at and item.completed_at < cutoff:
                 del self.queue[item_id]
                 removed.append(item_id)
+                self.dirty.add(item_id)
         
         if removed:
-            self.save_queue()
+            self.store.delete(removed)
             logging.info(f"Removidos {len(removed)} itens antigos da fila")
 
+    @staticmethod
+    def _item_status(item: QueueItem) -> Dict:
+        return {
+            "id": item.id,
+            "filename": item.filename,
+            "url": item.url,
+            "format_id": item.format_id,
+            "output_format": item.output_format,
+            "status": item.status,
+            "progress": item.progress,
+            "created_at": item.created_at.isoformat(),
+            "completed_at": item.completed_at.isoformat() if item.completed_at else None,
+            "error": item.error
+        }
+
     def get_queue_status(self) -> List[Dict]:
-        return [
-            {
-                "id": item.id,
-                "filename": item.filename,
-                "url": item.url,
-                "format_id": item.format_id,
-                "output_format": item.output_format,
-                "status": item.status,
-                "progress": item.progress,
-                "created_at": item.created_at.isoformat(),
-                "completed_at": item.completed_at.isoformat() if item.completed_at else None,
-                "error": item.error
-            }
-            for item in self.queue.values()
-        ]
+        return [self._item_status(item) for item in self.queue.values()]
+
+    def snapshot(self) -> Dict:
+        """Fila inteira com a versão atual; base para os deltas seguintes"""
+        self.published.update(self.queue)
+        return {"seq": self.version, "items": self.get_queue_status()}
+
+    def take_delta(self) -> Optional[Dict]:
+        """Itens adicionados, alterados e removidos desde o último delta.
+
+        Cada delta avança a versão em um; quem perder um número pede um
+        snapshot de novo. Sem mudanças, devolve None e a versão fica igual.
+        """
+        if not self.dirty:
+            return None
+        added, changed, removed = [], [], []
+        for item_id in self.dirty:
+            item = self.queue.get(item_id)
+            if item is None:
+                if item_id in self.published:
+                    removed.append(item_id)
+                self.published.discard(item_id)
+            elif item_id in self.published:
+                changed.append(self._item_status(item))
+            else:
+                added.append(self._item_status(item))
+                self.published.add(item_id)
+        self.dirty.clear()
+        added.sort(key=lambda item: item["created_at"])
+        self.version += 1
+        return {"seq": self.version, "added": added, "changed": changed, "removed": removed}
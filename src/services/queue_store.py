@@ -0,0 +1,124 @@
+import os
+import json
+import sqlite3
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+# Colunas da tabela, na ordem dos campos de QueueItem
+COLUMNS = ("id", "filename", "url", "format_id", "output_format", "status", "progress",
+           "created_at", "completed_at", "error")
+
+_PLACEHOLDERS = ", ".join("?" * len(COLUMNS))
+UPSERT_SQL = (
+    f"INSERT INTO items ({', '.join(COLUMNS)}) VALUES ({_PLACEHOLDERS}) ON CONFLICT (id) DO UPDATE SET "
+    + ", ".join(f"{column} = excluded.{column}" for column in COLUMNS[1:])
+)
+
+# Status de itens que não terminaram; num novo início do servidor viram erro
+UNFINISHED_STATUSES = ("downloading", "converting", "pending")
+
+class QueueStore:
+    """Itens da fila de downloads num SQLite em WAL, gravados um a um.
+
+    Cada mudança de status é um upsert de uma linha numa transação, em vez
+    de reescrever o arquivo inteiro; uma queda no meio de uma gravação não
+    corrompe o que já estava salvo. Datas ficam em ISO 8601, que ordena
+    como texto.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                url TEXT NOT NULL,
+                format_id TEXT NOT NULL,
+                output_format TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL,
+                created_at TEXT NOT NULL,
+                completed_at TEXT,
+                error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_items_status ON items (status);
+            CREATE INDEX IF NOT EXISTS idx_items_created_at ON items (created_at);
+        """)
+
+    @staticmethod
+    def _row(item) -> tuple:
+        return (
+            item.id, item.filename, item.url, item.format_id, item.output_format, item.status,
+            item.progress, item.created_at.isoformat(),
+            item.completed_at.isoformat() if item.completed_at else None, item.error
+        )
+
+    def upsert(self, item) -> None:
+        """Grava um item (QueueItem), inserindo ou atualizando a linha dele"""
+        self.conn.execute(UPSERT_SQL, self._row(item))
+        self.conn.commit()
+
+    def delete(self, item_ids: Iterable[str]) -> None:
+        self.conn.executemany("DELETE FROM items WHERE id = ?", ((item_id,) for item_id in item_ids))
+        self.conn.commit()
+
+    def interrupt_unfinished(self, error: str = "Processo interrompido") -> int:
+        """Marca como erro os itens que ficaram pela metade quando o servidor parou"""
+        cursor = self.conn.execute(
+            f"UPDATE items SET status = 'error', error = ?, completed_at = ? "
+            f"WHERE status IN ({', '.join('?' * len(UNFINISHED_STATUSES))})",
+            (error, datetime.now().isoformat(), *UNFINISHED_STATUSES)
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def load(self) -> List[Dict]:
+        """Todos os itens, do mais antigo ao mais novo, com as datas já convertidas"""
+        items = []
+        for row in self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM items ORDER BY created_at"):
+            data = dict(zip(COLUMNS, row))
+            data["created_at"] = datetime.fromisoformat(data["created_at"])
+            if data["completed_at"]:
+                data["completed_at"] = datetime.fromisoformat(data["completed_at"])
+            items.append(data)
+        return items
+
+    def migrate_json(self, json_path: str) -> int:
+        """Importa a fila do antigo queue.json (uma vez) e o renomeia para .migrated"""
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            # Arquivos antigos podem não ter os campos adicionados depois (url, format_id...)
+            defaults = {"url": "", "format_id": "best", "output_format": "mp4", "status": "error",
+                        "progress": 0.0, "created_at": datetime.now().isoformat()}
+            rows = [
+                tuple(item.get(column) if item.get(column) is not None else defaults.get(column)
+                      for column in COLUMNS)
+                for item in data.get("items", []) if item.get("id") and item.get("filename")
+            ]
+            with self.conn:
+                # OR IGNORE: uma migração interrompida antes do rename pode ser refeita
+                self.conn.executemany(
+                    f"INSERT OR IGNORE INTO items ({', '.join(COLUMNS)}) VALUES ({_PLACEHOLDERS})",
+                    rows
+                )
+            os.replace(json_path, f"{json_path}.migrated")
+            logging.info(f"Fila migrada de {json_path}: {len(rows)} itens")
+            return len(rows)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            logging.error(f"Erro ao migrar fila de {json_path}: {str(e)}")
+            return 0
+
+    def close(self) -> None:
+        try:
+            self.conn.commit()
+            self.conn.close()
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao fechar fila: {str(e)}")
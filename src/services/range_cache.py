@@ -0,0 +1,279 @@
+import os
+import re
+import json
+import asyncio
+import hashlib
+import logging
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+import aiofiles
+import aiohttp
+from .shared_store import SharedStore
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def parse_range(header: str, total: int) -> Optional[Tuple[int, int]]:
+    """Converte um cabeçalho Range de intervalo único em (início, fim) inclusivos.
+
+    Returns:
+        Optional[Tuple[int, int]]: None para formatos não suportados (vários
+        intervalos, outras unidades), que devem ser respondidos por inteiro
+
+    Raises:
+        ValueError: intervalo fora do arquivo (416)
+    """
+    match = _RANGE_RE.match(header.strip().replace(" ", ""))
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # bytes=-N: os últimos N bytes
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError(header)
+        return max(0, total - suffix), total - 1
+    start = int(first)
+    end = min(int(last), total - 1) if last else total - 1
+    if start >= total or start > end:
+        raise ValueError(header)
+    return start, end
+
+class _Fill:
+    """Download em andamento de um arquivo para o cache"""
+
+    def __init__(self, meta: Dict):
+        self.meta = meta
+        self.size = meta["size"]
+        self.written = 0
+        self.done = False
+        self.changed = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+        # Leitores (players) lendo do arquivo e o cancelamento agendado quando todos saem
+        self.readers = 0
+        self.abandon: Optional[asyncio.TimerHandle] = None
+
+class RangeCache:
+    """Cópia local de arquivos cujo provedor não aceita Range.
+
+    O arquivo é baixado uma vez, em segundo plano, e os intervalos pedidos
+    pelo player são lidos do disco conforme os bytes chegam; buscas
+    seguintes não voltam ao provedor. O tamanho total é limitado e os
+    arquivos usados há mais tempo são descartados primeiro.
+
+    Com `store` (vários workers), só um processo grava cada arquivo; os
+    demais repassam direto do provedor até a cópia ficar completa.
+    """
+
+    # Validade da reserva de gravação entre workers; liberada ao terminar ou se o worker parar
+    FILL_CLAIM_TTL = 6 * 3600
+    # Segundos que um download sem nenhum leitor continua (o player pode estar só buscando outro ponto)
+    FILL_IDLE_GRACE = 15
+
+    def __init__(self, cache_dir: str = "data/proxy_cache", max_bytes: int = 4 * 1024 ** 3,
+                 max_file_bytes: Optional[int] = None, chunk_size: int = 64 * 1024,
+                 store: Optional[SharedStore] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_file_bytes if max_file_bytes is not None else max_bytes // 2
+        self.chunk_size = chunk_size
+        self.fills: Dict[str, _Fill] = {}
+        self.shared = store
+        # Chamado com o tamanho de cada bloco recebido do provedor (métricas)
+        self.on_data: Optional[Callable[[int], None]] = None
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.bin", f"{base}.json"
+
+    def lookup(self, url: str) -> Optional[Dict]:
+        """Metadados (size, etag, last_modified, content_type) de um arquivo já completo no cache"""
+        if url in self.fills:
+            return None
+        data_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if os.path.getsize(data_path) != meta["size"]:
+                return None
+            os.utime(meta_path)  # marca como usado recentemente
+            return meta
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def pending(self, url: str) -> Optional[_Fill]:
+        return self.fills.get(url)
+
+    def can_store(self, size: int) -> bool:
+        return 0 < size <= self.max_file_bytes
+
+    async def fill(self, url: str, upstream: aiohttp.ClientResponse,
+                   on_data: Optional[Callable[[int], None]] = None,
+                   on_close: Optional[Callable[[], None]] = None) -> Optional[_Fill]:
+        """Começa a gravar a resposta (200, tamanho conhecido) no cache.
+
+        A partir daqui a resposta pertence ao cache, que a fecha ao terminar
+        e então chama `on_close`; `on_data` recebe o tamanho de cada bloco.
+        Devolve None (sem consumir a resposta nem chamar nada) se não for
+        possível gravar ou se o arquivo já está sendo gravado por outra
+        requisição: quem chamou repassa a resposta direto.
+
+        Se todos os leitores saírem, o download é cancelado depois de
+        FILL_IDLE_GRACE segundos, liberando a conexão com o provedor.
+        """
+        if url in self.fills:
+            return None
+        data_path, meta_path = self._paths(url)
+        claim_key = f"range:{os.path.basename(data_path)}"
+        if self.shared is not None:
+            if not await self.shared.run(self.shared.claim, claim_key, self.FILL_CLAIM_TTL):
+                return None
+            # A reserva entre workers é do processo: outra requisição deste worker pode ter começado antes
+            if url in self.fills:
+                return None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._evict(upstream.content_length)
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            # Criado já aqui para que os leitores possam abri-lo antes do primeiro bloco
+            open(data_path, "wb").close()
+        except OSError as e:
+            logging.error(f"Erro ao preparar cache para {url}: {str(e)}")
+            if self.shared is not None:
+                self.shared.submit(self.shared.release, claim_key)
+            return None
+
+        fill = _Fill({
+            "url": url,
+            "size": upstream.content_length,
+            "etag": upstream.headers.get("etag"),
+            "last_modified": upstream.headers.get("last-modified"),
+            "content_type": upstream.headers.get("content-type")
+        })
+        self.fills[url] = fill
+        fill.task = asyncio.create_task(self._download(url, upstream, fill, on_data, on_close))
+        # Também cobre o player que desconecta antes de começar a ler
+        self._schedule_idle(fill)
+        return fill
+
+    async def _download(self, url: str, upstream: aiohttp.ClientResponse, fill: _Fill,
+                        on_data: Optional[Callable[[int], None]] = None,
+                        on_close: Optional[Callable[[], None]] = None) -> None:
+        data_path, meta_path = self._paths(url)
+        completed = False
+        try:
+            async with aiofiles.open(data_path, "r+b") as f:
+                async for chunk in upstream.content.iter_chunked(self.chunk_size):
+                    await f.write(chunk)
+                    await f.flush()
+                    fill.written += len(chunk)
+                    if self.on_data:
+                        self.on_data(len(chunk))
+                    if on_data:
+                        on_data(len(chunk))
+                    async with fill.changed:
+                        fill.changed.notify_all()
+            completed = fill.written == fill.size
+            if completed:
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump(fill.meta, f)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            logging.error(f"Erro ao gravar {url} no cache: {str(e)}")
+        finally:
+            if completed:
+                upstream.release()
+            else:
+                upstream.close()
+                # Sem metadados o arquivo não seria reaproveitado nem descartado pelo _evict
+                try:
+                    os.remove(data_path)
+                except OSError:
+                    pass
+            fill.done = True
+            if fill.abandon is not None:
+                fill.abandon.cancel()
+            if self.fills.get(url) is fill:
+                del self.fills[url]
+            if self.shared is not None:
+                self.shared.submit(self.shared.release, f"range:{os.path.basename(data_path)}")
+            if on_close:
+                on_close()
+            async with fill.changed:
+                fill.changed.notify_all()
+
+    async def read(self, url: str, start: int, end: int, fill: Optional[_Fill] = None) -> AsyncIterator[bytes]:
+        """Lê o intervalo [start, end] do arquivo, aguardando o download quando necessário"""
+        data_path, _ = self._paths(url)
+        if fill is not None:
+            self._join(fill)
+        try:
+            async for chunk in self._read(data_path, start, end, fill):
+                yield chunk
+        finally:
+            if fill is not None:
+                self._leave(fill)
+
+    def _join(self, fill: _Fill) -> None:
+        fill.readers += 1
+        if fill.abandon is not None:
+            fill.abandon.cancel()
+            fill.abandon = None
+
+    def _leave(self, fill: _Fill) -> None:
+        fill.readers -= 1
+        if not fill.readers:
+            self._schedule_idle(fill)
+
+    def _schedule_idle(self, fill: _Fill) -> None:
+        if not fill.done and fill.abandon is None:
+            fill.abandon = asyncio.get_running_loop().call_later(self.FILL_IDLE_GRACE, self._cancel_idle, fill)
+
+    def _cancel_idle(self, fill: _Fill) -> None:
+        fill.abandon = None
+        if not fill.readers and not fill.done:
+            logging.info(f"Download para o cache sem leitores, cancelado: {fill.meta['url']}")
+            fill.task.cancel()
+
+    async def _read(self, data_path: str, start: int, end: int, fill: Optional[_Fill]) -> AsyncIterator[bytes]:
+        position = start
+        async with aiofiles.open(data_path, "rb") as f:
+            await f.seek(start)
+            while position <= end:
+                if fill is not None and not fill.done and fill.written <= position:
+                    async with fill.changed:
+                        await fill.changed.wait_for(lambda: fill.done or fill.written > position)
+                    continue
+
+                available = end + 1 if fill is None or fill.done else min(end + 1, fill.written)
+                chunk = await f.read(min(self.chunk_size, available - position))
+                if not chunk:
+                    # Download interrompido antes de chegar ao intervalo pedido
+                    break
+                position += len(chunk)
+                yield chunk
+
+    def _evict(self, incoming: int) -> None:
+        """Descarta os arquivos usados há mais tempo até caber `incoming` bytes"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            meta_path = os.path.join(self.cache_dir, name)
+            data_path = meta_path[:-5] + ".bin"
+            try:
+                size = os.path.getsize(data_path)
+                entries.append((os.path.getmtime(meta_path), size, data_path, meta_path))
+                total += size
+            except OSError:
+                continue
+
+        for _, size, data_path, meta_path in sorted(entries):
+            if total + incoming <= self.max_bytes:
+                break
+            for path in (meta_path, data_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
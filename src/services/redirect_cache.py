@@ -0,0 +1,73 @@
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from .shared_store import SharedStore
+
+class RedirectCache:
+    """URL final (depois dos redirecionamentos) de cada URL de origem, com validade.
+
+    Provedores costumam passar por um ou mais redirecionamentos (balanceador →
+    servidor de borda) antes de entregar a mídia; com a URL final em cache, a
+    troca de canal e cada busca do player vão direto à borda. Quem usa a
+    entrada deve chamar invalidate() quando a URL final falhar, para a
+    próxima requisição refazer o caminho desde a origem.
+
+    Com `store`, as entradas ficam no estado compartilhado e valem para
+    todos os workers do proxy.
+    """
+
+    def __init__(self, ttl: float = 300, max_entries: int = 10000, store: Optional[SharedStore] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared = store
+        # origem → (URL final, expira em), em ordem de uso
+        self.entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, url: str) -> Optional[str]:
+        if self.shared is not None:
+            final_url = await self.shared.run(self.shared.get, f"redirect:{url}")
+            if final_url is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return final_url
+
+        entry = self.entries.get(url)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del self.entries[url]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(url)
+        self.hits += 1
+        return entry[0]
+
+    async def put(self, url: str, final_url: str) -> None:
+        if self.ttl <= 0 or final_url == url:
+            return
+        if self.shared is not None:
+            await self.shared.run(self.shared.put, f"redirect:{url}", final_url, self.ttl)
+            return
+        self.entries[url] = (final_url, time.monotonic() + self.ttl)
+        self.entries.move_to_end(url)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def invalidate(self, url: str) -> None:
+        if self.shared is not None:
+            removed = await self.shared.run(self.shared.delete, f"redirect:{url}")
+        else:
+            removed = self.entries.pop(url, None) is not None
+        if removed:
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,206 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+class SharedStore:
+    """Estado do proxy compartilhado entre processos, num SQLite em WAL.
+
+    Usado quando o proxy roda com vários workers: cada processo tem sua
+    própria conexão e as operações são curtas (uma instrução, sem
+    transações longas), então o custo é de microssegundos por chamada.
+
+    - chave/valor com validade (ex.: destinos de redirecionamento)
+    - reservas exclusivas com validade (ex.: "este worker está baixando X")
+    - contadores por processo, somados entre os processos vivos
+    - fotos das métricas de cada worker, para /metrics mostrar o proxy inteiro
+
+    Reservas e contadores levam o pid do dono; reap() descarta os de
+    processos que terminaram sem liberar.
+
+    Uma instrução pode esperar o bloqueio de escrita de outro worker, então
+    o proxy não as chama no loop de eventos: usa run() (aguarda o resultado)
+    ou submit() (liberações feitas em código síncrono). As duas passam pela
+    mesma thread, na ordem em que foram chamadas.
+    """
+
+    def __init__(self, db_path: str = "data/proxy_state.db"):
+        self.db_path = db_path
+        self.pid = os.getpid()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # O proxy usa a conexão no loop e em threads (to_thread); as instruções são serializadas
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-store")
+        self.conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS claims (
+                key TEXT PRIMARY KEY,
+                owner INTEGER NOT NULL,
+                expires REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS counters (
+                key TEXT NOT NULL,
+                owner INTEGER NOT NULL,
+                value INTEGER NOT NULL,
+                PRIMARY KEY (key, owner)
+            );
+            CREATE TABLE IF NOT EXISTS workers (
+                pid INTEGER PRIMARY KEY,
+                snapshot TEXT NOT NULL,
+                updated REAL NOT NULL
+            );
+        """)
+
+    async def run(self, operation: Callable[..., Any], *args) -> Any:
+        """Executa `operation` (um método deste objeto) fora do loop de eventos"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, operation, *args)
+
+    def submit(self, operation: Callable[..., Any], *args) -> None:
+        """Como run(), sem esperar: erros só vão para o log"""
+        try:
+            self._executor.submit(operation, *args).add_done_callback(self._log_error)
+        except RuntimeError:
+            # Já fechado: close() removeu todo o estado deste processo
+            pass
+
+    @staticmethod
+    def _log_error(future: Future) -> None:
+        if future.exception() is not None:
+            logging.error(f"Erro no estado compartilhado: {str(future.exception())}")
+
+    def _execute(self, sql: str, params: Iterable = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self.conn.execute(sql, tuple(params))
+
+    # Chave/valor
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._execute("SELECT value FROM kv WHERE key = ? AND expires > ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: str, ttl: float) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires) VALUES (?, ?, ?)", (key, value, time.time() + ttl)
+        )
+
+    def delete(self, key: str) -> bool:
+        return self._execute("DELETE FROM kv WHERE key = ?", (key,)).rowcount > 0
+
+    # Reservas
+
+    def claim(self, key: str, ttl: float) -> bool:
+        """Reserva `key` para este processo; False se outro processo tem uma reserva válida"""
+        now = time.time()
+        cursor = self._execute(
+            "INSERT INTO claims (key, owner, expires) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+            "WHERE claims.expires <= ? OR claims.owner = excluded.owner",
+            (key, self.pid, now + ttl, now)
+        )
+        return cursor.rowcount > 0
+
+    def claimed(self, key: str) -> bool:
+        """Indica se há uma reserva válida de outro processo"""
+        row = self._execute(
+            "SELECT 1 FROM claims WHERE key = ? AND owner != ? AND expires > ?", (key, self.pid, time.time())
+        ).fetchone()
+        return row is not None
+
+    def release(self, key: str) -> None:
+        self._execute("DELETE FROM claims WHERE key = ? AND owner = ?", (key, self.pid))
+
+    # Contadores
+
+    def incr(self, key: str, delta: int = 1) -> None:
+        self._execute(
+            "INSERT INTO counters (key, owner, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (key, owner) DO UPDATE SET value = value + excluded.value",
+            (key, self.pid, delta)
+        )
+
+    def incr_below(self, key: str, limit: int) -> bool:
+        """Soma 1 ao contador deste processo se o total entre os processos está abaixo de `limit`"""
+        with self._lock:
+            # IMMEDIATE: a leitura do total e o incremento não se intercalam com outro worker
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                total = self.conn.execute(
+                    "SELECT COALESCE(SUM(value), 0) FROM counters WHERE key = ?", (key,)
+                ).fetchone()[0]
+                if total < limit:
+                    self.conn.execute(
+                        "INSERT INTO counters (key, owner, value) VALUES (?, ?, 1) "
+                        "ON CONFLICT (key, owner) DO UPDATE SET value = value + 1",
+                        (key, self.pid)
+                    )
+                self.conn.execute("COMMIT")
+            except sqlite3.Error:
+                self.conn.execute("ROLLBACK")
+                raise
+        return total < limit
+
+    def total(self, key: str) -> int:
+        row = self._execute("SELECT COALESCE(SUM(value), 0) FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0]
+
+    # Métricas dos workers
+
+    def publish(self, snapshot: Dict) -> None:
+        self._execute(
+            "INSERT OR REPLACE INTO workers (pid, snapshot, updated) VALUES (?, ?, ?)",
+            (self.pid, json.dumps(snapshot), time.time())
+        )
+
+    def snapshots(self, max_age: float) -> List[Dict]:
+        """Métricas publicadas pelos outros workers nos últimos `max_age` segundos"""
+        rows = self._execute(
+            "SELECT snapshot FROM workers WHERE updated > ? AND pid != ?", (time.time() - max_age, self.pid)
+        )
+        return [json.loads(row[0]) for row in rows.fetchall()]
+
+    # Limpeza
+
+    def reap(self, max_age: float) -> None:
+        """Remove entradas vencidas e o estado de workers que pararam de publicar"""
+        now = time.time()
+        stale = [row[0] for row in self._execute(
+            "SELECT pid FROM workers WHERE updated <= ?", (now - max_age,)
+        ).fetchall()]
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.execute("DELETE FROM kv WHERE expires <= ?", (now,))
+                self.conn.execute("DELETE FROM claims WHERE expires <= ?", (now,))
+                for pid in stale:
+                    self._forget(pid)
+                self.conn.execute("COMMIT")
+            except sqlite3.Error:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def _forget(self, pid: int) -> None:
+        self.conn.execute("DELETE FROM claims WHERE owner = ?", (pid,))
+        self.conn.execute("DELETE FROM counters WHERE owner = ?", (pid,))
+        self.conn.execute("DELETE FROM workers WHERE pid = ?", (pid,))
+
+    def close(self) -> None:
+        """Libera o estado deste processo e fecha a conexão"""
+        self._executor.shutdown(wait=True)
+        try:
+            with self._lock:
+                self._forget(self.pid)
+                self.conn.close()
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao fechar estado compartilhado: {str(e)}")
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import logging
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+class StreamIndex:
+    """Índice persistente id curto → URL do provedor, consultado pelo proxy em /proxy/s/<id>.
+
+    Os .strm guardam só o id (derivado do caminho do .strm, ver
+    stream_id), então uma troca de token ou de servidor no provedor muda
+    apenas as linhas deste índice, não os arquivos. O id de 64 bits é a
+    própria chave primária (rowid), e a consulta é uma busca na árvore B.
+
+    Como o manifesto, cada sincronização abre uma geração; ids não vistos
+    na geração atual pertencem a itens que sumiram da playlist, desde que o
+    tipo deles (filme/série) tenha sido sincronizado nessa geração. O mesmo
+    item encontrado com outra URL (outra fonte, outro grupo) fica guardado
+    como espelho, para o proxy tentar quando a URL principal falhar.
+    """
+
+    def __init__(self, db_path: str = "data/stream_index.db"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL: o proxy lê enquanto a sincronização grava em outra conexão
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS streams (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                generation INTEGER NOT NULL,
+                kind TEXT
+            );
+            CREATE TABLE IF NOT EXISTS mirrors (
+                id INTEGER NOT NULL,
+                url TEXT NOT NULL,
+                generation INTEGER NOT NULL,
+                PRIMARY KEY (id, url)
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        # Índices de versões anteriores não tinham o tipo do item
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(streams)")}
+        if "kind" not in columns:
+            self.conn.execute("ALTER TABLE streams ADD COLUMN kind TEXT")
+            self.conn.commit()
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        self.generation = int(row[0]) if row else 0
+
+    @staticmethod
+    def _rowid(stream_id: str) -> Optional[int]:
+        """Converte o id em hexadecimal (16 dígitos) para o inteiro com sinal do SQLite"""
+        if len(stream_id) != 16:
+            return None
+        try:
+            value = int(stream_id, 16)
+        except ValueError:
+            return None
+        return value - (1 << 64) if value >= 1 << 63 else value
+
+    def begin(self) -> int:
+        """Inicia uma nova geração de sincronização"""
+        self.generation += 1
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)", (str(self.generation),)
+        )
+        self.conn.commit()
+        return self.generation
+
+    def update(self, streams: Iterable[Tuple[str, str, Optional[str]]]) -> None:
+        """Grava um lote de (id, URL, tipo) na geração atual.
+
+        Um id repetido na mesma geração mantém a primeira URL, como o
+        manifesto faz com caminhos repetidos; as URLs seguintes viram espelhos.
+        """
+        rows = []
+        for stream_id, url, kind in streams:
+            rowid = self._rowid(stream_id)
+            if rowid is not None:
+                rows.append((rowid, url, self.generation, kind))
+        self.conn.executemany(
+            "INSERT INTO streams (id, url, generation, kind) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET url = excluded.url, generation = excluded.generation, "
+            "kind = excluded.kind WHERE streams.generation < excluded.generation",
+            rows
+        )
+        self.conn.executemany(
+            "INSERT INTO mirrors (id, url, generation) "
+            "SELECT ?1, ?2, ?3 WHERE EXISTS (SELECT 1 FROM streams WHERE id = ?1 AND url != ?2) "
+            "ON CONFLICT (id, url) DO UPDATE SET generation = excluded.generation",
+            [row[:3] for row in rows]
+        )
+        self.conn.commit()
+
+    def resolve(self, stream_id: str) -> Optional[str]:
+        """URL atual do stream, ou None se o id não existe"""
+        rowid = self._rowid(stream_id)
+        if rowid is None:
+            return None
+        row = self.conn.execute("SELECT url FROM streams WHERE id = ?", (rowid,)).fetchone()
+        return row[0] if row else None
+
+    def mirrors(self, stream_id: str) -> List[str]:
+        """URLs alternativas do stream, na ordem em que apareceram"""
+        rowid = self._rowid(stream_id)
+        if rowid is None:
+            return []
+        return [row[0] for row in self.conn.execute(
+            "SELECT url FROM mirrors WHERE id = ? ORDER BY rowid", (rowid,)
+        )]
+
+    def prune(self, kinds: Optional[Sequence[str]] = None) -> int:
+        """Remove os ids (e espelhos) que não apareceram na geração atual.
+
+        Com `kinds`, só os desses tipos: os .strm de um tipo que não foi
+        sincronizado continuam no disco e seus ids precisam continuar
+        resolvendo. Ids sem tipo (índices antigos) só saem sem `kinds`.
+        """
+        if kinds is None:
+            removed = self.conn.execute("DELETE FROM streams WHERE generation < ?", (self.generation,)).rowcount
+        else:
+            removed = self.conn.execute(
+                f"DELETE FROM streams WHERE generation < ? AND kind IN ({', '.join('?' * len(kinds))})",
+                (self.generation, *kinds)
+            ).rowcount
+        # Espelhos não vistos saem, exceto os dos ids mantidos acima
+        self.conn.execute(
+            "DELETE FROM mirrors WHERE generation < ?1 AND id NOT IN (SELECT id FROM streams WHERE generation < ?1)",
+            (self.generation,)
+        )
+        self.conn.commit()
+        return removed
+
+    def is_empty(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM streams LIMIT 1").fetchone() is None
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM streams").fetchone()[0]
+
+    def close(self) -> None:
+        try:
+            self.conn.commit()
+            self.conn.close()
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao fechar índice de streams: {str(e)}")
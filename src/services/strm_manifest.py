@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import hashlib
+import logging
+from typing import Dict, List, Optional, Set
+
+class StrmManifest:
+    """Manifesto persistente dos arquivos .strm gerados (caminho → hash da URL → entrada de origem).
+
+    Cada sincronização abre uma nova geração. Itens vistos na playlist são
+    marcados com a geração atual; ao final, entradas de gerações anteriores
+    pertencem a itens que sumiram da playlist e podem ser removidas.
+    """
+
+    BATCH_SIZE = 5000
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                path TEXT PRIMARY KEY,
+                url_hash TEXT NOT NULL,
+                url TEXT NOT NULL,
+                title TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                generation INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_generation ON entries (kind, generation);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        self.generation = 0
+        self.stats: Dict[str, int] = {}
+        self._pending = 0
+        # Nomes em cada diretório de .strm, listados uma vez por geração (ver _exists)
+        self._listing: Dict[str, Set[str]] = {}
+
+    @staticmethod
+    def hash_content(content: str) -> str:
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        self.conn.commit()
+
+    def begin(self) -> int:
+        """Inicia uma nova geração de sincronização"""
+        self.generation = int(self.get_meta("generation") or 0) + 1
+        self.set_meta("generation", str(self.generation))
+        self.stats = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0}
+        self._pending = 0
+        self._listing = {}
+        return self.generation
+
+    def track(self, path: str, content: str, url: str, title: str, kind: str) -> Optional[str]:
+        """Registra um item da playlist na geração atual.
+
+        Um arquivo sem alteração no manifesto, mas que não está mais no disco
+        (apagado fora do programa), volta a ser escrito e conta como "added".
+
+        Returns:
+            Optional[str]: "added" ou "changed" se o arquivo precisa ser escrito,
+            None se já está atualizado (ou se o caminho já foi visto nesta geração).
+        """
+        url_hash = self.hash_content(content)
+        row = self.conn.execute(
+            "SELECT url_hash, generation FROM entries WHERE path = ?", (path,)
+        ).fetchone()
+
+        if row is None:
+            status = "added"
+        elif row[1] == self.generation:
+            # Mesmo arquivo repetido na playlist (ex.: em dois grupos): vale o primeiro
+            return None
+        elif row[0] != url_hash:
+            status = "changed"
+        elif not self._exists(path):
+            status = "added"
+        else:
+            self.conn.execute(
+                "UPDATE entries SET generation = ? WHERE path = ?", (self.generation, path)
+            )
+            self.stats["unchanged"] += 1
+            self._count()
+            return None
+
+        self.conn.execute(
+            "INSERT OR REPLACE INTO entries (path, url_hash, url, title, kind, generation) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (path, url_hash, url, title, kind, self.generation)
+        )
+        self.stats[status] += 1
+        self._count()
+        return status
+
+    def _exists(self, path: str) -> bool:
+        """Se o arquivo está no disco, listando cada diretório uma vez em vez de um stat por arquivo"""
+        directory, name = os.path.split(path)
+        names = self._listing.get(directory)
+        if names is None:
+            try:
+                names = {entry.name for entry in os.scandir(directory)}
+            except OSError:
+                names = set()
+            self._listing[directory] = names
+        return name in names
+
+    def _count(self) -> None:
+        self._pending += 1
+        if self._pending >= self.BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        """Confirma a transação em andamento"""
+        self._pending = 0
+        self.conn.commit()
+
+    def stale_paths(self, kind: str) -> List[str]:
+        """Caminhos de itens que não apareceram na geração atual"""
+        self.flush()
+        return [row[0] for row in self.conn.execute(
+            "SELECT path FROM entries WHERE kind = ? AND generation < ?",
+            (kind, self.generation)
+        )]
+
+    def remove(self, paths: List[str]) -> None:
+        self.conn.executemany("DELETE FROM entries WHERE path = ?", ((p,) for p in paths))
+        self.conn.commit()
+        self.stats["removed"] += len(paths)
+
+    def forget(self, paths: List[str]) -> None:
+        """Descarta entradas cujo arquivo não pôde ser escrito, para nova tentativa"""
+        self.conn.executemany("DELETE FROM entries WHERE path = ?", ((p,) for p in paths))
+        self.conn.commit()
+
+    def close(self) -> None:
+        try:
+            self.flush()
+            self.conn.close()
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao fechar manifesto: {str(e)}")
@@ -0,0 +1,110 @@
+import os
+import logging
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Deque, Dict, List, Tuple
+
+class StrmWriter:
+    """Estágio de escrita dos arquivos .strm.
+
+    Agrupa as escritas por diretório, executa os lotes num pool de threads
+    limitado e lembra quais diretórios já foram criados. Cada arquivo é
+    escrito num temporário e renomeado, então um leitor (Jellyfin, Kodi)
+    nunca vê um .strm pela metade.
+    """
+
+    def __init__(self, max_workers: int = 8, batch_size: int = 64, max_buffered: int = 4096):
+        self.max_workers = max(1, max_workers)
+        self.batch_size = batch_size
+        self.max_buffered = max_buffered
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="strm-writer")
+        self.created_dirs = set()
+        self.written = 0
+        self.failed: List[str] = []
+        self._batches: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        self._buffered = 0
+        self._inflight: Deque[Future] = deque()
+        self._lock = threading.Lock()
+
+    def write(self, path: str, content: str) -> None:
+        """Agenda a escrita de um arquivo"""
+        directory, filename = os.path.split(path)
+        batch = self._batches[directory]
+        batch.append((filename, content))
+        self._buffered += 1
+
+        if len(batch) >= self.batch_size:
+            self._submit(directory)
+        elif self._buffered >= self.max_buffered:
+            self._submit_all()
+
+    def flush(self) -> None:
+        """Envia os lotes pendentes e aguarda todas as escritas"""
+        self._submit_all()
+        while self._inflight:
+            self._inflight.popleft().result()
+
+    def close(self) -> Dict[str, int]:
+        try:
+            self.flush()
+        finally:
+            self.executor.shutdown(wait=True)
+        return {"written": self.written, "failed": len(self.failed)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _submit_all(self) -> None:
+        for directory in list(self._batches):
+            self._submit(directory)
+
+    def _submit(self, directory: str) -> None:
+        batch = self._batches.pop(directory)
+        self._buffered -= len(batch)
+
+        # Contrapressão: no máximo dois lotes por thread em voo
+        while len(self._inflight) >= self.max_workers * 2:
+            self._inflight.popleft().result()
+        self._inflight.append(self.executor.submit(self._write_batch, directory, batch))
+
+    def _write_batch(self, directory: str, batch: List[Tuple[str, str]]) -> None:
+        try:
+            self._ensure_dir(directory)
+        except OSError as e:
+            logging.error(f"Erro ao criar diretório {directory}: {str(e)}")
+            with self._lock:
+                self.failed.extend(os.path.join(directory, filename) for filename, _ in batch)
+            return
+
+        for filename, content in batch:
+            path = os.path.join(directory, filename)
+            try:
+                self._write_file(path, content)
+                with self._lock:
+                    self.written += 1
+            except OSError as e:
+                logging.error(f"Erro ao escrever {path}: {str(e)}")
+                with self._lock:
+                    self.failed.append(path)
+
+    def _ensure_dir(self, directory: str) -> None:
+        if directory in self.created_dirs:
+            return
+        os.makedirs(directory, exist_ok=True)
+        self.created_dirs.add(directory)
+
+    def _write_file(self, path: str, content: str) -> None:
+        directory, filename = os.path.split(path)
+        tmp_path = os.path.join(directory, f".{filename}.{threading.get_ident()}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
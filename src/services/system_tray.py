@@ -6,7 +6,10 @@ import logging
 
 class SystemTray:
     def __init__(self, main_window=None):
-        self.proxy_server = ProxyServer()
+        if main_window is not None:
+            self.proxy_server = ProxyServer(**main_window.controller.get_proxy_options())
+        else:
+            self.proxy_server = ProxyServer()
         self.icon = None
         self.main_window = main_window
         self.create_icon()
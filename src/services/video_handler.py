@@ -7,7 +7,7 @@ import shutil
 import subprocess
 import asyncio
 from unidecode import unidecode
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 
 class VideoHandler:
     def __init__(self, progress_callback=None, ffmpeg_options=None, download_options=None):
@@ -142,8 +142,15 @@ class VideoHandler:
             logging.error(f"Erro ao obter formatos: {str(e)}")
             return None
 
-    async def download_video(self, url: str, output_path: str, format_id: str = 'best', item_id: str = None):
-        """Download de vídeo com formato específico"""
+    async def download_video(self, url: str, output_path: str, format_id: str = 'best', item_id: str = None,
+                             on_process: Optional[Callable[[asyncio.subprocess.Process], None]] = None,
+                             on_progress: Optional[Callable[[float], Awaitable]] = None):
+        """Download de vídeo com formato específico
+
+        Args:
+            on_process: recebe o processo do yt-dlp assim que ele inicia (para cancelar o item)
+            on_progress: recebe o progresso do item; sem ele, vai para o progress_callback global
+        """
         if not self.directories:
             raise ValueError("Diretórios não configurados")
 
@@ -166,6 +173,8 @@ class VideoHandler:
                 stdout=asyncio.subprocess.PIPE,
                 stderr=asyncio.subprocess.PIPE
             )
+            if on_process:
+                on_process(process)
 
             try:
                 while True:
@@ -191,7 +200,9 @@ class VideoHandler:
                             
                             logging.debug(f"Download progress: {progress}% for item {item_id}")
                             
-                            if self.progress_callback and item_id:
+                            if on_progress:
+                                await on_progress(progress)
+                            elif self.progress_callback and item_id:
                                 await self.progress_callback(item_id, progress, "downloading")
                         except Exception as e:
                             logging.error(f"Erro ao processar progresso: {str(e)}")
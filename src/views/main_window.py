@@ -5,15 +5,19 @@ from typing import Optional
 import requests
 import sys
 import os  # Adicionado import do os
+import time
 import webbrowser
 import logging
 from ..controllers.app_controller import AppController
 
 class MainWindow:
-    def __init__(self):
-        self.controller = AppController()
+    def __init__(self, controller: Optional[AppController] = None):
+        # Com a API no mesmo processo, recebe o controller dela (playlist em memória compartilhada)
+        self.controller = controller or AppController()
         self.root = tk.Tk()
         self.current_thread: Optional[threading.Thread] = None
+        # (instante, bytes enviados) da última leitura de /metrics, para calcular a vazão
+        self._last_proxy_metrics = None
         self.setup_ui()
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.update_proxy_status()
@@ -235,6 +239,11 @@ class MainWindow:
         self.file_entry.config(state=tk.DISABLED if is_url else tk.NORMAL)
         
     def _start_processing(self):
+        # A API pode estar sincronizando com o mesmo controller
+        if not self.controller.reserve_sync():
+            messagebox.showwarning("Aviso", "Já existe uma sincronização em andamento")
+            return
+
         self.process_button.config(state=tk.DISABLED)
         self.cancel_button.config(state=tk.NORMAL)
         
@@ -253,7 +262,11 @@ class MainWindow:
         }
         
         # Salvar configuração
-        self.controller.save_config(config)
+        try:
+            self.controller.save_config(config)
+        except BaseException:
+            self.controller.release_sync()
+            raise
         
         def process_callback(info, current, total):
             progress = int((current / total) * 100)
@@ -263,7 +276,7 @@ class MainWindow:
         
         self.current_thread = threading.Thread(
             target=self.controller.process_playlist,
-            args=(config, process_callback)
+            args=(config, process_callback, True)
         )
         self.current_thread.daemon = True
         self.current_thread.start()
@@ -283,8 +296,21 @@ class MainWindow:
             self.process_button.config(state=tk.NORMAL)
             self.cancel_button.config(state=tk.DISABLED)
             if not self.controller.is_cancelled:
+                stats = self.controller.last_sync_stats
+                if stats is None:
+                    # process_playlist falhou (fonte indisponível, erro na leitura...)
+                    self.status_label.config(text="Status: Erro")
+                    messagebox.showerror("Erro", "Falha ao processar a playlist. Verifique a fonte e o log.")
+                    return
                 self.status_label.config(text="Status: Concluído")
-                messagebox.showinfo("Concluído", "Processamento finalizado com sucesso!")
+                message = (
+                    "Processamento finalizado com sucesso!"
+                    f"\n\nNovos: {stats['added']}\n"
+                    f"Alterados: {stats['changed']}\n"
+                    f"Removidos: {stats['removed']}\n"
+                    f"Sem alteração: {stats['unchanged']}"
+                )
+                messagebox.showinfo("Concluído", message)
 
     def _test_connection(self):
         """Testa a conexão com a playlist e mostra o resultado."""
@@ -336,19 +362,32 @@ class MainWindow:
         return text
 
     def update_proxy_status(self):
-        """Atualiza o status do proxy na interface"""
+        """Atualiza o status do proxy na interface (streams ativos e vazão)"""
         try:
-            response = requests.get("http://127.0.0.1:55950/status", timeout=1)
+            response = requests.get("http://127.0.0.1:55950/metrics", params={"format": "json"}, timeout=1)
             if response.status_code == 200:
-                self.proxy_status_label.config(text="Status Proxy: Ativo", fg="green")
+                self.proxy_status_label.config(text=self.format_proxy_metrics(response.json()), fg="green")
             else:
                 self.proxy_status_label.config(text="Status Proxy: Erro", fg="red")
-        except requests.RequestException:
+        except (requests.RequestException, ValueError):
             self.proxy_status_label.config(text="Status Proxy: Inativo", fg="red")
         
         # Atualizar status a cada 5 segundos
         self.root.after(5000, self.update_proxy_status)
 
+    def format_proxy_metrics(self, metrics: dict) -> str:
+        """Resumo das métricas do proxy; a vazão é calculada entre duas leituras"""
+        now = time.monotonic()
+        previous = self._last_proxy_metrics
+        self._last_proxy_metrics = (now, metrics["bytes_out"])
+        text = f"Status Proxy: Ativo - {metrics['active_streams']} stream(s)"
+        if previous and now > previous[0] and metrics["bytes_out"] >= previous[1]:
+            mbps = (metrics["bytes_out"] - previous[1]) * 8 / (now - previous[0]) / 1e6
+            text += f", {mbps:.1f} Mbit/s"
+        if metrics["ttfb"]["count"]:
+            text += f", TTFB médio {metrics['ttfb']['avg'] * 1000:.0f} ms"
+        return text
+
     def on_closing(self):
         """Chamado quando a janela é fechada"""
         response = messagebox.askyesnocancel(